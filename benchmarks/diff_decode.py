@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import cv2   as cv
+import numpy as np
+
+# product_scan modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'product_scan'))
+
+from oliwo_weights.xcodiff import load_diff_gray, downscale_gray
+
+def decode_full(image_path : str) -> np.ndarray:
+    # previous diff path: full BGR decode, resize, grayscale
+    return downscale_gray(cv.imread(image_path))
+
+def decode_reduced(image_path : str) -> np.ndarray:
+    # libjpeg DCT scaling straight to 1/4 grayscale
+    return load_diff_gray(image_path)
+
+DECODERS = {
+    'full'    : decode_full,
+    'reduced' : decode_reduced
+}
+
+def write_synthetic_pair(directory : str, width : int, height : int) -> tuple[str, str]:
+    rng = np.random.default_rng(0)
+
+    # textured shelf-like frame, second one with a changed block
+    base = rng.integers(0, 255, (height // 16, width // 16, 3), dtype = np.uint8)
+    base = cv.resize(base, (width, height), interpolation = cv.INTER_CUBIC)
+    changed = base.copy()
+    changed[height // 3 : height // 2, width // 3 : width // 2] = 40
+
+    reference_path = os.path.join(directory, 'reference.jpg')
+    latest_path    = os.path.join(directory, 'latest.jpg')
+    cv.imwrite(reference_path, base)
+    cv.imwrite(latest_path, changed)
+    return (reference_path, latest_path)
+
+def run_mode(mode : str, reference_path : str, latest_path : str, iterations : int) -> dict[str, float]:
+    decoder = DECODERS[mode]
+
+    # warm up codec tables
+    decoder(reference_path)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        decoder(reference_path)
+        decoder(latest_path)
+        timings.append(time.perf_counter() - start)
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss = peak_rss / 1024
+
+    return {
+        'mode'         : mode,
+        'pair_ms_mean' : 1000.0 * float(np.mean(timings)),
+        'pair_ms_p95'  : 1000.0 * float(np.percentile(timings, 95)),
+        'peak_rss_mb'  : peak_rss / 1024.0
+    }
+
+def run_isolated(mode : str, reference_path : str, latest_path : str, iterations : int) -> dict[str, float]:
+    # fresh process per mode so peak RSS is not shared
+    output = subprocess.check_output([
+        sys.executable, os.path.abspath(__file__),
+        '--child', mode,
+        '--reference', reference_path,
+        '--latest', latest_path,
+        '--iterations', str(iterations)
+    ], text = True)
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Diff stage decode benchmark")
+    parser.add_argument('--reference',  type = str, default = None, help = 'Reference JPEG (synthetic if omitted)')
+    parser.add_argument('--latest',     type = str, default = None, help = 'Latest JPEG (synthetic if omitted)')
+    parser.add_argument('--width',      type = int, default = 2592, help = 'Synthetic frame width')
+    parser.add_argument('--height',     type = int, default = 1944, help = 'Synthetic frame height')
+    parser.add_argument('--iterations', type = int, default = 20,   help = 'Decoded pairs per mode')
+    parser.add_argument('--child',      type = str, default = None, choices = list(DECODERS.keys()), help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.reference, args.latest, args.iterations)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.reference and args.latest:
+            reference_path, latest_path = args.reference, args.latest
+        else:
+            reference_path, latest_path = write_synthetic_pair(tmp_dir, args.width, args.height)
+
+        print(f"Decode benchmark: {reference_path} / {latest_path}")
+        print(f"{'Mode':<10} {'Pair ms':>9} {'p95 ms':>9} {'Peak RSS MB':>12}")
+        for mode in DECODERS:
+            result = run_isolated(mode, reference_path, latest_path, args.iterations)
+            print(f"{result['mode']:<10} {result['pair_ms_mean']:>9.2f} {result['pair_ms_p95']:>9.2f} {result['peak_rss_mb']:>12.1f}")
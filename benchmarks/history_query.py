@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import argparse
+import datetime
+import tempfile
+import numpy as np
+
+# product_scan modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'product_scan'))
+
+from oliwo_weights.xhistory import TransitionHistory, COLUMNS, format_history_report
+
+def write_synthetic_history(history_dir : str, days : int, cameras : int, products : int, per_day : int) -> tuple[float, float, int]:
+    rng = np.random.default_rng(0)
+    history = TransitionHistory(history_dir)
+    for camera in range(cameras):
+        history.camera_id(f"camera_{camera:03d}_frame")
+
+    # products spread over cameras, product index is per camera
+    camera_of  = np.arange(products) % cameras
+    product_of = np.arange(products) // cameras
+    state      = np.zeros(products, dtype = np.uint8)
+
+    start = time.mktime((datetime.date.today() - datetime.timedelta(days = days)).timetuple())
+    total = 0
+    for day in range(days):
+        day_start = start + day * 86400.0
+
+        # per_day transitions per product on average, in time order
+        count = products * per_day
+        ts    = np.sort(day_start + rng.uniform(0, 86400.0, count))
+        who   = rng.integers(0, products, count)
+
+        # every transition moves a product to one of the two other states
+        steps = rng.integers(1, 3, count)
+        order = np.lexsort((ts, who))
+        who_sorted, steps_sorted = who[order], steps[order]
+
+        first = np.ones(count, dtype = bool)
+        first[1:] = who_sorted[1:] != who_sorted[:-1]
+        total_steps = np.cumsum(steps_sorted)
+        group_base  = (total_steps - steps_sorted)[first][np.cumsum(first) - 1]
+        walked      = total_steps - group_base
+
+        old = np.empty(count, dtype = np.uint8)
+        new = np.empty(count, dtype = np.uint8)
+        new[order] = (state[who_sorted] + walked) % 3
+        old[order] = (state[who_sorted] + walked - steps_sorted) % 3
+
+        last = np.ones(count, dtype = bool)
+        last[:-1] = first[1:]
+        state[who_sorted[last]] = new[order][last]
+
+        columns = {
+            'ts'      : ts,
+            'camera'  : camera_of[who],
+            'product' : product_of[who],
+            'old'     : old,
+            'new'     : new
+        }
+        day_dir = os.path.join(history_dir, datetime.date.fromtimestamp(day_start + 43200.0).isoformat())
+        os.makedirs(day_dir, exist_ok = True)
+        for name, dtype in COLUMNS.items():
+            columns[name].astype(dtype).tofile(os.path.join(day_dir, f"{name}.bin"))
+        total += count
+
+    return (start, start + days * 86400.0, total)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "State history range query benchmark")
+    parser.add_argument('--days',       type = int, default = 30,    help = 'Days of history')
+    parser.add_argument('--cameras',    type = int, default = 100,   help = 'Cameras (shelves)')
+    parser.add_argument('--products',   type = int, default = 10000, help = 'Products over all cameras')
+    parser.add_argument('--per-day',    type = int, default = 4,     help = 'Transitions per product per day')
+    parser.add_argument('--iterations', type = int, default = 5,     help = 'Timed queries')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("Writing synthetic history...")
+        start, end, total = write_synthetic_history(tmp_dir, args.days, args.cameras, args.products, args.per_day)
+        print(f"{total} transitions over {args.days} days, {args.products} products")
+
+        history = TransitionHistory(tmp_dir)
+        queries = {
+            'empty durations' : lambda: history.state_durations(start, end),
+            'restock latency' : lambda: history.replenishment_latencies(start, end),
+            'shelf stats'     : lambda: history.shelf_stats(start, end),
+            'one camera'      : lambda: history.state_durations(start, end, camera = 'camera_000_frame')
+        }
+
+        print(f"{'Query':<16} {'Mean ms':>9} {'Max ms':>9}")
+        for name, query in queries.items():
+            timings = []
+            for _ in range(args.iterations):
+                begin = time.perf_counter()
+                query()
+                timings.append(time.perf_counter() - begin)
+            print(f"{name:<16} {1000.0 * np.mean(timings):>9.1f} {1000.0 * np.max(timings):>9.1f}")
+
+        print()
+        print("\n".join(format_history_report(history.shelf_stats(start, end)).splitlines()[:6]))
@@ -0,0 +1,303 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+import numpy as np
+
+# project root (shared modules) and the module directories of each service
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'product_scan'))
+sys.path.insert(0, os.path.join(project_root, 'cam_display'))
+sys.path.insert(0, os.path.join(project_root, 'cam_service'))
+
+from synthetic_shelf import SyntheticShelf, parse_resolution
+
+RESULTS_FILE  = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hot_paths_results.json')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hot_paths_baseline.json')
+
+# median slower (faster) than the baseline by more than this is a regression (improvement)
+TOLERANCE = 0.15
+
+# name -> (parameters the benchmark depends on, setup(case) -> timed callable)
+BENCHMARKS : dict[str, tuple[tuple[str, ...], any]] = {}
+
+def benchmark(*params : str):
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (params, setup)
+        return setup
+    return register
+
+class Case:
+    # one parameter combination, frames come from synthetic shelves
+    def __init__(self, resolution : str, cameras : int, products : int, tmp_dir : str):
+        self.resolution = resolution
+        self.cameras    = cameras
+        self.products   = products
+        self.tmp_dir    = tmp_dir
+        self.width, self.height = parse_resolution(resolution)
+        self.rng = np.random.default_rng(0)
+
+    def shelf(self, index : int = 0) -> SyntheticShelf:
+        return SyntheticShelf(self.width, self.height, self.products, seed = index)
+
+    def frame_pair(self) -> tuple[np.ndarray, np.ndarray]:
+        # reference and a later frame with changed facings and slight shake
+        shelf  = self.shelf()
+        latest = shelf.render(shelf.random_states(self.rng), noise = 2.0, shift = (2, 1), rng = self.rng)
+        return (shelf.render(), latest)
+
+    def jpeg_path(self) -> str:
+        import cv2 as cv
+        path = os.path.join(self.tmp_dir, f"frame_{self.resolution}.jpg")
+        if not os.path.exists(path):
+            cv.imwrite(path, self.shelf().render(noise = 2.0))
+        return path
+
+@benchmark('resolution', 'products')
+def find_differences(case : Case):
+    from oliwo_weights.xcodiff import find_differences as run
+    reference, latest = case.frame_pair()
+    return lambda: run(reference, latest)
+
+@benchmark('products')
+def match_products(case : Case):
+    # get_matching_prod_names: compute_iou_xyxy for every box x product
+    from oliwo_weights.xcodiff import get_matching_prod_names
+    shelf = case.shelf()
+    boxes = [[x0 + 3, y0 + 2, x1 - 2, y1 + 1] for x0, y0, x1, y1 in shelf.visible_boxes(shelf.random_states(case.rng))]
+    catalog = shelf.catalog()
+    return lambda: get_matching_prod_names(boxes, catalog)
+
+@benchmark('resolution', 'cameras')
+def create_grid_datetime(case : Case):
+    from grid_display import create_grid_datetime as run
+    frames = [case.shelf(i).render() for i in range(case.cameras)]
+    return lambda: run(frames, 728)
+
+@benchmark('resolution', 'products')
+def overlay(case : Case):
+    # OliwoModel.overlay does not use the model, it is called without loading one
+    from PIL import Image
+    from oliwo_weights.xoliwo import OliwoModel
+    shelf = case.shelf()
+    image = Image.fromarray(shelf.render()[:, :, ::-1])
+    boxes = shelf.visible_boxes()
+    return lambda: OliwoModel.overlay(None, image, boxes, fill_alpha = 0, line_width = 5)
+
+@benchmark('resolution')
+def load_image(case : Case):
+    from oliwo_weights.xoliwo import OliwoModel
+    path = case.jpeg_path()
+    return lambda: OliwoModel.load_image(None, path).load()
+
+def write_catalogs(case : Case, information_dir : str) -> list[str]:
+    os.makedirs(information_dir, exist_ok = True)
+    cameras = []
+    for i in range(case.cameras):
+        camera = f"camera_{i:03d}_frame"
+        with open(os.path.join(information_dir, f"{camera}.json"), 'w') as f:
+            json.dump(SyntheticShelf(case.width, case.height, case.products, seed = i).catalog(), f, indent = 2)
+        cameras.append(camera)
+    return cameras
+
+@benchmark('cameras', 'products')
+def state_json_write(case : Case):
+    from oliwo_weights.xstate import ShelfStateStore
+    root  = tempfile.mkdtemp(dir = case.tmp_dir)
+    store = ShelfStateStore(os.path.join(root, 'information'), os.path.join(root, 'state'))
+    cameras = write_catalogs(case, store.information_dir)
+    for camera in cameras:
+        store.states(camera)
+
+    def run():
+        for camera in cameras:
+            store.save(camera)
+    return run
+
+@benchmark('cameras', 'products')
+def state_json_read(case : Case):
+    # cold store: catalog and state files parsed for every camera
+    from oliwo_weights.xstate import ShelfStateStore
+    root = tempfile.mkdtemp(dir = case.tmp_dir)
+    information_dir, state_dir = os.path.join(root, 'information'), os.path.join(root, 'state')
+    cameras = write_catalogs(case, information_dir)
+    writer  = ShelfStateStore(information_dir, state_dir)
+    for camera in cameras:
+        writer.apply(camera, case.rng.integers(0, 3, case.products).astype(np.uint8))
+
+    def run():
+        store = ShelfStateStore(information_dir, state_dir)
+        for camera in cameras:
+            store.states(camera)
+    return run
+
+@benchmark('resolution')
+def jpeg_encode_cv(case : Case):
+    import cv2 as cv
+    frame = case.shelf().render(noise = 2.0)
+    return lambda: cv.imencode('.jpg', frame)
+
+@benchmark('resolution')
+def jpeg_encode_pil(case : Case):
+    from PIL import Image
+    image = Image.fromarray(case.shelf().render(noise = 2.0)[:, :, ::-1])
+    return lambda: image.save(io.BytesIO(), format = 'JPEG')
+
+@benchmark('resolution')
+def jpeg_decode_cv(case : Case):
+    import cv2 as cv
+    path = case.jpeg_path()
+    return lambda: cv.imread(path)
+
+@benchmark('resolution')
+def jpeg_decode_reduced(case : Case):
+    # diff stage path: libjpeg DCT scaling to 1/4 grayscale
+    from oliwo_weights.xcodiff import load_diff_gray
+    path = case.jpeg_path()
+    return lambda: load_diff_gray(path)
+
+@benchmark('resolution')
+def jpeg_decode_pil(case : Case):
+    from PIL import Image
+    path = case.jpeg_path()
+    return lambda: Image.open(path).load()
+
+@benchmark('resolution')
+def jpeg_write_traced(case : Case):
+    # capture path: encode, COM segment with the trace, atomic replace
+    import cv2 as cv
+    from frame_trace import new_frame_trace, write_traced_jpeg
+    frame = case.shelf().render(noise = 2.0)
+    path  = os.path.join(case.tmp_dir, 'traced.jpg')
+    return lambda: write_traced_jpeg(path, cv.imencode('.jpg', frame)[1].tobytes(), new_frame_trace('camera_000_frame'))
+
+class FrameSequence:
+    # cv.VideoCapture stand-in returning pre-rendered frames
+    def __init__(self, frames : list[np.ndarray]):
+        self.frames = itertools.cycle(frames)
+
+    def read(self) -> tuple[bool, np.ndarray]:
+        return (True, next(self.frames))
+
+@benchmark('resolution')
+def iterative_laplacian(case : Case):
+    from background_service import BackgroundCameraService
+    shelf   = case.shelf()
+    frames  = [shelf.render(noise = 2.0, rng = np.random.default_rng(i)) for i in range(4)]
+    service = BackgroundCameraService('000', 0, os.path.join(case.tmp_dir, 'camera_000_frame.jpg'))
+    service.cam_capture = FrameSequence(frames)
+    return lambda: service.iterative_laplacian(7)
+
+def measure(func, repeat : int, min_time : float) -> dict[str, float]:
+    func()
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < repeat or time.perf_counter() - start < min_time:
+        begin = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - begin)
+    return {
+        'median_ms' : 1000.0 * float(np.median(timings)),
+        'min_ms'    : 1000.0 * float(np.min(timings)),
+        'runs'      : len(timings)
+    }
+
+def case_key(name : str, params : dict[str, any]) -> str:
+    return f"{name}[{','.join(f'{x}={y}' for x, y in params.items())}]"
+
+def run_benchmarks(names : list[str], resolutions : list[str], cameras : list[int], products : list[int], repeat : int, min_time : float) -> dict[str, dict[str, any]]:
+    grid = {'resolution' : resolutions, 'cameras' : cameras, 'products' : products}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in names:
+            params, setup = BENCHMARKS[name]
+            # only the parameters this benchmark depends on are varied
+            for values in itertools.product(*(grid[x] for x in params)):
+                case_params = dict(zip(params, values))
+                case = Case(case_params.get('resolution', resolutions[0]), case_params.get('cameras', cameras[0]), case_params.get('products', products[0]), tmp_dir)
+                key = case_key(name, case_params)
+                try:
+                    func = setup(case)
+                except ImportError as e:
+                    results[key] = {'params' : case_params, 'skipped' : str(e)}
+                    print(f"{key:<56} skipped ({e})")
+                    continue
+                results[key] = {'params' : case_params, **measure(func, repeat, min_time)}
+                print(f"{key:<56} {results[key]['median_ms']:>10.2f} ms")
+    return results
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = project_root, capture_output = True, text = True, timeout = 10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare_results(results : dict[str, dict[str, any]], baseline : dict[str, dict[str, any]], tolerance : float) -> tuple[str, int]:
+    """
+    Table of median ratios against the baseline and the number of regressions.
+    """
+    lines = [f"{'Benchmark':<56} {'Base ms':>10} {'Now ms':>10} {'Ratio':>7}"]
+    regressions = 0
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or 'median_ms' not in base or 'median_ms' not in result:
+            continue
+        ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] > 0 else float('inf')
+        mark = ''
+        if ratio > 1.0 + tolerance:
+            mark = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1.0 - tolerance:
+            mark = '  improved'
+        lines.append(f"{key:<56} {base['median_ms']:>10.2f} {result['median_ms']:>10.2f} {ratio:>7.2f}{mark}")
+    return ("\n".join(lines), regressions)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Hot path microbenchmarks on synthetic shelves")
+    parser.add_argument('--only',        nargs = '*', default = None, choices = sorted(BENCHMARKS), help = 'Benchmarks to run (default: all)')
+    parser.add_argument('--resolutions', nargs = '+', default = ['720p', '1080p', '5mp'], help = 'Frame sizes: 720p, 1080p, 5mp or WxH')
+    parser.add_argument('--cameras',     nargs = '+', type = int, default = [1, 8, 32], help = 'Camera counts')
+    parser.add_argument('--products',    nargs = '+', type = int, default = [50, 200], help = 'Products per camera')
+    parser.add_argument('--repeat',      type = int,   default = 5,    help = 'Minimum timed runs per case')
+    parser.add_argument('--min-time',    type = float, default = 0.2,  help = 'Minimum timed seconds per case')
+    parser.add_argument('--output',      default = RESULTS_FILE,  help = 'Results JSON')
+    parser.add_argument('--baseline',    default = BASELINE_FILE, help = 'Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'Store these results as the new baseline')
+    parser.add_argument('--tolerance',   type = float, default = TOLERANCE, help = 'Relative median change reported as regression / improvement')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only or list(BENCHMARKS), args.resolutions, args.cameras, args.products, args.repeat, args.min_time)
+    report = {
+        'meta' : {
+            'created'  : time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit'   : git_commit(),
+            'python'   : platform.python_version(),
+            'platform' : platform.platform(),
+            'cpus'     : os.cpu_count()
+        },
+        'results' : results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print(f"\nResults saved: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent = 2)
+        print(f"Baseline saved: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        table, regressions = compare_results(results, baseline['results'], args.tolerance)
+        print(f"\nAgainst baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('created')}):")
+        print(table)
+        if regressions:
+            print(f"{regressions} regressions above {100.0 * args.tolerance:.0f}%")
+            sys.exit(1)
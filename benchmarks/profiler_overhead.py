@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# product_scan modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'product_scan'))
+
+from oliwo_weights.xprofile import TailProfiler, format_profiler_report
+
+def synthetic_stage(rng : np.random.Generator, size : int, products : int) -> int:
+    # diff-like numpy work on a 1/4-scale frame plus a per-product python loop
+    reference = rng.integers(0, 255, (size, size), dtype = np.uint8)
+    latest    = reference.copy()
+    latest[size // 3 : size // 2, size // 3 : size // 2] = 40
+    mask = np.abs(latest.astype(np.int16) - reference.astype(np.int16)) > 25
+
+    changed = 0
+    step = max(1, size // 8)
+    for i in range(products):
+        y, x = (i * 7) % (size - step), (i * 13) % (size - step)
+        if mask[y : y + step, x : x + step].any():
+            changed += 1
+    return changed
+
+def run_scans(scans : int, workers : int, size : int, products : int, profiler : TailProfiler | None) -> list[float]:
+    def scan(index : int) -> float:
+        rng   = np.random.default_rng(index)
+        key   = object()
+        start = time.perf_counter()
+        if profiler is None:
+            synthetic_stage(rng, size, products)
+        else:
+            with profiler.stage(key, 'diff'):
+                synthetic_stage(rng, size, products)
+        duration = time.perf_counter() - start
+        if profiler is not None:
+            profiler.finish(key, duration, f"camera_{index % 8}", {'trace_id' : f"{index:08d}"})
+        return duration
+
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        return list(executor.map(scan, range(scans)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Tail profiler overhead benchmark")
+    parser.add_argument('--scans',      type = int,   default = 400,   help = 'Synthetic scans per run')
+    parser.add_argument('--workers',    type = int,   default = 4,     help = 'Scan threads (io pool size)')
+    parser.add_argument('--size',       type = int,   default = 640,   help = 'Side of the synthetic 1/4-scale frame')
+    parser.add_argument('--products',   type = int,   default = 2000,  help = 'Products checked per scan')
+    parser.add_argument('--interval',   type = float, default = 0.005, help = 'Sampling interval in seconds')
+    parser.add_argument('--percentile', type = float, default = 99.0,  help = 'Latency percentile kept')
+    parser.add_argument('--idle',       type = float, default = 2.0,   help = 'Seconds measured with no scan running')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # warm up numpy and the thread pool
+        run_scans(args.workers * 4, args.workers, args.size, args.products, None)
+
+        # armed, no scan running: the sampler must not wake up
+        profiler = TailProfiler(tmp_dir, percentile = args.percentile, interval = args.interval)
+        cpu_start = time.process_time()
+        time.sleep(args.idle)
+        idle_cpu = time.process_time() - cpu_start
+        print(f"Idle: {profiler.sample_count} samples, {1000.0 * idle_cpu:.2f} ms CPU in {args.idle:.1f}s")
+
+        # entering and leaving a stage, paid twice per stage
+        key = object()
+        begin = time.perf_counter()
+        for _ in range(10000):
+            with profiler.stage(key, 'diff'):
+                pass
+        print(f"Stage enter/leave: {1e6 * (time.perf_counter() - begin) / 10000:.2f} us")
+        profiler.discard(key)
+        profiler.close()
+
+        results = {}
+        for name in ('off', 'armed'):
+            profiler = TailProfiler(tmp_dir, percentile = args.percentile, interval = args.interval) if name == 'armed' else None
+            begin = time.perf_counter()
+            durations = run_scans(args.scans, args.workers, args.size, args.products, profiler)
+            results[name] = (time.perf_counter() - begin, durations, profiler)
+            if profiler is not None:
+                profiler.close()
+
+        print(f"{'Profiler':<10} {'Wall s':>8} {'Mean ms':>9} {'p99 ms':>9}")
+        for name, (wall, durations, _) in results.items():
+            print(f"{name:<10} {wall:>8.2f} {1000.0 * np.mean(durations):>9.2f} {1000.0 * np.percentile(durations, 99):>9.2f}")
+
+        wall_off, wall_armed = results['off'][0], results['armed'][0]
+        print(f"Throughput overhead: {100.0 * (wall_armed / wall_off - 1.0):+.1f}%")
+        print(format_profiler_report(results['armed'][2]))
+        print(f"Reports written: {len([x for x in os.listdir(tmp_dir) if x.endswith('.folded')])}")
@@ -0,0 +1,420 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import cv2 as cv
+import numpy as np
+
+# no display needed, Qt renders into offscreen buffers (set before Qt is imported)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# project root (shared modules) and the module directories of each UI
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'product_scan'))
+sys.path.insert(0, os.path.join(project_root, 'cam_display'))
+sys.path.insert(0, os.path.join(project_root, 'cam_service'))
+
+from PyQt6.QtCore import Qt, QThread, QTimer, QEventLoop, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+from synthetic_shelf import SyntheticShelf, parse_resolution
+from shelf_metrics import resident_memory_bytes
+from hot_paths import case_key, git_commit
+
+RESULTS_FILE  = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_rendering_results.json')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_rendering_baseline.json')
+
+# timings worse than the baseline by more than this are a regression (UI timings are noisier than the hot paths)
+TOLERANCE = 0.25
+
+# timings compared against the baseline
+COMPARED_TIMINGS = ('median_ms', 'p95_ms', 'loop_p95_ms')
+
+# more dropped frames than the baseline by this many percentage points is a regression
+DROP_TOLERANCE = 5.0
+
+# distinct grids / video frames cycled through by a feed
+FEED_VARIANTS = 8
+
+# name -> run(app, cameras, args, tmp_dir) -> result
+TARGETS : dict[str, any] = {}
+
+def target(run):
+    TARGETS[run.__name__] = run
+    return run
+
+class LoopProbe:
+    """
+    Event loop latency: a precise timer asks to fire every interval, how
+    late each tick runs is the time the loop was busy with other work.
+    """
+
+    def __init__(self, interval_ms : int):
+        self.interval = interval_ms / 1000.0
+        self.lateness : list[float] = []
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self) -> None:
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def tick(self) -> None:
+        now = time.perf_counter()
+        self.lateness.append(max(0.0, now - self.last - self.interval))
+        self.last = now
+
+    def stop(self) -> None:
+        self.timer.stop()
+
+class FeedCounter:
+    """
+    Frames (or events) emitted and handled per feed, and how long the UI
+    took for each. A frame is stale when a newer one of its feed had been
+    emitted before the UI got to it; with the ones still queued at the end
+    they are the frames a display keeping up would not have shown.
+    """
+
+    def __init__(self, feeds : int):
+        self.lock      = threading.Lock()
+        self.emitted   = [0] * feeds
+        self.handled   = [0] * feeds
+        self.stale     = 0
+        self.durations : list[float] = []
+
+    def emit(self, feed : int) -> None:
+        with self.lock:
+            self.emitted[feed] += 1
+
+    def handle(self, feed : int, func, *args) -> None:
+        begin = time.perf_counter()
+        func(*args)
+        self.durations.append(time.perf_counter() - begin)
+        with self.lock:
+            self.handled[feed] += 1
+            if self.emitted[feed] > self.handled[feed]:
+                self.stale += 1
+
+    def totals(self) -> dict[str, int]:
+        with self.lock:
+            emitted, handled = sum(self.emitted), sum(self.handled)
+            return {'emitted' : emitted, 'handled' : handled, 'stale' : self.stale, 'backlog' : emitted - handled}
+
+class PacedFeed(QThread):
+    """
+    Emits items round robin at a fixed rate from a worker thread, like the
+    display and state event threads. A feed that falls behind does not burst.
+    """
+    item_ready = pyqtSignal(object)
+
+    def __init__(self, items : list[any], rate : float, counter : FeedCounter, feed : int = 0):
+        super().__init__()
+        self.items      = items
+        self.interval   = 1.0 / rate
+        self.counter    = counter
+        self.feed       = feed
+        self.stop_event = threading.Event()
+
+    def run(self):
+        next_item = time.perf_counter()
+        index = 0
+        while not self.stop_event.is_set():
+            self.counter.emit(self.feed)
+            self.item_ready.emit(self.items[index % len(self.items)])
+            index += 1
+            now = time.perf_counter()
+            next_item = max(next_item, now) + self.interval
+            self.stop_event.wait(next_item - now)
+
+    def stop(self):
+        self.stop_event.set()
+
+def camera_frames(cameras : int, resolution : str, variants : int) -> list[list[np.ndarray]]:
+    # per variant one frame of every camera, cameras share a few shelves rendered in every variant
+    width, height = parse_resolution(resolution)
+    rng     = np.random.default_rng(0)
+    shelves = [SyntheticShelf(width, height, 48, seed = x) for x in range(min(cameras, variants))]
+    renders = [[x.render(x.random_states(rng), noise = 2.0, rng = rng) for _ in range(variants)] for x in shelves]
+    return [[renders[x % len(shelves)][(v + x) % variants] for x in range(cameras)] for v in range(variants)]
+
+def write_video(path : str, resolution : str, frames : int, fps : float = 30.0) -> str:
+    width, height = parse_resolution(resolution)
+    shelf  = SyntheticShelf(width, height, 48)
+    rng    = np.random.default_rng(0)
+    writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for _ in range(frames):
+        writer.write(shelf.render(shelf.random_states(rng), noise = 2.0, rng = rng))
+    writer.release()
+    return path
+
+def run_loop(app : QApplication, feeds : list[QThread], counter : FeedCounter, args : argparse.Namespace) -> dict[str, float]:
+    """
+    Run the event loop with the feeds going for --seconds and summarize the
+    handling times, loop latency, dropped frames and RSS. Queued frames are
+    not bounded: past --max-rss-mb the feeds are stopped and the case is
+    marked aborted instead of taking the machine down.
+    """
+    probe   = LoopProbe(args.probe_ms)
+    loop    = QEventLoop()
+    done    = threading.Event()
+    aborted = threading.Event()
+    rss_start = resident_memory_bytes() or 0.0
+
+    def watchdog():
+        # own thread, the event loop may be too far behind to notice
+        while not done.wait(0.2):
+            if (resident_memory_bytes() or 0.0) > args.max_rss_mb * 1024 * 1024:
+                aborted.set()
+                for feed in feeds:
+                    feed.stop()
+                return
+    watcher = threading.Thread(target = watchdog, daemon = True)
+
+    probe.start()
+    watcher.start()
+    for feed in feeds:
+        feed.start()
+    begin = time.perf_counter()
+    QTimer.singleShot(int(args.seconds * 1000), loop.quit)
+    loop.exec()
+    elapsed = time.perf_counter() - begin
+    for feed in feeds:
+        feed.stop()
+    for feed in feeds:
+        feed.wait()
+    probe.stop()
+    done.set()
+    watcher.join()
+
+    # counted before the queued leftovers are delivered
+    totals = counter.totals()
+    rss    = resident_memory_bytes() or 0.0
+    app.processEvents()
+
+    durations = counter.durations or [float('nan')]
+    lateness  = probe.lateness or [float('nan')]
+    return {
+        **totals,
+        'elapsed'     : elapsed,
+        'rate'        : totals['handled'] / elapsed,
+        'dropped_pct' : 100.0 * (totals['stale'] + totals['backlog']) / totals['emitted'] if totals['emitted'] else 0.0,
+        'median_ms'   : 1000.0 * float(np.median(durations)),
+        'p95_ms'      : 1000.0 * float(np.percentile(durations, 95)),
+        'loop_p50_ms' : 1000.0 * float(np.median(lateness)),
+        'loop_p95_ms' : 1000.0 * float(np.percentile(lateness, 95)),
+        'loop_max_ms' : 1000.0 * float(np.max(lateness)),
+        'rss_mb'      : rss / (1024 * 1024),
+        'rss_growth_mb' : (rss - rss_start) / (1024 * 1024),
+        'aborted'     : aborted.is_set()
+    }
+
+@target
+def update_image(app : QApplication, cameras : int, args : argparse.Namespace, tmp_dir : str) -> dict[str, float]:
+    # EnhancedCameraDisplayWindow.update_image with the camera grid of the display thread
+    from grid_display import create_grid_datetime
+    from camera_display_ui import EnhancedCameraDisplayWindow
+
+    grids   = [create_grid_datetime(x) for x in camera_frames(cameras, args.resolution, FEED_VARIANTS)]
+    counter = FeedCounter(1)
+    window  = EnhancedCameraDisplayWindow()
+    window.show()
+
+    feed = PacedFeed(grids, args.fps, counter)
+    feed.item_ready.connect(lambda image: counter.handle(0, window.update_image, image, window.camera_image_label))
+    try:
+        return run_loop(app, [feed], counter, args)
+    finally:
+        window.close()
+
+@target
+def video_preview(app : QApplication, cameras : int, args : argparse.Namespace, tmp_dir : str) -> dict[str, float]:
+    # one VideoPreviewService per camera into the camera service window preview
+    from background_service import VideoPreviewService
+    from camera_service_ui import CameraServiceWindow
+
+    video_path = os.path.join(tmp_dir, f"preview_{args.resolution}.mp4")
+    if not os.path.exists(video_path):
+        write_video(video_path, args.resolution, FEED_VARIANTS)
+
+    counter = FeedCounter(cameras)
+    window  = CameraServiceWindow()
+    window.show()
+
+    services = []
+    for camera in range(cameras):
+        service = VideoPreviewService(video_path)
+        # counted on the service thread as the frame is emitted, handled on the UI thread
+        service.frame_ready.connect(lambda image, camera = camera: counter.emit(camera), Qt.ConnectionType.DirectConnection)
+        service.frame_ready.connect(lambda image, camera = camera: counter.handle(camera, window.update_video_preview, image))
+        services.append(service)
+    try:
+        return run_loop(app, services, counter, args)
+    finally:
+        window.close()
+
+@target
+def product_states(app : QApplication, cameras : int, args : argparse.Namespace, tmp_dir : str) -> dict[str, float]:
+    """
+    ProductScannerWindow: full table refreshes from a state database of
+    cameras x products, then live transition events through on_state_event
+    at --events per second. The refresh is timed on its own (it blocks
+    the loop for its whole duration), the loop figures are the events'.
+    """
+    from oliwo_weights.xstate import ShelfCatalog, STATE_NAMES
+    from oliwo_weights.xstatedb import ShelfStateDB
+    from product_scanner_ui import ProductScannerWindow
+
+    state_db = os.path.join(tmp_dir, f"shelf_state_{cameras}x{args.products}.db")
+    rng      = np.random.default_rng(0)
+    if not os.path.exists(state_db):
+        database = ShelfStateDB(state_db)
+        for camera in range(cameras):
+            shelf   = SyntheticShelf(1920, 1080, args.products, seed = camera)
+            catalog = ShelfCatalog(shelf.catalog())
+            database.put_catalog(f"camera_{camera:03d}", catalog)
+            database.write_states(f"camera_{camera:03d}", shelf.random_states(rng))
+        database.close()
+    database = ShelfStateDB(state_db, read_only = True)
+    products = [(x['camera'], x['name']) for x in database.snapshot()]
+    database.close()
+
+    window = ProductScannerWindow()
+    window.show()
+
+    refreshes = []
+    start = time.perf_counter()
+    while len(refreshes) < 3 or time.perf_counter() - start < 1.0:
+        begin = time.perf_counter()
+        window.refresh_product_states_db(state_db)
+        app.processEvents()
+        refreshes.append(time.perf_counter() - begin)
+
+    events = []
+    for _ in range(FEED_VARIANTS * 16):
+        camera, name = products[rng.integers(len(products))]
+        old, new = rng.choice(len(STATE_NAMES), 2, replace = False)
+        events.append({'type' : 'transition', 'ts' : time.time(), 'camera' : camera, 'product' : name, 'old' : STATE_NAMES[old], 'new' : STATE_NAMES[new]})
+
+    counter = FeedCounter(1)
+    feed = PacedFeed(events, args.events, counter)
+    feed.item_ready.connect(lambda event: counter.handle(0, window.on_state_event, event))
+    try:
+        result = run_loop(app, [feed], counter, args)
+    finally:
+        window.close()
+
+    # every event has to be applied, only the ones still queued count as dropped
+    result['dropped_pct'] = 100.0 * result['backlog'] / result['emitted'] if result['emitted'] else 0.0
+    result['rows']           = len(products)
+    result['refresh_ms']     = 1000.0 * float(np.median(refreshes))
+    result['refresh_max_ms'] = 1000.0 * float(np.max(refreshes))
+    return result
+
+def compare_results(results : dict[str, dict[str, any]], baseline : dict[str, dict[str, any]], tolerance : float) -> tuple[str, int]:
+    """
+    Table of timing ratios and dropped frames against the baseline and the
+    number of regressions.
+    """
+    lines = [f"{'Case':<36} {'Metric':<12} {'Base':>10} {'Now':>10} {'Ratio':>7}"]
+    regressions = 0
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric in COMPARED_TIMINGS + ('refresh_ms',):
+            if metric not in base or metric not in result:
+                continue
+            ratio = result[metric] / base[metric] if base[metric] > 0 else float('inf')
+            mark = ''
+            if ratio > 1.0 + tolerance:
+                mark = '  REGRESSION'
+                regressions += 1
+            elif ratio < 1.0 - tolerance:
+                mark = '  improved'
+            lines.append(f"{key:<36} {metric:<12} {base[metric]:>10.2f} {result[metric]:>10.2f} {ratio:>7.2f}{mark}")
+
+        if result.get('aborted') and not base.get('aborted'):
+            regressions += 1
+            lines.append(f"{key:<36} {'memory':<12} {'':>10} {'aborted':>10} {'':>7}  REGRESSION")
+        if 'dropped_pct' in base and result.get('dropped_pct', 0.0) > base['dropped_pct'] + DROP_TOLERANCE:
+            regressions += 1
+            lines.append(f"{key:<36} {'dropped %':<12} {base['dropped_pct']:>10.1f} {result['dropped_pct']:>10.1f} {'':>7}  REGRESSION")
+    return ("\n".join(lines), regressions)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Offscreen Qt UI rendering with synthetic camera feeds")
+    parser.add_argument('--only',       nargs = '*', default = None, choices = sorted(TARGETS), help = 'Targets to run (default: all)')
+    parser.add_argument('--cameras',    nargs = '+', type = int, default = [4, 16, 32, 64], help = 'Camera counts')
+    parser.add_argument('--seconds',    type = float, default = 5.0,  help = 'Feed time per target and camera count')
+    parser.add_argument('--resolution', default = '720p',             help = 'Camera frame size: 720p, 1080p, 5mp or WxH')
+    parser.add_argument('--fps',        type = float, default = 10.0, help = 'Display grid updates per second')
+    parser.add_argument('--products',   type = int,   default = 48,   help = 'Products per camera in the state table')
+    parser.add_argument('--events',     type = float, default = 20.0, help = 'State transition events per second')
+    parser.add_argument('--probe-ms',   type = int,   default = 10,   help = 'Event loop latency probe interval (ms)')
+    parser.add_argument('--max-rss-mb', type = float, default = 2048.0, help = 'Stop the feeds of a case above this RSS')
+    parser.add_argument('--output',     default = RESULTS_FILE,  help = 'Results JSON')
+    parser.add_argument('--baseline',   default = BASELINE_FILE, help = 'Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'Store these results as the new baseline')
+    parser.add_argument('--tolerance',  type = float, default = TOLERANCE, help = 'Relative timing change reported as regression / improvement')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    print(f"Qt platform {app.platformName()}, {os.cpu_count()} CPUs, {args.seconds:g}s per case")
+    print(f"{'Case':<36} {'Handled':>8} {'Per s':>7} {'Drop %':>7} {'p50 ms':>8} {'p95 ms':>8} {'Loop p95':>9} {'Loop max':>9} {'RSS MB':>8} {'Growth':>7}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.only or list(TARGETS):
+            for cameras in args.cameras:
+                key = case_key(name, {'cameras' : cameras})
+                try:
+                    result = TARGETS[name](app, cameras, args, tmp_dir)
+                except ImportError as e:
+                    results[key] = {'params' : {'cameras' : cameras}, 'skipped' : str(e)}
+                    print(f"{key:<36} skipped ({e})")
+                    continue
+                results[key] = {'params' : {'cameras' : cameras}, **result}
+                print(
+                    f"{key:<36} {result['handled']:>8} {result['rate']:>7.1f} {result['dropped_pct']:>7.1f} "
+                    f"{result['median_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['loop_p95_ms']:>9.2f} {result['loop_max_ms']:>9.2f} "
+                    f"{result['rss_mb']:>8.1f} {result['rss_growth_mb']:>7.1f}"
+                    + (f"  refresh {result['rows']} rows {result['refresh_ms']:.1f} ms" if 'refresh_ms' in result else '')
+                    + ('  ABORTED (RSS limit)' if result['aborted'] else '')
+                )
+
+    report = {
+        'meta' : {
+            'created'  : time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit'   : git_commit(),
+            'python'   : platform.python_version(),
+            'platform' : platform.platform(),
+            'cpus'     : os.cpu_count(),
+            'qt'       : app.platformName(),
+            'args'     : {x : y for x, y in vars(args).items() if x not in ('output', 'baseline', 'save_baseline')}
+        },
+        'results' : results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print(f"\nResults saved: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent = 2)
+        print(f"Baseline saved: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        table, regressions = compare_results(results, baseline['results'], args.tolerance)
+        print(f"\nAgainst baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('created')}):")
+        print(table)
+        if regressions:
+            print(f"{regressions} regressions above {100.0 * args.tolerance:.0f}%")
+            sys.exit(1)
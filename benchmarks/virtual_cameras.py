@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+# cam_service modules and the shared project root modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'cam_service'))
+
+from shelf_metrics      import resident_memory_bytes
+from virtual_camera     import configure_virtual_cameras, open_capture
+from background_service import BackgroundCameraService, CAPTURES_TOTAL, CAPTURE_FAILURES
+
+def counter_total(counter) -> float:
+    with counter.lock:
+        return sum(counter.values.values())
+
+def run_cameras(count : int, seconds : float, interval : float, settings : dict[str, any], tmp_dir : str) -> dict[str, float]:
+    configure_virtual_cameras({'defaults' : settings, 'count' : count})
+    # scenes are rendered once per camera, not part of the measurement
+    for camera_id in range(count):
+        open_capture(camera_id).release()
+
+    durations : list[float] = []
+    services  : list[BackgroundCameraService] = []
+    for camera_id in range(count):
+        camera_str = str(camera_id).zfill(3)
+        service = BackgroundCameraService(camera_str, camera_id, os.path.join(tmp_dir, f'camera_{camera_str}_frame.jpg'), interval = interval)
+
+        # capture time per frame, open to write
+        def timed(capture = service.exec_capture_frame):
+            begin = time.perf_counter()
+            capture()
+            durations.append(time.perf_counter() - begin)
+        service.exec_capture_frame = timed
+        services.append(service)
+
+    captures, failures = counter_total(CAPTURES_TOTAL), counter_total(CAPTURE_FAILURES)
+    cpu_start = time.process_time()
+    begin     = time.perf_counter()
+    for service in services:
+        service.start()
+    time.sleep(seconds)
+    for service in services:
+        service.stop()
+    for service in services:
+        service.thread.join()
+    elapsed = time.perf_counter() - begin
+    cpu     = time.process_time() - cpu_start
+
+    return {
+        'cameras'  : count,
+        'captures' : counter_total(CAPTURES_TOTAL) - captures,
+        'failures' : counter_total(CAPTURE_FAILURES) - failures,
+        'elapsed'  : elapsed,
+        'cpu'      : cpu,
+        'p50'      : float(np.percentile(durations, 50)) if durations else float('nan'),
+        'p95'      : float(np.percentile(durations, 95)) if durations else float('nan'),
+        'rss'      : resident_memory_bytes() or 0.0
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Capture path throughput and CPU per camera with virtual cameras")
+    parser.add_argument('--counts',       default = '1,4,16,32,64',  help = 'Comma separated camera counts')
+    parser.add_argument('--seconds',      type = float, default = 20.0, help = 'Capture time per camera count')
+    parser.add_argument('--interval',     type = float, default = 0.0,  help = 'Seconds between captures of a camera (service default 5)')
+    parser.add_argument('--resolution',   default = '1080p',            help = "720p, 1080p, 5mp or WxH")
+    parser.add_argument('--fps',          type = float, default = 15.0, help = 'Virtual camera frame rate')
+    parser.add_argument('--video',        default = None,               help = 'Play this video file instead of synthetic shelves')
+    parser.add_argument('--focus-frames', type = int,   default = 4,    help = 'Blurred frames after the camera opens')
+    parser.add_argument('--hunt-rate',    type = float, default = 0.02, help = 'Chance of a focus hunting blur per frame')
+    parser.add_argument('--failure-rate', type = float, default = 0.01, help = 'Chance a frame read fails')
+    args = parser.parse_args()
+
+    settings = {
+        'source'       : 'video' if args.video else 'synthetic',
+        'path'         : args.video,
+        'resolution'   : args.resolution,
+        'fps'          : args.fps,
+        'focus_frames' : args.focus_frames,
+        'hunt_rate'    : args.hunt_rate,
+        'failure_rate' : args.failure_rate
+    }
+
+    print(f"Virtual cameras: {settings['source']} {args.resolution} at {args.fps:g} fps, capture interval {args.interval:g}s, {os.cpu_count()} CPUs")
+    print(f"{'Cameras':>8} {'Frames/s':>9} {'Per cam/min':>12} {'Fail %':>7} {'p50 s':>7} {'p95 s':>7} {'CPU %':>7} {'CPU %/cam':>10} {'RSS MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in (int(x) for x in args.counts.split(',')):
+            result = run_cameras(count, args.seconds, args.interval, settings, tmp_dir)
+            attempts = result['captures'] + result['failures']
+            cpu_pct  = 100.0 * result['cpu'] / result['elapsed']
+            print(
+                f"{count:>8} {result['captures'] / result['elapsed']:>9.2f} {60.0 * result['captures'] / result['elapsed'] / count:>12.1f} "
+                f"{100.0 * result['failures'] / attempts if attempts else 0.0:>7.1f} {result['p50']:>7.2f} {result['p95']:>7.2f} "
+                f"{cpu_pct:>7.1f} {cpu_pct / count:>10.2f} {result['rss'] / (1024 * 1024):>8.1f}"
+            )
@@ -12,6 +12,10 @@ from PyQt6.QtCore import QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QPixmap, QImage, QFont
 from grid_display import create_grid_datetime
 
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame_watcher import FrameWatcher
+
 class CameraDisplayThread(QThread):
     image_updated = pyqtSignal(np.ndarray)
     status_updated = pyqtSignal(str)
@@ -21,72 +25,50 @@ class CameraDisplayThread(QThread):
         self.root_directory = root_directory
         self.display_title = display_title
         self.running = False
-        self.image_file_list = []
-        self.last_modified_time = []
-        self.images_frames = []
-        
-    def find_jpg_images(self, directory):
-        jpg_images = []
-        if not os.path.exists(directory):
-            return jpg_images
-            
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    jpg_images.append(os.path.join(root, file))
-        return sorted(jpg_images, key=lambda x: os.path.basename(x).lower())
+        self.images_frames = {}
     
     def run(self):
         self.running = True
         
-        while self.running:
-            # Refresh file list each cycle to catch new files
-            current_image_list = self.find_jpg_images(self.root_directory)
-            
-            # Update lists if new files found
-            if len(current_image_list) != len(self.image_file_list):
-                self.image_file_list = current_image_list
-                self.last_modified_time = [0] * len(self.image_file_list)
-                self.images_frames = [np.zeros(shape=(512, 512, 3), dtype=np.uint8)] * len(self.image_file_list)
-                self.status_updated.emit(f"[{self.display_title}] Found {len(self.image_file_list)} image files")
-            
-            updated_count = 0
-            
-            for i, file_path in enumerate(self.image_file_list):
-                if not os.path.exists(file_path):
-                    continue
-                    
-                try:
-                    current_modified = os.path.getmtime(file_path)
-                    
-                    if current_modified != self.last_modified_time[i]:
-                        self.last_modified_time[i] = current_modified
+        # Debounced frame events, new files are picked up as they appear
+        watcher = FrameWatcher(self.root_directory, extensions=('.jpg', '.jpeg', '.png'))
+        self.status_updated.emit(f"[{self.display_title}] Watching {self.root_directory} ({watcher.mode})")
+        
+        try:
+            while self.running:
+                # Short timeout so stop() is honoured quickly
+                events = watcher.wait(timeout=0.5)
+                
+                updated_count = 0
+                for event in events:
+                    if event.path not in self.images_frames:
+                        self.status_updated.emit(f"[{self.display_title}] Found {len(self.images_frames) + 1} image files")
                         
-                        image_array = cv.imread(file_path)
+                    try:
+                        image_array = cv.imread(event.path)
                         if image_array is not None:
-                            self.images_frames[i] = image_array
+                            self.images_frames[event.path] = image_array
                             updated_count += 1
                             
-                except Exception as e:
-                    self.status_updated.emit(f"[{self.display_title}] Error reading {file_path}: {e}")
-            
-            # Create grid and emit
-            if self.images_frames and any(img.sum() > 0 for img in self.images_frames):
+                    except Exception as e:
+                        self.status_updated.emit(f"[{self.display_title}] Error reading {event.path}: {e}")
+                
+                if updated_count == 0:
+                    continue
+                
+                # Create grid and emit
                 try:
-                    # Filter out empty frames
-                    valid_frames = [img for img in self.images_frames if img.sum() > 0]
-                    if valid_frames:
-                        image_grid = create_grid_datetime(valid_frames)
-                        self.image_updated.emit(image_grid)
-                        
-                        if updated_count > 0:
-                            current_time = time.strftime("%H:%M:%S")
-                            self.status_updated.emit(f"[{self.display_title}] Updated {updated_count} images at {current_time}")
-                            
+                    ordered = sorted(self.images_frames, key=lambda x: os.path.basename(x).lower())
+                    image_grid = create_grid_datetime([self.images_frames[x] for x in ordered])
+                    self.image_updated.emit(image_grid)
+                    
+                    current_time = time.strftime("%H:%M:%S")
+                    self.status_updated.emit(f"[{self.display_title}] Updated {updated_count} images at {current_time}")
+                    
                 except Exception as e:
                     self.status_updated.emit(f"[{self.display_title}] Error creating grid: {e}")
-            
-            self.msleep(1000)  # Update every 1 second
+        finally:
+            watcher.close()
     
     def stop(self):
         self.running = False
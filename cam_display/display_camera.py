@@ -1,19 +1,14 @@
 import os
+import sys
 import time
 import argparse
 import cv2 as cv
 import numpy as np
 from grid_display import create_grid_datetime
 
-def find_jpg_images(directory):
-    jpg_images = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file = str(file)
-            if file.lower().endswith('.jpg'):
-                jpg_images.append(os.path.join(root, file))
-    return sorted(jpg_images, key = lambda x: os.path.basename(x).lower())
-
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame_watcher import FrameWatcher
 
 if __name__ == "__main__":
     print("Display Camera System")
@@ -31,59 +26,55 @@ if __name__ == "__main__":
     window_title   = str(args.title)
     print("Root Directory :", root_directory)
 
-    # find image lists
-    image_file_list = find_jpg_images(root_directory)
-    print("Found :", len(image_file_list))
-
-    ## automatic updates here
+    # debounced frame-ready events, new cameras are picked up as they appear
+    watcher = FrameWatcher(root_directory, extensions = ('.jpg',))
+    print("Found :", len(watcher.files()))
+    print("Watching :", watcher.mode)
 
-    # image files
-    last_modified_time = [0] * len(image_file_list)
-
-    # image frame list
-    images_frames = [np.zeros(shape = (512, 512, 3), dtype = np.uint8)] *len(image_file_list)
+    # image frame per file, grid keeps file name order
+    images_frames : dict[str, np.ndarray] = {}
+    last_grid_time = 0.0
     
     # loop
     while True:
-    
-        # enumare the file list
-        for i, file_path in enumerate(image_file_list):
-            
-            # Check if the file has been modified
-            current_modified = os.path.getmtime(file_path)
+
+        # collect frames written since the last pass, never blocks the window
+        updated = False
+        for event in watcher.wait(timeout = 0):
             
-            # check current modified time
-            if current_modified != last_modified_time[i]:
-                
-                print("Updated :", file_path)
+            print("Updated :", event.path)
 
-                # update time
-                last_modified_time[i] = current_modified
+            # Read the image file
+            image_array = cv.imread(event.path)
+            if image_array is None:
+                print(f"Error: Could not read the image file : '{event.path}'")
+                continue
 
-                # Read the image file
-                image_array = cv.imread(file_path)
-                if image_array is None:
-                    print(f"Error: Could not read the image file : '{file_path}'")
-                    continue
+            # update image time
+            images_frames[event.path] = image_array
+            updated = True
 
-                # update image time
-                images_frames[i] = image_array
+        # rebuild on new frames, otherwise once a second for the clock bar
+        if images_frames and (updated or time.time() - last_grid_time >= 1.0):
+            ordered = [images_frames[x] for x in sorted(images_frames, key = lambda x: os.path.basename(x).lower())]
 
-        # Create a grid of images
-        image_grid = create_grid_datetime(images_frames)
+            # Create a grid of images
+            image_grid = create_grid_datetime(ordered)
 
-        # Display the grid of images
-        cv.imshow(window_title, image_grid)
-    
-        # update info
-        current_datetime = time.time()
-        current_datetime = time.ctime(current_datetime)
-        print("Updated at :", current_datetime, 'total frames :', len(images_frames))
+            # Display the grid of images
+            cv.imshow(window_title, image_grid)
+            last_grid_time = time.time()
+
+            # update info
+            if updated:
+                current_datetime = time.ctime(last_grid_time)
+                print("Updated at :", current_datetime, 'total frames :', len(images_frames))
         
-        # Wait for 2 seconds before checking again & Break the loop if 'q' is pressed
-        if cv.waitKey(800) & 0xFF == ord('q'):
+        # keep the window responsive & Break the loop if 'q' is pressed
+        if cv.waitKey(50) & 0xFF == ord('q'):
             break
         
+    watcher.close()
 
     print("Stopped")
     cv.destroyAllWindows()
@@ -1,3 +1,5 @@
+import os
+import sys
 import time
 import copy
 import random
@@ -7,23 +9,42 @@ import numpy as np
 from PyQt6.QtCore import QThread, pyqtSignal
 from PyQt6.QtGui import QImage
 
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shelf_metrics import REGISTRY
+from frame_trace   import new_frame_trace, write_traced_jpeg
+
+# local relative imports
+from virtual_camera import open_capture
+
+CAPTURE_SECONDS  = REGISTRY.histogram('shelf_capture_seconds', 'Camera open, focus sweep and frame write time per camera')
+CAPTURES_TOTAL   = REGISTRY.counter('shelf_captures_total', 'Frames written per camera')
+CAPTURE_FAILURES = REGISTRY.counter('shelf_capture_failures_total', 'Captures without a valid frame (or write) per camera')
+
+# seconds between captures of one camera, +-20% random so cameras spread out
+CAPTURE_INTERVAL = 5.0
+
 class BackgroundCameraService:
-    def __init__(self, task_id : str, camera_index : int, fpath : str):
+    def __init__(self, task_id : str, camera_index : int, fpath : str, interval : float = CAPTURE_INTERVAL):
         self.task_id   = task_id
         self.camera_id = camera_index
         self.fpath     = fpath
+        self.interval  = interval
 
         # setup external thread
         self.thread        = threading.Thread(target = self.run)
         self.thread.daemon = True
         self.stop_event    = threading.Event()
 
+        # a full-resolution frame is held only while capturing
+        self.capturing = False
+
     def iterative_laplacian(self, iterations : int = 100) -> np.ndarray:
         
-        # intial seed frame
+        # intial seed frame, kept when no later frame is valid
         ret, frame  = self.cam_capture.read()
         
-        best_frame = np.zeros_like(frame)
+        best_frame = frame if ret else None
         best_focus = -1
 
         for _ in range(iterations):
@@ -39,14 +60,24 @@ class BackgroundCameraService:
             current_focus = np.var(laplacian)             # Compute variance of Laplacian
 
             if current_focus > best_focus:
+                best_focus = current_focus
                 best_frame = copy.copy(frame)
         
         return best_frame    
 
     def exec_capture_frame(self) -> None:
-
-        # create camera device
-        self.cam_capture = cv.VideoCapture(self.camera_id)
+        self.capturing = True
+        try:
+            with CAPTURE_SECONDS.time(camera = self.task_id):
+                self.capture_frame()
+        finally:
+            self.capturing = False
+
+    def capture_frame(self) -> None:
+        capture_start = time.time()
+
+        # create camera device (or the virtual camera selected for this ID)
+        self.cam_capture = open_capture(self.camera_id)
         self.cam_capture.set(cv.CAP_PROP_FRAME_WIDTH,  2592) 
         self.cam_capture.set(cv.CAP_PROP_FRAME_HEIGHT, 1944)  
         self.cam_capture.set(cv.CAP_PROP_AUTOFOCUS,    1)     # Enable Autofocus
@@ -55,12 +86,22 @@ class BackgroundCameraService:
         ret, _  = self.cam_capture.read()
 
         # frame is valid
-        if ret:
-            best_frame = self.iterative_laplacian(7)
+        best_frame = self.iterative_laplacian(7) if ret else None
+        if best_frame is not None:
             best_frame = cv.flip(best_frame, 0) # flip vertical
             best_frame = cv.flip(best_frame, 1) # flip horizontal
-            cv.imwrite(self.fpath, best_frame)
+
+            # trace id and capture time travel inside the JPEG to the scanner
+            camera = os.path.splitext(os.path.basename(self.fpath))[0]
+            trace  = new_frame_trace(camera, capture_start)
+            ret, encoded = cv.imencode('.jpg', best_frame)
+            if ret:
+                write_traced_jpeg(self.fpath, encoded.tobytes(), trace)
+                CAPTURES_TOTAL.inc(camera = self.task_id)
+            else:
+                CAPTURE_FAILURES.inc(camera = self.task_id)
         else:
+            CAPTURE_FAILURES.inc(camera = self.task_id)
             print("Invalid Camera ! ->", self.camera_id)        
 
         # relese camera
@@ -78,8 +119,8 @@ class BackgroundCameraService:
             #print(f"Task {self.task_id} finished at: {time.ctime(end_time)}")
 
             # Calculate the next interval with randomness
-            interval = max(0, 5 + random.uniform(-1, 1))
-            time.sleep(interval)
+            interval = max(0, self.interval * random.uniform(0.8, 1.2))
+            self.stop_event.wait(interval)
 
     def start(self):
         self.thread.start()
@@ -87,8 +128,6 @@ class BackgroundCameraService:
     def stop(self):
         self.stop_event.set()
 
-import os
-
 class VideoPreviewService(QThread):
     frame_ready = pyqtSignal(QImage)
 
@@ -114,7 +153,8 @@ class VideoPreviewService(QThread):
             rgb_image = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
             h, w, ch = rgb_image.shape
             bytes_per_line = ch * w
-            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
+            # own copy, the numpy buffer is gone before the UI paints it
+            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888).copy()
             self.frame_ready.emit(qt_image)
             self.msleep(33) # ~30 fps
 
@@ -7,6 +7,14 @@ import random
 # local relative imports
 from scanner            import scan_camera
 from background_service import BackgroundCameraService
+from shelf_metrics      import MetricsServer
+from memory_budget      import MemoryMonitor
+
+# capture latency and failures per camera on 127.0.0.1
+METRICS_PORT = 9109
+
+# resident memory above which the server warns (MB, 0 disables)
+MEMORY_BUDGET_MB = 512
 
 if __name__ == "__main__":
     print("Background Camera Server System")
@@ -51,6 +59,17 @@ if __name__ == "__main__":
     
     print("All Service Is Running")
 
+    # RSS and full-resolution frames being captured, every minute
+    memory = MemoryMonitor('camera_server', MEMORY_BUDGET_MB)
+    memory.count('frames', lambda: sum(1 for x in running_services if x.capturing))
+    memory.start()
+
+    try:
+        metrics_server = MetricsServer(METRICS_PORT)
+        print(f"Metrics on: http://127.0.0.1:{METRICS_PORT}/metrics")
+    except OSError as e:
+        print(f"Metrics endpoint disabled: {e}")
+
     try:
         
         # Keep the main thread alive
@@ -4,7 +4,6 @@ import time
 import threading
 import subprocess
 import cv2 as cv
-import json
 import shutil
 from datetime import datetime
 from PyQt6.QtWidgets import (
@@ -17,6 +16,14 @@ from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt6.QtGui import QFont, QImage, QPixmap
 from scanner import scan_camera
 from background_service import BackgroundCameraService, VideoPreviewService
+from frame_trace import new_frame_trace, write_traced_jpeg
+from memory_budget import MemoryMonitor, MEMORY_CHECK_INTERVAL
+
+# activity log lines kept, older ones are dropped (the UI runs for days)
+LOG_MAX_LINES = 2000
+
+# resident memory above which the activity log shows a warning (MB)
+UI_MEMORY_BUDGET_MB = 1024
 
 class SetupFromVideoThread(QThread):
     status_updated = pyqtSignal(str)
@@ -167,17 +174,33 @@ class ScannerServiceThread(QThread):
             
             self.status_updated.emit("Importing utility functions...")
             from oliwo_weights.xcodiff import (
-                find_differences, get_matching_prod_names, grab_file_from_path
+                compare_frames, get_matching_prod_names, grab_file_from_path
             )
+            from oliwo_weights.xframe import FrameContext
+            from oliwo_weights.xstate import ShelfStateStore, STATE_CODES
+            from oliwo_weights.xstatedb import ShelfStateDB
+            from oliwo_weights.xhistory import TransitionHistory
             
             # Initialize the model - OliwoModel() takes no parameters
             self.status_updated.emit("Initializing OliwoModel...")
             self.oliwo_model = OliwoModel()
             
             # Store utility functions
-            self.find_differences = find_differences
+            self.compare_frames = compare_frames
             self.get_matching_prod_names = get_matching_prod_names
             self.grab_file_from_path = grab_file_from_path
+            self.FrameContext = FrameContext
+            self.STATE_CODES = STATE_CODES
+            
+            # Catalog and states cached in memory, written only on transitions
+            # to the state database shared with shelf_scan.py and the UIs; the
+            # cache is reloaded from the database whenever another process commits
+            app_root = os.path.dirname(self.product_state_dir)
+            self.shelf_states = ShelfStateStore(
+                self.product_info_dir, self.product_state_dir,
+                database=ShelfStateDB(os.path.join(app_root, 'shelf_state.db')),
+                history=TransitionHistory(os.path.join(app_root, 'state_history'))
+            )
             
             self.status_updated.emit("OliwoModel loaded successfully!")
             
@@ -230,22 +253,20 @@ class ScannerServiceThread(QThread):
                     current_frame_filename = f"{self.base_name}.jpg"
                     current_frame_path = os.path.join(self.devices_dir, current_frame_filename)
                     
-                    # Save current frame
+                    # Save current frame for the displays, inference uses the in-memory copy
                     cv.imwrite(current_frame_path, current_frame)
                     self.status_updated.emit(f"📸 Frame captured: {current_frame_filename}")
-                    
-                    # Wait a bit to ensure file is written
-                    time.sleep(0.5)
+                    frame = self.FrameContext.from_array(current_frame, self.base_name)
                     
                     # Perform inference and comparison
                     try:
-                        diff_boxes, pred_boxes = self.perform_inference(current_frame_path)
+                        diff_boxes, pred_boxes = self.perform_inference(current_frame_path, frame)
                         
                         # Update last_state AFTER inference is complete
                         self.update_last_state(current_frame_path)
                         
                         # Generate visual output
-                        self.generate_visual_output(current_frame_path, pred_boxes)
+                        self.generate_visual_output(current_frame_path, pred_boxes, frame)
                         
                         scan_count += 1
                         self.status_updated.emit(f"✅ Scan #{scan_count} completed - Found {len(pred_boxes)} objects")
@@ -297,7 +318,10 @@ class ScannerServiceThread(QThread):
                         current_frame_filename = f"{self.base_name}.jpg"
                         current_frame_path = os.path.join(self.devices_dir, current_frame_filename)
                         
-                        cv.imwrite(current_frame_path, current_frame)
+                        # capture trace for the scanner's latency report
+                        ret, encoded = cv.imencode('.jpg', current_frame)
+                        if ret:
+                            write_traced_jpeg(current_frame_path, encoded.tobytes(), new_frame_trace(self.base_name))
                         scan_count += 1
                         self.status_updated.emit(f"📸 Scan #{scan_count}: Frame saved for processing")
                         self.frame_saved.emit(current_frame_filename)
@@ -326,70 +350,62 @@ class ScannerServiceThread(QThread):
             except Exception as e:
                 self.status_updated.emit(f"⚠️ Error stopping subprocess: {e}")
 
-    def perform_inference(self, current_frame_path):
+    def perform_inference(self, current_frame_path, frame=None):
         """Perform object detection and state comparison"""
         try:
+            if frame is None:
+                frame = self.FrameContext(current_frame_path)
+            
             # Get paths
             _, base_name = self.grab_file_from_path(current_frame_path)
             previous_frame_path = os.path.join(self.last_state_dir, f"{base_name}.jpg")
             
             # Find differences between current and previous frame
             if os.path.exists(previous_frame_path):
-                diff_boxes = self.find_differences(previous_frame_path, current_frame_path)
+                diff_boxes, drifted = self.compare_frames(previous_frame_path, frame.bgr())
+                if drifted:
+                    # facings no longer line up, last_state is re-anchored after this
+                    self.status_updated.emit("📐 Camera drifted - product states kept, reference re-anchored")
+                    return [], []
                 self.status_updated.emit(f"🔄 Found {len(diff_boxes)} differences from previous state")
             else:
                 diff_boxes = []
                 self.status_updated.emit("📋 No previous state found - first scan")
             
             # Predict objects in current frame
-            latest_image = self.oliwo_model.load_image(current_frame_path)
-            pred_boxes = self.oliwo_model.predict(latest_image)
+            pred_boxes = self.oliwo_model.predict(frame.pil())
             self.status_updated.emit(f"🎯 Detected {len(pred_boxes)} objects")
             
-            # Load product information
-            prod_info_path = os.path.join(self.product_info_dir, f"{base_name}.json")
-            with open(prod_info_path, 'r') as f:
-                products_list = json.load(f)
-            
-            # Load current product state or create initial state
-            prod_state_path = os.path.join(self.product_state_dir, f"{base_name}.json")
-            if os.path.exists(prod_state_path):
-                with open(prod_state_path, 'r') as f:
-                    product_latest_state = json.load(f)
-            else:
-                # Create initial state (all products full)
-                product_latest_state = [
-                    {
-                        'name': x['name'],
-                        'coords': x['coords'],
-                        'state': 'full'
-                    }
-                    for x in products_list
-                ]
+            # Load product information (cached, current state or all full)
+            catalog = self.shelf_states.catalog(base_name)
+            if catalog is None:
+                raise FileNotFoundError(f"Product info file not found: {self.shelf_states.information_path(base_name)}")
+            products_list = catalog.products
+            new_codes = self.shelf_states.states(base_name).copy()
             
             # Get matching product names
-            img_diff_names = self.get_matching_prod_names(diff_boxes, products_list)
-            img_pred_names = self.get_matching_prod_names(pred_boxes, products_list)
+            img_diff_names = set(self.get_matching_prod_names(diff_boxes, products_list))
+            img_pred_names = set(self.get_matching_prod_names(pred_boxes, products_list))
             
             # Update product states
-            for i in range(len(product_latest_state)):
-                prod = product_latest_state[i]
-                prod_name = prod['name']
+            for i in range(len(products_list)):
+                prod_name = products_list[i]['name']
                 
-                exist_in_diff = any(xn == prod_name for xn in img_diff_names)
-                exist_in_pred = any(xn == prod_name for xn in img_pred_names)
+                exist_in_diff = prod_name in img_diff_names
+                exist_in_pred = prod_name in img_pred_names
                 
                 if exist_in_diff and exist_in_pred:
-                    product_latest_state[i]['state'] = 'reduced'
+                    new_codes[i] = self.STATE_CODES['reduced']
                 elif exist_in_diff and not exist_in_pred:
-                    product_latest_state[i]['state'] = 'empty'
+                    new_codes[i] = self.STATE_CODES['empty']
                 # If no change detected, keep previous state
             
-            # Save updated product state
-            with open(prod_state_path, 'w') as f:
-                json.dump(product_latest_state, f, indent=2)
-            
-            self.status_updated.emit(f"💾 Updated product states: {os.path.basename(prod_state_path)}")
+            # Save updated product state, only when something changed
+            transitions = self.shelf_states.apply(base_name, new_codes)
+            if transitions:
+                self.status_updated.emit(f"💾 Updated product states: {base_name}.json ({len(transitions)} changes)")
+            else:
+                self.status_updated.emit("💾 Product states unchanged")
             
             return diff_boxes, pred_boxes
             
@@ -410,7 +426,7 @@ class ScannerServiceThread(QThread):
         except Exception as e:
             self.status_updated.emit(f"❌ Error updating last_state: {e}")
     
-    def generate_visual_output(self, frame_path, pred_boxes):
+    def generate_visual_output(self, frame_path, pred_boxes, frame=None):
         """Generate visual output with bounding boxes"""
         try:
             if not pred_boxes:
@@ -418,10 +434,11 @@ class ScannerServiceThread(QThread):
                 
             _, base_name = self.grab_file_from_path(frame_path)
             
-            # Load image and create overlay
-            image = self.oliwo_model.load_image(frame_path)
+            # Reuse the decoded frame for the overlay
+            if frame is None:
+                frame = self.FrameContext(frame_path)
             overlayed = self.oliwo_model.overlay(
-                image, 
+                frame.pil(), 
                 pred_boxes,
                 fill_alpha=0,
                 line_width=5
@@ -529,6 +546,13 @@ class CameraServiceWindow(QMainWindow):
 
         self.init_ui()
 
+        # RSS against the budget, warnings go to the activity log
+        self.memory = MemoryMonitor('camera_service_ui', UI_MEMORY_BUDGET_MB)
+        self.memory.count('log_lines', lambda: self.status_log.document().blockCount())
+        self.memory_timer = QTimer()
+        self.memory_timer.timeout.connect(self.check_memory)
+        self.memory_timer.start(int(MEMORY_CHECK_INTERVAL * 1000))
+
     def init_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -639,6 +663,7 @@ class CameraServiceWindow(QMainWindow):
         self.status_log = QTextEdit()
         self.status_log.setMaximumHeight(200)
         self.status_log.setReadOnly(True)
+        self.status_log.document().setMaximumBlockCount(LOG_MAX_LINES)
         log_layout.addWidget(self.status_log)
 
         layout.addWidget(log_group)
@@ -841,7 +866,14 @@ class CameraServiceWindow(QMainWindow):
         timestamp = time.strftime("%H:%M:%S")
         self.status_log.append(f"[{timestamp}] {message}")
 
+    def check_memory(self):
+        _, *warnings = self.memory.check()
+        for line in warnings:
+            self.log_status(line)
+
     def closeEvent(self, event):
+        self.memory_timer.stop()
+
         # Stop all services before closing
         if self.scanner_thread and self.scanner_thread.isRunning():
             self.stop_scanner_service()
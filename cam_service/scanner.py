@@ -1,12 +1,15 @@
 import cv2 as cv
 
+from virtual_camera import open_capture, virtual_camera_ids
+
 def scan_camera(search_limit: int = 100) -> list[int]:
     valid_cameras: list[int] = []
-    for index in range(search_limit):
+    # virtual cameras (SHELF_VIRTUAL_CAMERAS) are found beyond the limit too
+    for index in sorted(set(range(search_limit)) | set(virtual_camera_ids())):
         print("Searching :", index, "->", flush=True, end=' ')
 
         # pakai CAP_V4L2 biar lebih stabil di Linux
-        cam_capture = cv.VideoCapture(index, cv.CAP_V4L2)
+        cam_capture = open_capture(index, cv.CAP_V4L2)
 
         # kasih waktu kamera init
         if cam_capture.isOpened():
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import cv2 as cv
+import numpy as np
+
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_shelf import SyntheticShelf, parse_resolution, FULL, REDUCED, EMPTY
+
+# JSON file selecting virtual cameras by camera ID, read on import
+VIRTUAL_CAMERAS_ENV = 'SHELF_VIRTUAL_CAMERAS'
+
+# settings of a virtual camera its config does not give
+VIRTUAL_DEFAULTS = {
+    'source'            : 'synthetic',  # synthetic shelf, or 'video'
+    'path'              : None,         # video file, played in a loop
+    'resolution'        : '1080p',      # name or WxH, None keeps the video size
+    'fps'               : 15.0,
+    'products'          : 48,           # synthetic shelf facings
+    'noise'             : 2.0,          # synthetic sensor noise (grey levels)
+    'change_every'      : 10.0,         # seconds between synthetic product changes (0: never)
+    'focus_frames'      : 4,            # blurred frames after opening or enabling autofocus
+    'focus_blur'        : 6.0,          # gaussian sigma of the first of them
+    'hunt_rate'         : 0.02,         # chance a later frame is blurred by focus hunting
+    'failure_rate'      : 0.01,         # chance a read fails
+    'open_failure_rate' : 0.0           # chance the device does not open
+}
+
+class VirtualScene:
+    """
+    What a virtual camera looks at, kept across opens like a real device:
+    a synthetic shelf (seeded by the camera ID) where one product changes
+    state every change_every seconds, or a looped video file, at the
+    configured resolution. The synthetic frame is rendered once per state.
+    """
+
+    def __init__(self, camera_id : int, config : dict[str, any]):
+        self.config = config
+        self.lock   = threading.Lock()
+        self.rng    = np.random.default_rng(camera_id)
+        self.size   = parse_resolution(config['resolution']) if config['resolution'] else None
+
+        self.video = None
+        self.shelf = None
+        if config['source'] == 'video':
+            self.video = cv.VideoCapture(config['path'])
+            if not self.video.isOpened():
+                raise ValueError(f"Cannot open video of virtual camera {camera_id}: {config['path']}")
+            if self.size is None:
+                self.size = (int(self.video.get(cv.CAP_PROP_FRAME_WIDTH)), int(self.video.get(cv.CAP_PROP_FRAME_HEIGHT)))
+        elif config['source'] == 'synthetic':
+            self.shelf = SyntheticShelf(self.size[0], self.size[1], config['products'], seed = camera_id)
+            self.codes = np.full(len(self.shelf), FULL, dtype = np.uint8)
+            self.rendered    = None
+            self.next_change = 0.0
+        else:
+            raise ValueError(f"Unknown virtual camera source: {config['source']}")
+
+    def frame(self) -> np.ndarray | None:
+        with self.lock:
+            if self.video is not None:
+                ret, frame = self.video.read()
+                if not ret:
+                    # end of the video, loop
+                    self.video.set(cv.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = self.video.read()
+                    if not ret:
+                        return None
+                if (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv.resize(frame, self.size, interpolation = cv.INTER_AREA)
+                return frame
+
+            now = time.time()
+            if self.rendered is None or (self.config['change_every'] and now >= self.next_change):
+                if self.rendered is not None:
+                    self.codes[self.rng.integers(len(self.codes))] = self.rng.choice((FULL, REDUCED, EMPTY))
+                self.rendered    = self.shelf.render(self.codes, noise = self.config['noise'], rng = self.rng)
+                self.next_change = now + self.config['change_every']
+            return self.rendered.copy()
+
+    def release(self) -> None:
+        if self.video is not None:
+            self.video.release()
+
+class VirtualCapture:
+    """
+    cv.VideoCapture stand-in for one virtual camera ID (isOpened, read,
+    set, get, release). Reads are paced to the configured fps; the first
+    focus_frames after opening or enabling autofocus get sharper one by
+    one, later frames are blurred now and then by focus hunting, and
+    reads fail at failure_rate, as with the USB cameras.
+    """
+
+    def __init__(self, scene : VirtualScene, config : dict[str, any]):
+        self.scene      = scene
+        self.config     = config
+        self.opened     = random.random() >= config['open_failure_rate']
+        self.interval   = 1.0 / config['fps'] if config['fps'] > 0 else 0.0
+        self.next_frame = time.perf_counter()
+        self.focus_left = config['focus_frames']
+        self.properties : dict[int, float] = {}
+
+    def isOpened(self) -> bool:
+        return self.opened
+
+    def set(self, prop : int, value : float) -> bool:
+        # the resolution is the configured one, like a camera picking its nearest mode
+        self.properties[prop] = value
+        if prop == cv.CAP_PROP_AUTOFOCUS and value:
+            self.focus_left = self.config['focus_frames']
+        return self.opened
+
+    def get(self, prop : int) -> float:
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return float(self.scene.size[0])
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return float(self.scene.size[1])
+        if prop == cv.CAP_PROP_FPS:
+            return float(self.config['fps'])
+        return float(self.properties.get(prop, 0.0))
+
+    def read(self) -> tuple[bool, np.ndarray | None]:
+        if not self.opened:
+            return (False, None)
+
+        # frames arrive at the camera rate, a slow reader does not queue them
+        now = time.perf_counter()
+        if self.next_frame > now:
+            time.sleep(self.next_frame - now)
+        self.next_frame = max(self.next_frame, now) + self.interval
+
+        if random.random() < self.config['failure_rate']:
+            return (False, None)
+        frame = self.scene.frame()
+        if frame is None:
+            return (False, None)
+
+        sigma = 0.0
+        if self.focus_left > 0:
+            sigma = self.config['focus_blur'] * self.focus_left / self.config['focus_frames']
+            self.focus_left -= 1
+        elif random.random() < self.config['hunt_rate']:
+            sigma = self.config['focus_blur'] * random.uniform(0.3, 1.0)
+        if sigma > 0:
+            frame = cv.GaussianBlur(frame, (0, 0), sigma)
+        return (True, frame)
+
+    def release(self) -> None:
+        self.opened = False
+
+_configs : dict[int, dict[str, any]] = {}
+_scenes  : dict[int, VirtualScene]   = {}
+_lock    = threading.Lock()
+
+def configure_virtual_cameras(config : dict[str, any]) -> list[int]:
+    """
+    Select virtual cameras: {"defaults": {...}, "count": N, "cameras":
+    {"<id>": {...}}}. count makes IDs 0..N-1 virtual with the defaults,
+    cameras adds or overrides single IDs (see VIRTUAL_DEFAULTS). Replaces
+    the previous selection; returns the virtual camera IDs.
+    """
+    defaults = {**VIRTUAL_DEFAULTS, **config.get('defaults', {})}
+    cameras  = {camera_id : {} for camera_id in range(config.get('count', 0))}
+    cameras.update({int(camera_id) : settings for camera_id, settings in config.get('cameras', {}).items()})
+
+    with _lock:
+        for scene in _scenes.values():
+            scene.release()
+        _scenes.clear()
+        _configs.clear()
+        _configs.update({camera_id : {**defaults, **settings} for camera_id, settings in cameras.items()})
+        return sorted(_configs)
+
+def load_virtual_cameras(path : str | None = None) -> list[int]:
+    # from the given JSON file, or the one named by SHELF_VIRTUAL_CAMERAS
+    path = path or os.environ.get(VIRTUAL_CAMERAS_ENV)
+    if not path:
+        return []
+    with open(path, 'r') as f:
+        return configure_virtual_cameras(json.load(f))
+
+def virtual_camera_ids() -> list[int]:
+    with _lock:
+        return sorted(_configs)
+
+def open_capture(camera_id : int, api : int | None = None):
+    # the virtual camera when this ID is selected, the real device otherwise
+    with _lock:
+        config = _configs.get(camera_id)
+        if config is not None and camera_id not in _scenes:
+            _scenes[camera_id] = VirtualScene(camera_id, config)
+        scene = _scenes.get(camera_id)
+
+    if config is None:
+        return cv.VideoCapture(camera_id) if api is None else cv.VideoCapture(camera_id, api)
+    return VirtualCapture(scene, config)
+
+load_virtual_cameras()
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import struct
+import threading
+
+# JPEG comment (COM) payload prefix carrying the capture trace
+TRACE_MARKER = b'shelf-trace:'
+
+# rotate the trace file (one .1 generation is kept) above this size
+TRACE_FILE_MAX_BYTES = 64 * 1024 * 1024
+
+def new_frame_trace(camera : str, capture_start : float | None = None, captured_at : float | None = None, source : str = 'capture') -> dict[str, any]:
+    captured_at = time.time() if captured_at is None else captured_at
+    return {
+        'trace_id'      : uuid.uuid4().hex[:16],
+        'camera'        : camera,
+        'capture_start' : captured_at if capture_start is None else capture_start,
+        'captured_at'   : captured_at,
+        'source'        : source
+    }
+
+def trace_comment(trace : dict[str, any]) -> bytes:
+    return TRACE_MARKER + json.dumps(trace, separators = (',', ':')).encode('utf-8')
+
+def embed_frame_trace(jpeg : bytes, trace : dict[str, any]) -> bytes:
+    # COM segment right after SOI, decoders skip it
+    payload = trace_comment(trace)
+    return jpeg[:2] + b'\xff\xfe' + struct.pack('>H', len(payload) + 2) + payload + jpeg[2:]
+
+def write_traced_jpeg(path : str, jpeg : bytes, trace : dict[str, any]) -> None:
+    # replaced atomically, the watcher reports the rename as a new frame
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(embed_frame_trace(jpeg, trace))
+    os.replace(tmp_path, path)
+
+def _trace_segment(data : bytes) -> tuple[int, int, dict[str, any] | None] | None:
+    # (start, end, trace) of the trace COM segment in the JPEG header
+    if data[:2] != b'\xff\xd8':
+        return None
+
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        # start of scan, no more header segments
+        if marker == 0xDA:
+            break
+        length = struct.unpack('>H', data[pos + 2 : pos + 4])[0]
+        if marker == 0xFE:
+            payload = data[pos + 4 : pos + 2 + length]
+            if payload.startswith(TRACE_MARKER):
+                try:
+                    trace = json.loads(payload[len(TRACE_MARKER):])
+                except ValueError:
+                    trace = None
+                return (pos, pos + 2 + length, trace)
+        pos += 2 + length
+    return None
+
+def parse_frame_trace(data : bytes) -> dict[str, any] | None:
+    segment = _trace_segment(data)
+    return segment[2] if segment is not None else None
+
+def strip_frame_trace(jpeg : bytes) -> bytes:
+    # the frame without its trace, ready for a new one (replays)
+    segment = _trace_segment(jpeg)
+    if segment is None:
+        return jpeg
+    return jpeg[:segment[0]] + jpeg[segment[1]:]
+
+def read_frame_trace(path : str, limit : int = 65536) -> dict[str, any] | None:
+    """
+    Capture trace of a JPEG written by write_traced_jpeg (or saved with
+    trace_comment), None when it has none. Only the header is read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(limit)
+    except OSError:
+        return None
+    return parse_frame_trace(data)
+
+class FrameTraceFile:
+    """
+    Per-frame spans in the Chrome trace event format (JSON array whose
+    closing bracket is optional), so the file opens in Perfetto or
+    chrome://tracing while it is still being appended to. Each camera is
+    a thread of one process; a "frame" span covers capture to visible
+    state and carries the end-to-end latency.
+    """
+
+    def __init__(self, path : str, max_bytes : int = TRACE_FILE_MAX_BYTES):
+        self.path      = path
+        self.max_bytes = max_bytes
+        self.lock      = threading.Lock()
+        self.named : set[str] = set()
+
+    def thread_id(self, camera : str) -> int:
+        return zlib.crc32(camera.encode('utf-8')) & 0x7FFFFFFF
+
+    def write_frame(self, trace : dict[str, any], spans : list[tuple[str, float, float]], visible_at : float | None, args : dict[str, any] | None = None) -> None:
+        camera = trace['camera']
+        tid    = self.thread_id(camera)
+        common = {'trace_id' : trace['trace_id'], 'camera' : camera, **(args or {})}
+
+        timeline = []
+        if trace['captured_at'] > trace['capture_start']:
+            timeline.append(('capture', trace['capture_start'], trace['captured_at']))
+        if spans:
+            # written, picked up by the watcher and queued until the first stage
+            timeline.append(('wait', trace['captured_at'], spans[0][1]))
+        timeline.extend(spans)
+
+        events = []
+        for name, start, end in timeline:
+            events.append({'name' : name, 'cat' : 'scan', 'ph' : 'X', 'pid' : 1, 'tid' : tid, 'ts' : start * 1e6, 'dur' : max(0.0, end - start) * 1e6, 'args' : common})
+        if visible_at is not None:
+            latency = visible_at - trace['captured_at']
+            events.append({'name' : 'frame', 'cat' : 'frame', 'ph' : 'X', 'pid' : 1, 'tid' : tid, 'ts' : trace['captured_at'] * 1e6, 'dur' : max(0.0, latency) * 1e6, 'args' : {**common, 'latency' : latency}})
+
+        with self.lock:
+            self.rotate()
+            new_file = not os.path.exists(self.path)
+            with open(self.path, 'a') as f:
+                if new_file:
+                    f.write("[\n")
+                    self.named.clear()
+                if camera not in self.named:
+                    self.named.add(camera)
+                    f.write(json.dumps({'name' : 'thread_name', 'ph' : 'M', 'pid' : 1, 'tid' : tid, 'args' : {'name' : camera}}) + ",\n")
+                for event in events:
+                    f.write(json.dumps(event) + ",\n")
+
+    def rotate(self) -> None:
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except OSError:
+            pass
+
+def load_frame_latencies(path : str, since : float | None = None) -> dict[str, list[float]]:
+    """
+    Capture -> visible latency in seconds per camera from a FrameTraceFile
+    (and its rotated .1 generation), frames captured at or after since.
+    """
+    latencies : dict[str, list[float]] = {}
+    for file in (f"{path}.1", path):
+        if not os.path.exists(file):
+            continue
+        with open(file, 'r') as f:
+            for line in f:
+                line = line.strip().rstrip(',')
+                if not line.startswith('{'):
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get('name') != 'frame':
+                    continue
+                if since is not None and event['ts'] / 1e6 < since:
+                    continue
+                latencies.setdefault(event['args']['camera'], []).append(event['args']['latency'])
+    return latencies
+
+def format_latency_report(latencies : dict[str, list[float]]) -> str:
+    def percentile(values : list[float], q : float) -> float:
+        index = min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))
+        return values[index]
+
+    lines = [f"{'Camera':<28} {'Frames':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'Max s':>7}"]
+    for camera in sorted(latencies.keys()):
+        values = sorted(latencies[camera])
+        if not values:
+            continue
+        lines.append(
+            f"{camera:<28} {len(values):>7} {percentile(values, 50):>7.2f} {percentile(values, 95):>7.2f} "
+            f"{percentile(values, 99):>7.2f} {values[-1]:>7.2f}"
+        )
+    return "\n".join(lines)
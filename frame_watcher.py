@@ -0,0 +1,213 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from typing import NamedTuple
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_NONBLOCK    = 0x00000800
+IN_CLOEXEC     = 0x00080000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+class FrameEvent(NamedTuple):
+    path     : str    # full path of the frame file
+    camera   : str    # file name without extension
+    sequence : int    # frames seen for this file since the watcher started
+    mtime    : float  # modification time when the event was delivered
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+_libc = _load_libc()
+
+class FrameWatcher:
+    """
+    Debounced "frame ready" events for image files in one directory.
+    Uses inotify (close-after-write and rename-into) on Linux and falls back
+    to a scandir mtime poll elsewhere or when the directory is missing.
+    New files are reported as they appear; existing files are reported once
+    on the first wait() when emit_existing is set.
+    """
+
+    def __init__(self, directory : str, extensions : tuple[str, ...] = ('.jpg',), debounce : float = 0.2, poll_interval : float = 1.0, emit_existing : bool = True, use_inotify : bool = True):
+        self.directory     = os.path.abspath(directory)
+        self.extensions    = tuple(x.lower() for x in extensions)
+        self.debounce      = debounce
+        self.poll_interval = poll_interval
+
+        self.sequence : dict[str, int]   = {}
+        self.known    : dict[str, float] = {}
+        self.pending  : dict[str, float] = {}
+
+        self.fd = None
+        self.wd = None
+        self.use_inotify = use_inotify and _libc is not None
+        self.next_poll   = 0.0
+
+        # arm inotify first so no write between scan and watch is missed
+        self._arm()
+        self._scan(mark_pending = emit_existing)
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self.wd is not None else 'polling'
+
+    def _matches(self, name : str) -> bool:
+        return name.lower().endswith(self.extensions)
+
+    def _arm(self) -> bool:
+        if not self.use_inotify or not os.path.isdir(self.directory):
+            return False
+
+        if self.fd is None:
+            fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                self.use_inotify = False
+                return False
+            self.fd = fd
+
+        wd = _libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(self.directory),
+            IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+        )
+        if wd < 0:
+            return False
+        self.wd = wd
+        return True
+
+    def _scan(self, mark_pending : bool) -> None:
+        # mtime poll, also used to resync after the watch was lost
+        now = time.monotonic()
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+
+        for entry in entries:
+            if not self._matches(entry.name):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if self.known.get(entry.path) != mtime:
+                self.known[entry.path] = mtime
+                if mark_pending:
+                    self.pending[entry.path] = now
+
+    def _read_inotify(self) -> None:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return
+            raise
+
+        now = time.monotonic()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b'\0').decode(errors = 'replace')
+            offset += name_len
+
+            # directory removed or replaced, fall back to polling until it returns
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self.wd = None
+                continue
+
+            # kernel queue overflowed, resync from the directory
+            if mask & IN_Q_OVERFLOW:
+                self._scan(mark_pending = True)
+                continue
+
+            if name and self._matches(name):
+                self.pending[os.path.join(self.directory, name)] = now
+
+    def _ready_events(self) -> list[FrameEvent]:
+        now = time.monotonic()
+        ready = [path for path, seen in self.pending.items() if now - seen >= self.debounce]
+
+        events = []
+        for path in sorted(ready, key = lambda x: os.path.basename(x).lower()):
+            del self.pending[path]
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                # removed before it settled
+                self.known.pop(path, None)
+                continue
+
+            self.known[path] = mtime
+            self.sequence[path] = self.sequence.get(path, 0) + 1
+            camera = os.path.splitext(os.path.basename(path))[0]
+            events.append(FrameEvent(path, camera, self.sequence[path], mtime))
+        return events
+
+    def files(self) -> list[str]:
+        return sorted(self.known.keys(), key = lambda x: os.path.basename(x).lower())
+
+    def wait(self, timeout : float | None = None) -> list[FrameEvent]:
+        """
+        Block until at least one frame settled or the timeout expired.
+        timeout = 0 polls without blocking.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            now = time.monotonic()
+
+            # watch lost or never armed: poll and keep trying to re-arm
+            if self.wd is None and now >= self.next_poll:
+                self._arm()
+                self._scan(mark_pending = True)
+                self.next_poll = now + self.poll_interval
+
+            events = self._ready_events()
+            if events:
+                return events
+
+            if deadline is not None and now >= deadline:
+                return []
+
+            # sleep until the next debounce expiry, poll or deadline
+            wake = [now + self.poll_interval] if self.wd is None else []
+            if self.pending:
+                wake.append(min(self.pending.values()) + self.debounce)
+            if deadline is not None:
+                wake.append(deadline)
+            delay = max(0.0, min(wake) - now) if wake else None
+
+            if self.wd is not None:
+                readable, _, _ = select.select([self.fd], [], [], delay)
+                if readable:
+                    self._read_inotify()
+            else:
+                time.sleep(delay if delay is not None else self.poll_interval)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.wd = None
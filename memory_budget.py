@@ -0,0 +1,203 @@
+import gc
+import json
+import time
+import threading
+import tracemalloc
+
+from shelf_metrics import REGISTRY, resident_memory_bytes
+
+# seconds between memory checks of a running service
+MEMORY_CHECK_INTERVAL = 60.0
+
+# allocation sites listed per tracemalloc snapshot
+TOP_ALLOCATORS = 10
+
+# soak test: one memory sample per this many scans
+SOAK_EVERY = 1000
+
+# a budget warning repeats only after RSS grew this much further
+BUDGET_WARN_STEP = 1.1
+
+def freeze_after_load() -> int:
+    """
+    Move everything allocated so far (model weights, imports) to the
+    permanent generation so full collections stop traversing it. Returns
+    the number of frozen objects.
+    """
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+def format_bytes(value : float | None) -> str:
+    if value is None:
+        return 'n/a'
+    return f"{value / (1024 * 1024):.1f} MB"
+
+class MemoryMonitor:
+    """
+    Memory accounting of one service: resident size against an optional
+    budget, live object counts supplied by callbacks (frame buffers, queued
+    jobs) and, with trace_frames > 0, the tracemalloc allocation sites that
+    grew most since the previous check. check() takes one sample; start()
+    runs it periodically in a daemon thread for services without an event
+    loop, the Qt UIs call it from a timer instead.
+    """
+
+    def __init__(self, service : str, budget_mb : float = 0.0, trace_frames : int = 0, top : int = TOP_ALLOCATORS, log_path : str | None = None):
+        self.service  = service
+        self.budget   = budget_mb * 1024 * 1024 if budget_mb else None
+        self.top      = top
+        self.log_path = log_path
+        self.counts   : dict[str, any] = {}
+
+        self.warned_at : float | None = None
+        self.peak      = 0.0
+        self.snapshot  = None
+        if trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(trace_frames)
+
+        if self.budget is not None:
+            REGISTRY.gauge('process_memory_budget_bytes', 'Configured memory budget in bytes').set(self.budget, service = service)
+        REGISTRY.gauge('process_live_objects', 'Live objects tracked by the memory monitor', lambda: [
+            ({'service' : self.service, 'kind' : name}, float(value[0] if isinstance(value, tuple) else value))
+            for name, value in self.live_objects().items() if not isinstance(value, str)
+        ])
+
+        self.stop_event = threading.Event()
+        self.thread     = None
+
+    def count(self, name : str, callback) -> None:
+        # callback returns a count, or (count, bytes)
+        self.counts[name] = callback
+
+    def live_objects(self) -> dict[str, any]:
+        live = {}
+        for name, callback in list(self.counts.items()):
+            try:
+                live[name] = callback()
+            except Exception as e:
+                live[name] = f"error: {e}"
+        return live
+
+    def top_allocators(self) -> list[str]:
+        # growth per allocation site since the previous call (first call: largest sites)
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+        ))
+        if self.snapshot is None:
+            stats = [f"{format_bytes(x.size):>10} {x.count:>8} blocks  {x.traceback}" for x in snapshot.statistics('lineno')[:self.top]]
+        else:
+            stats = [f"{x.size_diff / (1024 * 1024):>+9.1f}MB {x.count_diff:>+8} blocks  {x.traceback}" for x in snapshot.compare_to(self.snapshot, 'lineno')[:self.top]]
+        self.snapshot = snapshot
+        return stats
+
+    def check(self) -> list[str]:
+        """
+        One memory sample; returns the lines to report (always the RSS line,
+        plus a warning and the top allocators when over budget; allocators
+        are always included when logging to a file).
+        """
+        rss  = resident_memory_bytes()
+        live = self.live_objects()
+        self.peak = max(self.peak, rss or 0.0)
+
+        live_text = ', '.join(
+            f"{name} {value[0]} ({format_bytes(value[1])})" if isinstance(value, tuple) else f"{name} {value}"
+            for name, value in live.items()
+        )
+        lines = [f"Memory [{self.service}]: RSS {format_bytes(rss)}, peak {format_bytes(self.peak)}" + (f", {live_text}" if live_text else '')]
+
+        over = self.budget is not None and rss is not None and rss > self.budget
+        if over and (self.warned_at is None or rss > self.warned_at * BUDGET_WARN_STEP):
+            self.warned_at = rss
+            lines.append(f"WARNING: {self.service} is over its memory budget: {format_bytes(rss)} > {format_bytes(self.budget)}")
+        elif not over:
+            self.warned_at = None
+
+        allocators = self.top_allocators()
+        if allocators and (over or self.log_path is not None):
+            lines.append("Top allocators:")
+            lines.extend(f"  {x}" for x in allocators)
+
+        if self.log_path is not None:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps({
+                    'ts'         : time.time(),
+                    'service'    : self.service,
+                    'rss'        : rss,
+                    'budget'     : self.budget,
+                    'live'       : {x : list(y) if isinstance(y, tuple) else y for x, y in live.items()},
+                    'allocators' : allocators
+                }) + "\n")
+        return lines
+
+    def start(self, interval : float = MEMORY_CHECK_INTERVAL, output = print) -> None:
+        def loop():
+            while not self.stop_event.wait(interval):
+                for line in self.check():
+                    output(line)
+
+        self.thread = threading.Thread(target = loop, name = 'memory-monitor', daemon = True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.stop_event.set()
+
+class SoakTracker:
+    """
+    Memory growth over a soak test: after every `every` scans the garbage
+    is collected and RSS (and the tracemalloc total, when tracing) is
+    recorded. Growth is the least-squares slope per `every` scans over the
+    samples after the first, which absorbs warm-up (caches, lazy imports).
+    """
+
+    def __init__(self, every : int = SOAK_EVERY):
+        self.every   = every
+        self.samples : list[tuple[int, float, float | None]] = []
+        self.next_at = every
+
+    def record(self, scans : int) -> str | None:
+        if scans < self.next_at:
+            return None
+        self.next_at = (scans // self.every + 1) * self.every
+
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.samples.append((scans, resident_memory_bytes() or 0.0, traced))
+
+        growth = self.growth()
+        return (
+            f"Soak: {scans} scans, RSS {format_bytes(self.samples[-1][1])}"
+            + (f", traced {format_bytes(traced)}" if traced is not None else '')
+            + (f", growth {growth / 1024:+.0f} KB per {self.every} scans" if growth is not None else '')
+        )
+
+    def growth(self, column : int = 1) -> float | None:
+        # bytes per `every` scans, None until three samples exist
+        points = [(x[0], x[column]) for x in self.samples[1:] if x[column] is not None]
+        if len(points) < 2:
+            return None
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x  = sum((x - mean_x) ** 2 for x, _ in points)
+        if var_x == 0:
+            return None
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+        return slope * self.every
+
+def format_soak_report(tracker : SoakTracker) -> str:
+    lines = [f"{'Scans':>8} {'RSS MB':>9} {'Traced MB':>10}"]
+    for scans, rss, traced in tracker.samples:
+        lines.append(f"{scans:>8} {rss / (1024 * 1024):>9.1f} {traced / (1024 * 1024) if traced is not None else float('nan'):>10.1f}")
+
+    rss_growth    = tracker.growth(1)
+    traced_growth = tracker.growth(2)
+    if rss_growth is None:
+        lines.append(f"Growth: not enough samples (needs {3 * tracker.every} scans)")
+    else:
+        lines.append(f"Growth per {tracker.every} scans: RSS {rss_growth / 1024:+.0f} KB" + (f", traced {traced_growth / 1024:+.0f} KB" if traced_growth is not None else ''))
+    return "\n".join(lines)
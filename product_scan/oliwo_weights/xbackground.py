@@ -0,0 +1,158 @@
+import os
+import cv2   as cv
+import numpy as np
+
+from oliwo_weights.xcodiff import (
+    boxes_from_mask,
+    register_to_reference,
+    mask_shift_border,
+    MAX_DRIFT_PX
+)
+
+class BackgroundModel:
+    """
+    Running-average background with per-pixel variance at the diff resolution.
+    A pixel is foreground when it departs from the mean by more than
+    max(threshold_value, sigma_factor * sigma), after removing the global
+    brightness shift so auto-exposure flicker does not trigger diffs.
+    """
+
+    def __init__(self, learning_rate : float = 0.05, threshold_value : int = 30, sigma_factor : float = 3.0, min_area : int = 16, register : bool = True, max_drift : float = MAX_DRIFT_PX):
+        self.learning_rate   = learning_rate
+        self.threshold_value = threshold_value
+        self.sigma_factor    = sigma_factor
+        self.min_area        = min_area
+        self.register        = register
+        self.max_drift       = max_drift
+
+        self.mean  : np.ndarray | None = None
+        self.var   : np.ndarray | None = None
+        self.count : int = 0
+
+        # last compared frame, committed after the scan is processed
+        self.pending_gray : np.ndarray | None = None
+        self.pending_mask : np.ndarray | None = None
+
+        # speckle removal for the foreground mask
+        self.kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (3, 3))
+
+    def is_ready(self) -> bool:
+        return self.mean is not None
+
+    def initialize(self, gray : np.ndarray) -> None:
+        self.mean  = gray.astype(np.float32)
+        self.var   = np.full(gray.shape, (self.threshold_value / self.sigma_factor) ** 2, dtype = np.float32)
+        self.count = 1
+
+    def foreground_mask(self, gray : np.ndarray) -> np.ndarray:
+        delta = gray.astype(np.float32) - self.mean
+
+        # remove global brightness shift (exposure / lighting flicker)
+        delta -= float(np.median(delta))
+
+        # adaptive per-pixel threshold
+        limit = np.maximum(self.threshold_value, self.sigma_factor * np.sqrt(self.var))
+        mask  = (np.abs(delta) > limit).astype(np.uint8) * 255
+
+        # drop isolated noisy pixels
+        return cv.morphologyEx(mask, cv.MORPH_OPEN, self.kernel)
+
+    def find_changes(self, gray : np.ndarray) -> list[tuple[int, int, int, int]]:
+        return self.compare(gray)[0]
+
+    def compare(self, gray : np.ndarray) -> tuple[list[tuple[int, int, int, int]], bool]:
+        # (foreground boxes, camera drifted beyond max_drift)
+        if not self.is_ready() or gray.shape != self.mean.shape:
+            print("Background model not ready or size changed, re-initializing")
+            self.initialize(gray)
+            self.pending_gray, self.pending_mask = None, None
+            return ([], False)
+
+        # absorb camera shake against the background mean
+        shift = (0.0, 0.0)
+        if self.register:
+            aligned, shift = register_to_reference(self.mean.astype(np.uint8), gray, self.max_drift)
+            if aligned is None:
+                print(f"Camera drift ({shift[0]:.1f}, {shift[1]:.1f}) px exceeds {self.max_drift} px, re-anchoring background")
+                self.initialize(gray)
+                self.pending_gray, self.pending_mask = None, None
+                return ([], True)
+            gray = aligned
+
+        mask = mask_shift_border(self.foreground_mask(gray), shift)
+        self.pending_gray, self.pending_mask = gray, mask
+        return (boxes_from_mask(mask, min_area = self.min_area), False)
+
+    def commit(self) -> bool:
+        # absorb the last compared frame, like copying it to last_state
+        if self.pending_gray is None:
+            return False
+        self.update(self.pending_gray, self.pending_mask)
+        self.pending_gray, self.pending_mask = None, None
+        return True
+
+    def update(self, gray : np.ndarray, mask : np.ndarray | None = None) -> None:
+        if not self.is_ready() or gray.shape != self.mean.shape:
+            self.initialize(gray)
+            return
+
+        frame = gray.astype(np.float32)
+        delta = frame - self.mean
+        alpha = self.learning_rate
+
+        # slowly follow the background everywhere
+        self.mean += alpha * delta
+        self.var   = (1.0 - alpha) * self.var + alpha * (delta * delta)
+
+        # processed changes become the new background at once
+        if mask is not None:
+            changed = mask > 0
+            self.mean[changed] = frame[changed]
+
+        self.count += 1
+
+    def save(self, fpath : str) -> None:
+        if not self.is_ready():
+            return
+
+        # write atomically so readers never see a partial snapshot
+        os.makedirs(os.path.dirname(fpath), exist_ok = True)
+        tmp_path = f"{fpath}.tmp.npz"
+        np.savez_compressed(tmp_path, mean = self.mean, var = self.var, count = np.array(self.count))
+        os.replace(tmp_path, fpath)
+
+    def load(self, fpath : str) -> bool:
+        if not os.path.exists(fpath):
+            return False
+        try:
+            with np.load(fpath) as data:
+                self.mean  = data['mean'].astype(np.float32)
+                self.var   = data['var'].astype(np.float32)
+                self.count = int(data['count'])
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNING: Could not load background model {fpath}: {e}")
+            self.mean, self.var, self.count = None, None, 0
+            return False
+
+def new_trigger_stats() -> dict[str, int]:
+    return {
+        'scans'          : 0,  # scans performed for this camera
+        'triggers'       : 0,  # scans where a product facing looked changed
+        'false_triggers' : 0   # triggered scans that changed no product state
+    }
+
+def record_trigger(stats : dict[str, int], changed_facings : int, state_changes : int) -> None:
+    stats['scans'] += 1
+    if changed_facings > 0:
+        stats['triggers'] += 1
+        if state_changes == 0:
+            stats['false_triggers'] += 1
+
+def format_trigger_report(trigger_stats : dict[str, dict[str, int]]) -> str:
+    lines = [f"{'Camera':<28} {'Scans':>6} {'Triggers':>9} {'False':>6} {'False %':>8}"]
+    for base_name in sorted(trigger_stats.keys()):
+        stats = trigger_stats[base_name]
+        rate  = 100.0 * stats['false_triggers'] / stats['triggers'] if stats['triggers'] else 0.0
+        lines.append(f"{base_name:<28} {stats['scans']:>6} {stats['triggers']:>9} {stats['false_triggers']:>6} {rate:>8.1f}")
+    return "\n".join(lines)
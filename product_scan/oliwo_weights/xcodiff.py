@@ -3,59 +3,197 @@ import shutil
 import cv2   as cv
 import numpy as np
 
-def find_differences(refrence_image_path : str, latest_image_path : str, threshold_value : int = 30):
-    
-    # Load the two images
-    image1 = cv.imread(refrence_image_path)
-    image2 = cv.imread(latest_image_path)
+# diff stage works on 1/4 of the original resolution
+DIFF_SCALE = 0.25
 
-    # Check if images are loaded successfully
-    if image1 is None or image2 is None:
-        print(f"Error: Could not read one or both images.\n  image1: {refrence_image_path}\n  image2: {latest_image_path}")
-        return []
+# camera shake compensation, in pixels at the diff resolution
+MAX_DRIFT_PX          = 12.0   # larger shifts re-anchor the reference
+MIN_SHIFT_PX          = 0.5    # smaller shifts are not worth a warp
+MIN_REGISTRATION_PEAK = 0.05   # weaker phase correlation peaks are ignored
 
-    # Ensure the images are the same size
-    if image1.shape != image2.shape:
-        print("Images must be of the same dimensions")
-        return []
+# hanning windows per diff resolution
+_hanning_windows : dict[tuple[int, int], np.ndarray] = {}
 
-    original_height, original_width = image1.shape[:2]
+def downscale_gray(image : np.ndarray, scale : float = DIFF_SCALE) -> np.ndarray:
+    original_height, original_width = image.shape[:2]
 
     # Resize images to 1/4 of their original dimensions
-    width  = int(original_width * 0.25)
-    height = int(original_height * 0.25)
+    # rounded up like libjpeg reduced decoding, so both paths agree
+    width  = int(np.ceil(original_width * scale))
+    height = int(np.ceil(original_height * scale))
     dim = (width, height)
 
-    image1_resized = cv.resize(image1, dim, interpolation=cv.INTER_AREA)
-    image2_resized = cv.resize(image2, dim, interpolation=cv.INTER_AREA)
+    image_resized = cv.resize(image, dim, interpolation=cv.INTER_AREA)
 
     # Convert images to grayscale
-    gray1 = cv.cvtColor(image1_resized, cv.COLOR_BGR2GRAY)
-    gray2 = cv.cvtColor(image2_resized, cv.COLOR_BGR2GRAY)
+    if image_resized.ndim == 3:
+        return cv.cvtColor(image_resized, cv.COLOR_BGR2GRAY)
+    return image_resized
 
-    # Compute the absolute difference between the two images
-    diff = cv.absdiff(gray1, gray2)
+# libjpeg DCT scaling, decodes straight to reduced grayscale
+REDUCED_GRAYSCALE_FLAGS = {
+    0.5   : cv.IMREAD_REDUCED_GRAYSCALE_2,
+    0.25  : cv.IMREAD_REDUCED_GRAYSCALE_4,
+    0.125 : cv.IMREAD_REDUCED_GRAYSCALE_8
+}
 
-    # Threshold the difference image to get the regions with significant differences
-    _, threshold = cv.threshold(diff, threshold_value, 255, cv.THRESH_BINARY)
+def load_diff_gray(image_path : str, scale : float = DIFF_SCALE) -> np.ndarray | None:
+
+    # never materialize the full resolution frame when libjpeg can scale
+    reduced_flag = REDUCED_GRAYSCALE_FLAGS.get(scale)
+    if reduced_flag is not None:
+        return cv.imread(image_path, reduced_flag)
+
+    image = cv.imread(image_path)
+    if image is None:
+        return None
+    return downscale_gray(image, scale)
+
+def decode_diff_gray(data : bytes, scale : float = DIFF_SCALE) -> np.ndarray | None:
+    # load_diff_gray for a JPEG already read into memory
+    buffer = np.frombuffer(data, dtype = np.uint8)
+    reduced_flag = REDUCED_GRAYSCALE_FLAGS.get(scale)
+    if reduced_flag is not None:
+        return cv.imdecode(buffer, reduced_flag)
+
+    image = cv.imdecode(buffer, cv.IMREAD_COLOR)
+    if image is None:
+        return None
+    return downscale_gray(image, scale)
+
+def as_diff_gray(image : str | np.ndarray, scale : float = DIFF_SCALE) -> np.ndarray | None:
+    # paths are decoded at reduced scale, arrays are full resolution frames
+    if isinstance(image, np.ndarray):
+        return downscale_gray(image, scale)
+    return load_diff_gray(image, scale)
+
+def boxes_from_mask(mask : np.ndarray, scale : float = DIFF_SCALE, min_area : int = 0) -> list[tuple[int, int, int, int]]:
 
     # Find contours of the regions with differences
-    contours, _ = cv.findContours(threshold, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv.findContours(mask, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
 
     # Scale the bounding boxes back to the original image dimensions
+    factor = 1.0 / scale
     bounding_boxes = []
     for contour in contours:
         (x, y, w, h) = cv.boundingRect(contour)
+
+        # skip speckles
+        if w * h < min_area:
+            continue
         
         # Scale the coordinates back to the original image size
-        x1 = int(x * 4)
-        y1 = int(y * 4)
-        x2 = int((x + w) * 4)
-        y2 = int((y + h) * 4)
+        x1 = int(x * factor)
+        y1 = int(y * factor)
+        x2 = int((x + w) * factor)
+        y2 = int((y + h) * factor)
         bounding_boxes.append((x1, y1, x2, y2))
 
     return bounding_boxes
 
+def estimate_shift(reference_gray : np.ndarray, latest_gray : np.ndarray) -> tuple[float, float, float]:
+    height, width = reference_gray.shape[:2]
+
+    # window reduces FFT edge effects, cached per resolution
+    window = _hanning_windows.get((width, height))
+    if window is None:
+        window = cv.createHanningWindow((width, height), cv.CV_32F)
+        _hanning_windows[(width, height)] = window
+
+    (dx, dy), response = cv.phaseCorrelate(
+        reference_gray.astype(np.float32), 
+        latest_gray.astype(np.float32), 
+        window
+    )
+    return (dx, dy, response)
+
+def register_to_reference(reference_gray : np.ndarray, latest_gray : np.ndarray, max_drift : float = MAX_DRIFT_PX) -> tuple[np.ndarray | None, tuple[float, float]]:
+    """
+    Align the latest frame onto the reference with FFT phase correlation.
+    Returns (aligned_latest, (dx, dy)); aligned_latest is None when the drift
+    exceeds max_drift and the reference should be re-anchored instead.
+    """
+    dx, dy, response = estimate_shift(reference_gray, latest_gray)
+
+    # unreliable or negligible shift, diff as is
+    if response < MIN_REGISTRATION_PEAK or np.hypot(dx, dy) < MIN_SHIFT_PX:
+        return latest_gray, (0.0, 0.0)
+
+    # camera moved too far, comparing would flag the whole shelf
+    if np.hypot(dx, dy) > max_drift:
+        return None, (dx, dy)
+
+    # shift the latest frame back onto the reference
+    height, width = latest_gray.shape[:2]
+    matrix  = np.float32([[1, 0, -dx], [0, 1, -dy]])
+    aligned = cv.warpAffine(latest_gray, matrix, (width, height), flags = cv.INTER_LINEAR, borderMode = cv.BORDER_REPLICATE)
+    return aligned, (dx, dy)
+
+def mask_shift_border(mask : np.ndarray, shift : tuple[float, float]) -> np.ndarray:
+    # pixels shifted in from outside the frame are not real changes
+    pad_x = int(np.ceil(abs(shift[0])))
+    pad_y = int(np.ceil(abs(shift[1])))
+    if pad_x > 0:
+        mask[:, :pad_x]  = 0
+        mask[:, -pad_x:] = 0
+    if pad_y > 0:
+        mask[:pad_y, :]  = 0
+        mask[-pad_y:, :] = 0
+    return mask
+
+def find_differences(refrence_image : str | np.ndarray, latest_image : str | np.ndarray, threshold_value : int = 30, register : bool = True, max_drift : float = MAX_DRIFT_PX):
+    return compare_frames(refrence_image, latest_image, threshold_value, register, max_drift)[0]
+
+def compare_frames(refrence_image : str | np.ndarray, latest_image : str | np.ndarray, threshold_value : int = 30, register : bool = True, max_drift : float = MAX_DRIFT_PX) -> tuple[list[tuple[int, int, int, int]], bool]:
+    
+    # Load the two images at 1/4 scale grayscale
+    gray1 = as_diff_gray(refrence_image)
+    gray2 = as_diff_gray(latest_image)
+
+    # Check if images are loaded successfully
+    if gray1 is None or gray2 is None:
+        print(f"Error: Could not read one or both images.\n  image1: {describe_image(refrence_image)}\n  image2: {describe_image(latest_image)}")
+        return ([], False)
+
+    return compare_gray_frames(gray1, gray2, threshold_value, register, max_drift)
+
+def describe_image(image : str | np.ndarray) -> str:
+    if isinstance(image, np.ndarray):
+        return f"array {image.shape}"
+    return image
+
+def diff_gray_frames(reference_gray : np.ndarray, latest_gray : np.ndarray, threshold_value : int = 30, register : bool = True, max_drift : float = MAX_DRIFT_PX):
+    return compare_gray_frames(reference_gray, latest_gray, threshold_value, register, max_drift)[0]
+
+def compare_gray_frames(reference_gray : np.ndarray, latest_gray : np.ndarray, threshold_value : int = 30, register : bool = True, max_drift : float = MAX_DRIFT_PX) -> tuple[list[tuple[int, int, int, int]], bool]:
+    """
+    Difference boxes and whether the camera drifted more than max_drift.
+    A drifted frame cannot be compared (no boxes): the caller re-anchors
+    the reference and keeps the previous product states.
+    """
+
+    # Ensure the images are the same size
+    if reference_gray.shape != latest_gray.shape:
+        print("Images must be of the same dimensions")
+        return ([], False)
+
+    # absorb camera shake before comparing
+    shift = (0.0, 0.0)
+    if register:
+        latest_gray, shift = register_to_reference(reference_gray, latest_gray, max_drift)
+        if latest_gray is None:
+            print(f"Camera drift ({shift[0]:.1f}, {shift[1]:.1f}) px exceeds {max_drift} px, re-anchoring reference")
+            return ([], True)
+
+    # Compute the absolute difference between the two images
+    diff = cv.absdiff(reference_gray, latest_gray)
+
+    # Threshold the difference image to get the regions with significant differences
+    _, threshold = cv.threshold(diff, threshold_value, 255, cv.THRESH_BINARY)
+    threshold = mask_shift_border(threshold, shift)
+
+    return (boxes_from_mask(threshold), False)
+
 def find_jpg_images(directory) -> list[str]:
     jpg_images : list[str] = []
     for root, _, files in os.walk(directory):
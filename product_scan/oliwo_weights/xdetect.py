@@ -0,0 +1,189 @@
+import abc
+import json
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps
+
+# sliced inference layout (pixels, overlap ratio), as in OliwoModel.predict
+SLICE_SIZE    = 512
+SLICE_OVERLAP = 0.45
+
+# detector backends, see load_detector
+DETECTORS = ('oliwo', 'mock')
+
+# coverage mask resolution in pixels
+COVERAGE_CELL = 8
+
+class PartialPrediction:
+    """
+    Detections from the slices processed before a deadline.
+    coverage is the fraction of the frame inside processed slices; a box is
+    covered only when every part of it was inside some processed slice.
+    """
+
+    def __init__(self, boxes : list[list[int]], slices : list[list[int]], total_slices : int, image_size : tuple[int, int], elapsed : float):
+        self.boxes        = boxes
+        self.slices       = slices
+        self.total_slices = total_slices
+        self.elapsed      = elapsed
+
+        width, height = image_size
+        self.mask = np.zeros((-(-height // COVERAGE_CELL), -(-width // COVERAGE_CELL)), dtype = bool)
+        for x0, y0, x1, y1 in slices:
+            self.mask[y0 // COVERAGE_CELL : -(-y1 // COVERAGE_CELL), x0 // COVERAGE_CELL : -(-x1 // COVERAGE_CELL)] = True
+
+    @property
+    def complete(self) -> bool:
+        return len(self.slices) == self.total_slices
+
+    @property
+    def coverage(self) -> float:
+        return float(self.mask.mean()) if self.mask.size else 0.0
+
+    def covers(self, box : list[int]) -> bool:
+        if self.complete:
+            return True
+        x0, y0, x1, y1 = [int(v) for v in box]
+        cells = self.mask[
+            max(0, y0) // COVERAGE_CELL : -(-max(0, y1) // COVERAGE_CELL),
+            max(0, x0) // COVERAGE_CELL : -(-max(0, x1) // COVERAGE_CELL)
+        ]
+        return cells.size > 0 and bool(cells.all())
+
+def order_slices(slices : list[list[int]], focus : list[list[int]] | None) -> list[list[int]]:
+    # slices holding whole focus regions first, then by focus overlap, then raster order
+    if not focus:
+        return list(slices)
+
+    def rank(item):
+        index, (sx0, sy0, sx1, sy1) = item
+        contained = 0
+        overlap   = 0
+        for fx0, fy0, fx1, fy1 in focus:
+            if fx0 >= sx0 and fy0 >= sy0 and fx1 <= sx1 and fy1 <= sy1:
+                contained += 1
+            overlap += max(0, min(sx1, fx1) - max(sx0, fx0)) * max(0, min(sy1, fy1) - max(sy0, fy0))
+        return (-contained, -overlap, index)
+
+    return [x for _, x in sorted(enumerate(slices), key = rank)]
+
+def slice_boxes(image_width : int, image_height : int, slice_size : int = SLICE_SIZE, overlap : float = SLICE_OVERLAP) -> list[list[int]]:
+    # same grid as sahi.slicing.get_slice_bboxes, edge slices shifted inside the image
+    step_overlap = int(overlap * slice_size)
+    slices = []
+    y_min = y_max = 0
+    while y_max < image_height:
+        x_min = x_max = 0
+        y_max = y_min + slice_size
+        while x_max < image_width:
+            x_max = x_min + slice_size
+            if y_max > image_height or x_max > image_width:
+                x1 = min(image_width, x_max)
+                y1 = min(image_height, y_max)
+                slices.append([max(0, x1 - slice_size), max(0, y1 - slice_size), x1, y1])
+            else:
+                slices.append([x_min, y_min, x_max, y_max])
+            x_min = x_max - step_overlap
+        y_min = y_max - step_overlap
+    return slices
+
+class ShelfDetector(abc.ABC):
+    """
+    Product detector interface used by the scanner: predict() returns xyxy
+    boxes, predict_anytime() a PartialPrediction within a time budget.
+    Output helpers that do not depend on the model live here, shared by
+    OliwoModel and the mock backend.
+    """
+
+    @abc.abstractmethod
+    def predict(self, input_image : Image.Image) -> list[list[int]]:
+        ...
+
+    @abc.abstractmethod
+    def predict_anytime(self, input_image : Image.Image, budget : float, focus : list[list[int]] | None = None) -> PartialPrediction:
+        ...
+
+    def predict_to_file(self, image_path : str, output_file : str) -> None:
+        
+        # load image 
+        print("| Input >", image_path)
+        image = self.load_image(image_path)
+
+        # predict xyxy
+        predicte_products = self.predict(image)
+
+        # create information name
+        pred_prod : list[dict[str, any]] = []
+        for i in range(len(predicte_products)):
+            
+            # create placeholder product name
+            indx_str = str(i).zfill(3)
+            indx_str = f'product_{indx_str}'
+
+            # create product values
+            x = {
+                'name'   : indx_str,
+                'coords' : predicte_products[i]
+            }
+            pred_prod.append(x)
+
+        # convert to json
+        with open(output_file, "w") as f:
+            json.dump(pred_prod, f, indent = 2)
+
+        print("| Output >", output_file)        
+
+    def predict_yolo(self, input_image : Image.Image) -> list[list[float]]:
+        # get image dimensions
+        img_width, img_height = input_image.size
+
+        # object prediction in xyxy 
+        object_prediction_list = self.predict(input_image)
+        
+        # Extract bounding boxes
+        bounding_boxes = []
+        for object_prediction in object_prediction_list:
+            x_min, y_min, x_max, y_max = object_prediction
+            x_center = (x_min + x_max) / 2.0 / img_width
+            y_center = (y_min + y_max) / 2.0 / img_height
+            width    = (x_max - x_min) / img_width
+            height   = (y_max - y_min) / img_height
+            bounding_boxes.append([0, x_center, y_center, width, height])            
+        return bounding_boxes
+
+    def overlay(self, source_image : Image.Image, predictions : list[list[float]], fill_alpha : int = 64, line_width : int = 3) -> Image.Image:
+        # Convert image to RGBA if not already
+        if source_image.mode != 'RGBA':
+            source_image = source_image.convert('RGBA')
+        
+        # Create a new image for overlay
+        overlay = Image.new('RGBA', source_image.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        
+        # Draw semi-transparent red boxes
+        for bbox in predictions:
+            draw.rectangle(
+                bbox, 
+                outline = (128, 0, 128, 128), 
+                fill    = (255, 0, 0,   fill_alpha),
+                width   = line_width
+            )
+        
+        # Composite the overlay with the original image
+        combined = Image.alpha_composite(source_image, overlay)
+        combined = combined.convert("RGB")
+        return combined
+
+    def load_image(self, fpath : str) -> Image.Image:
+        image_cam : Image.Image = Image.open(fpath)
+        image_cam : Image.Image = ImageOps.exif_transpose(image_cam)
+        return image_cam
+
+def load_detector(name : str = 'oliwo', config_path : str | None = None) -> ShelfDetector:
+    # torch and the weights are only imported for the real model
+    if name == 'mock':
+        from oliwo_weights.xmock import MockOliwoModel
+        return MockOliwoModel.from_config(config_path)
+    if name == 'oliwo':
+        from oliwo_weights.xoliwo import OliwoModel
+        return OliwoModel()
+    raise ValueError(f"Unknown detector backend: {name} (expected one of {', '.join(DETECTORS)})")
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import queue
+import socket
+import threading
+from collections import deque
+
+# events kept for subscribers resuming from a sequence number
+EVENT_BACKLOG = 10000
+
+# events buffered per subscriber before a slow one is dropped (it can resume)
+SUBSCRIBER_QUEUE = 1000
+
+class StateEventBus:
+    """
+    In-process publish/subscribe channel for product state events.
+    Every event gets the next sequence number; the last EVENT_BACKLOG events
+    are kept so a subscriber can resume after a reconnect. The epoch changes
+    with every bus (service start), sequence numbers of another epoch are
+    meaningless and the subscriber has to resync from a snapshot.
+    """
+
+    def __init__(self, backlog : int = EVENT_BACKLOG):
+        self.epoch  = f"{time.time():.6f}"
+        self.seq    = 0
+        self.events : deque[dict[str, any]] = deque(maxlen = backlog)
+        self.subscribers : list[queue.Queue] = []
+        self.lock = threading.Lock()
+
+    def publish(self, event_type : str, **fields) -> dict[str, any]:
+        with self.lock:
+            self.seq += 1
+            event = {'seq' : self.seq, 'type' : event_type, 'ts' : fields.pop('ts', None) or time.time(), **fields}
+            self.events.append(event)
+
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    # a stalled consumer must not hold up the scanner
+                    self.subscribers.remove(subscriber)
+                    drop_subscriber(subscriber)
+        return event
+
+    def subscribe(self, since : int | None = None, epoch : str | None = None) -> tuple[list[dict[str, any]] | None, queue.Queue]:
+        """
+        Register a subscriber. Returns the events after `since` that are still
+        kept (None when they are not, or the epoch differs: resync needed) and
+        the queue live events are delivered to. None in the queue means the
+        subscriber was dropped.
+        """
+        subscriber = queue.Queue(maxsize = SUBSCRIBER_QUEUE)
+        with self.lock:
+            self.subscribers.append(subscriber)
+            if since is None:
+                return ([], subscriber)
+            if epoch != self.epoch or since > self.seq:
+                return (None, subscriber)
+
+            oldest = self.events[0]['seq'] if self.events else self.seq + 1
+            if since + 1 < oldest:
+                return (None, subscriber)
+            return ([x for x in self.events if x['seq'] > since], subscriber)
+
+    def unsubscribe(self, subscriber : queue.Queue) -> None:
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+class EventSocketServer:
+    """
+    Bridges a StateEventBus to a Unix socket with line-delimited JSON.
+    A client may send one request line {"since": seq, "epoch": epoch} to
+    resume; it first receives {"type": "hello", "epoch", "seq"}, then either
+    the missed events or {"type": "resync"}, then live events.
+    """
+
+    def __init__(self, bus : StateEventBus, socket_path : str):
+        self.bus         = bus
+        self.socket_path = socket_path
+        self.running     = True
+
+        # a stale socket file is left behind when the scanner is killed
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or '.', exist_ok = True)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(socket_path)
+        self.server.listen(16)
+        self.server.settimeout(0.5)
+
+        self.thread = threading.Thread(target = self.accept_loop, name = 'state-events', daemon = True)
+        self.thread.start()
+
+    def accept_loop(self) -> None:
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target = self.serve, args = (conn,), name = 'state-events-client', daemon = True).start()
+
+    def serve(self, conn : socket.socket) -> None:
+        subscriber = None
+        try:
+            # optional resume request, a client that sends nothing gets live events
+            conn.settimeout(1.0)
+            request = {}
+            try:
+                line = conn.makefile('r').readline()
+                if line.strip():
+                    request = json.loads(line)
+            except (socket.timeout, ValueError):
+                pass
+            # a client that stops reading is disconnected instead of blocking
+            conn.settimeout(5.0)
+
+            missed, subscriber = self.bus.subscribe(request.get('since'), request.get('epoch'))
+            send_event(conn, {'type' : 'hello', 'epoch' : self.bus.epoch, 'seq' : self.bus.seq})
+            if missed is None:
+                send_event(conn, {'type' : 'resync', 'epoch' : self.bus.epoch})
+                missed = []
+
+            last_seq = 0
+            for event in missed:
+                send_event(conn, event)
+                last_seq = event['seq']
+
+            while self.running:
+                try:
+                    event = subscriber.get(timeout = 0.5)
+                except queue.Empty:
+                    continue
+                if event is None:
+                    break
+                # already sent as part of the replay
+                if event['seq'] <= last_seq:
+                    continue
+                send_event(conn, event)
+        except OSError:
+            pass
+        finally:
+            if subscriber is not None:
+                self.bus.unsubscribe(subscriber)
+            conn.close()
+
+    def close(self) -> None:
+        self.running = False
+        self.server.close()
+        self.thread.join(timeout = 1.0)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+def drop_subscriber(subscriber : queue.Queue) -> None:
+    # discard what it did not get yet so it resumes without a gap from the
+    # last event it actually received
+    try:
+        while True:
+            subscriber.get_nowait()
+    except queue.Empty:
+        pass
+    subscriber.put_nowait(None)
+
+def send_event(conn : socket.socket, event : dict[str, any]) -> None:
+    conn.sendall((json.dumps(event) + "\n").encode('utf-8'))
+
+def read_events(socket_path : str, since : int | None = None, epoch : str | None = None, timeout : float | None = None):
+    """
+    Connect to an EventSocketServer and yield events as dicts, starting with
+    the hello (and resync if the requested position is gone). With a timeout,
+    None is yielded whenever nothing arrived for that long so the caller can
+    stop. Ends when the server closes the connection; raises OSError when it
+    is not running.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(timeout)
+    try:
+        conn.connect(socket_path)
+        send_event(conn, {} if since is None else {'since' : since, 'epoch' : epoch})
+
+        buffer = b''
+        while True:
+            try:
+                data = conn.recv(65536)
+            except socket.timeout:
+                yield None
+                continue
+            if not data:
+                return
+
+            *lines, buffer = (buffer + data).split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        conn.close()
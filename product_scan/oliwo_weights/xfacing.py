@@ -0,0 +1,293 @@
+import os
+import json
+import threading
+import cv2   as cv
+import numpy as np
+from PIL import Image
+
+# facing states returned by the cheap classifier
+FACING_EMPTY   = 'empty'
+FACING_STOCKED = 'stocked'
+
+# histogram bins for hue / saturation
+HIST_BINS = (8, 8)
+
+# calibration margins relative to the stocked facings seen at setup time
+EMPTY_EDGE_RATIO     = 0.5   # empty if edge density below 50% of the 5th percentile
+EMPTY_TEXTURE_RATIO  = 0.5   # empty if texture below 50% of the 5th percentile
+STOCKED_PERCENTILE   = 25    # stocked if edge density above the 25th percentile
+STOCKED_HIST_CORR    = 0.80  # stocked if color histogram still matches the reference
+EMPTY_HIST_CORR      = 0.40  # empty requires the reference colors to be gone
+
+def to_rgb_array(image : Image.Image | np.ndarray) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image)
+
+def crop_facing(image_rgb : np.ndarray, coords : list[int]) -> np.ndarray | None:
+    height, width = image_rgb.shape[:2]
+
+    # clip the product box to the frame
+    x1 = max(0, min(width,  int(coords[0])))
+    y1 = max(0, min(height, int(coords[1])))
+    x2 = max(0, min(width,  int(coords[2])))
+    y2 = max(0, min(height, int(coords[3])))
+
+    # too small to say anything useful
+    if (x2 - x1) < 4 or (y2 - y1) < 4:
+        return None
+    return image_rgb[y1:y2, x1:x2]
+
+def facing_histogram(crop_rgb : np.ndarray) -> np.ndarray:
+    hsv  = cv.cvtColor(crop_rgb, cv.COLOR_RGB2HSV)
+    hist = cv.calcHist([hsv], [0, 1], None, list(HIST_BINS), [0, 180, 0, 256])
+    cv.normalize(hist, hist, 0, 1, cv.NORM_MINMAX)
+    return hist.astype(np.float32)
+
+def facing_features(crop_rgb : np.ndarray) -> dict[str, any]:
+    gray = cv.cvtColor(crop_rgb, cv.COLOR_RGB2GRAY)
+
+    # fraction of edge pixels, products have print and outlines
+    edges        = cv.Canny(gray, 50, 150)
+    edge_density = float(np.count_nonzero(edges)) / edges.size
+
+    # empty shelf backs are flat, products are not
+    texture = float(gray.std())
+
+    return {
+        'edge'    : edge_density,
+        'texture' : texture,
+        'hist'    : facing_histogram(crop_rgb)
+    }
+
+def calibrate_facing_thresholds(image : Image.Image | np.ndarray, products_list : list[dict[str, any]]) -> dict[str, any]:
+    """
+    Calibrate cascade thresholds on a setup frame where every facing is stocked.
+    Returns the cascade record with thresholds, reference histograms and empty stats.
+    """
+    image_rgb = to_rgb_array(image)
+
+    edges, textures = [], []
+    reference : dict[str, list[float]] = {}
+    for product in products_list:
+        crop = crop_facing(image_rgb, product['coords'])
+        if crop is None:
+            continue
+        features = facing_features(crop)
+        edges.append(features['edge'])
+        textures.append(features['texture'])
+        reference[product['name']] = features['hist'].flatten().tolist()
+
+    if len(edges) == 0:
+        return None
+
+    thresholds = {
+        'edge_empty'     : float(np.percentile(edges,    5)) * EMPTY_EDGE_RATIO,
+        'texture_empty'  : float(np.percentile(textures, 5)) * EMPTY_TEXTURE_RATIO,
+        'edge_stocked'   : float(np.percentile(edges,    STOCKED_PERCENTILE)),
+        'hist_stocked'   : STOCKED_HIST_CORR,
+        'hist_empty'     : EMPTY_HIST_CORR
+    }
+
+    return {
+        'thresholds' : thresholds,
+        'reference'  : reference,
+        'stats'      : new_cascade_stats()
+    }
+
+def new_cascade_stats() -> dict[str, int]:
+    return {
+        'scans'           : 0,  # scans with at least one changed facing
+        'changed'         : 0,  # changed facings seen by the cascade
+        'decided'         : 0,  # facings decided without the detector
+        'detector_runs'   : 0,  # scans that still needed the detector
+        'detector_skips'  : 0,  # scans where the detector was skipped
+        'audited'         : 0,  # cascade decisions checked against the detector
+        'agreed'          : 0   # audited decisions that matched the detector
+    }
+
+def classify_facing(features : dict[str, any], reference_hist : np.ndarray | None, thresholds : dict[str, float]) -> str | None:
+    # correlation with the stocked reference, unknown reference counts as neutral
+    if reference_hist is not None:
+        hist_corr = float(cv.compareHist(reference_hist, features['hist'], cv.HISTCMP_CORREL))
+    else:
+        hist_corr = (thresholds['hist_stocked'] + thresholds['hist_empty']) / 2.0
+
+    # clearly empty: flat, edgeless and the product colors are gone
+    if (features['edge']    < thresholds['edge_empty']
+    and features['texture'] < thresholds['texture_empty']
+    and hist_corr           < thresholds['hist_empty']):
+        return FACING_EMPTY
+
+    # clearly stocked: busy facing that still looks like the reference product
+    if features['edge'] >= thresholds['edge_stocked'] and hist_corr >= thresholds['hist_stocked']:
+        return FACING_STOCKED
+
+    # ambiguous, leave it for the detector
+    return None
+
+def classify_changed_facings(image : Image.Image | np.ndarray, products_list : list[dict[str, any]], changed_names : list[str], cascade : dict[str, any]) -> dict[str, str]:
+    """
+    Run the cheap classifier on changed facings.
+    Returns {product name: 'empty' | 'reduced'} for the facings it is confident about.
+    """
+    image_rgb  = to_rgb_array(image)
+    thresholds = cascade['thresholds']
+    reference  = cascade['reference']
+    changed    = set(changed_names)
+
+    decided : dict[str, str] = {}
+    for product in products_list:
+        name = product['name']
+        if name not in changed:
+            continue
+
+        crop = crop_facing(image_rgb, product['coords'])
+        if crop is None:
+            continue
+
+        reference_hist = None
+        if name in reference:
+            reference_hist = np.asarray(reference[name], dtype = np.float32).reshape(HIST_BINS)
+
+        result = classify_facing(facing_features(crop), reference_hist, thresholds)
+
+        # a changed facing that is still stocked maps to the 'reduced' state
+        if result == FACING_EMPTY:
+            decided[name] = 'empty'
+        elif result == FACING_STOCKED:
+            decided[name] = 'reduced'
+
+    return decided
+
+def should_audit_cascade(cascade : dict[str, any], audit_every : int) -> bool:
+    if audit_every <= 0:
+        return False
+    return (cascade['stats']['scans'] % audit_every) == 0
+
+def record_cascade_scan(cascade : dict[str, any], changed_count : int, decided : dict[str, str], detector_ran : bool, detector_states : dict[str, str] | None = None) -> None:
+    stats = cascade['stats']
+    stats['scans']   += 1
+    stats['changed'] += changed_count
+    stats['decided'] += len(decided)
+
+    if detector_ran:
+        stats['detector_runs'] += 1
+    else:
+        stats['detector_skips'] += 1
+
+    # compare the cascade with the detector decision on the same facings
+    if detector_states is not None:
+        for name, state in decided.items():
+            stats['audited'] += 1
+            if detector_states.get(name) == state:
+                stats['agreed'] += 1
+
+def cascade_file_path(cascade_dir : str, base_name : str) -> str:
+    return os.path.join(cascade_dir, f"{base_name}.json")
+
+def load_facing_cascade(cascade_dir : str, base_name : str) -> dict[str, any] | None:
+    cascade_jsf = cascade_file_path(cascade_dir, base_name)
+    if not os.path.exists(cascade_jsf):
+        return None
+    try:
+        with open(cascade_jsf, 'r') as file:
+            cascade = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read cascade file {cascade_jsf}: {e}")
+        return None
+
+    # older files may miss newer counters
+    stats = new_cascade_stats()
+    stats.update(cascade.get('stats', {}))
+    cascade['stats'] = stats
+    return cascade
+
+def save_facing_cascade(cascade_dir : str, base_name : str, cascade : dict[str, any]) -> None:
+    # write atomically, a crash never leaves a truncated cascade
+    os.makedirs(cascade_dir, exist_ok = True)
+    cascade_jsf = cascade_file_path(cascade_dir, base_name)
+    with open(f"{cascade_jsf}.tmp", 'w') as f:
+        json.dump(cascade, f)
+    os.replace(f"{cascade_jsf}.tmp", cascade_jsf)
+
+class FacingCascadeStore:
+    """
+    Per-camera cascades kept in memory, read from the cascade directory once.
+    Scan stats are updated in memory; a cascade is written only after an
+    audit scan, when set (calibration), or on flush() at shutdown.
+    """
+
+    def __init__(self, cascade_dir : str):
+        self.cascade_dir = cascade_dir
+        self.lock        = threading.Lock()
+
+        self.cascades : dict[str, dict[str, any]] = {}
+        self.unsaved  : set[str] = set()
+
+    def get(self, base_name : str) -> dict[str, any] | None:
+        with self.lock:
+            cascade = self.cascades.get(base_name)
+            if cascade is None:
+                cascade = load_facing_cascade(self.cascade_dir, base_name)
+                if cascade is not None:
+                    self.cascades[base_name] = cascade
+            return cascade
+
+    def set(self, base_name : str, cascade : dict[str, any], persist : bool = True) -> None:
+        with self.lock:
+            self.cascades[base_name] = cascade
+            self.unsaved.add(base_name)
+        if persist:
+            self.save(base_name)
+
+    def record(self, base_name : str, changed_count : int, decided : dict[str, str], detector_ran : bool, detector_states : dict[str, str] | None = None) -> None:
+        # the diff and write stages of different scans share the cascade
+        with self.lock:
+            cascade = self.cascades.get(base_name)
+            if cascade is None:
+                return
+            record_cascade_scan(cascade, changed_count, decided, detector_ran, detector_states)
+            self.unsaved.add(base_name)
+
+        # audit agreement is worth keeping right away
+        if detector_states is not None:
+            self.save(base_name)
+
+    def save(self, base_name : str) -> None:
+        with self.lock:
+            cascade = self.cascades.get(base_name)
+            if cascade is None:
+                return
+            save_facing_cascade(self.cascade_dir, base_name, cascade)
+            self.unsaved.discard(base_name)
+
+    def flush(self) -> int:
+        with self.lock:
+            base_names = list(self.unsaved)
+        for base_name in base_names:
+            self.save(base_name)
+        return len(base_names)
+
+def format_cascade_report(cascades : dict[str, dict[str, any]]) -> str:
+    lines = [
+        f"{'Camera':<28} {'Scans':>6} {'Changed':>8} {'Hit %':>7} {'Skip %':>7} {'Audited':>8} {'Agree %':>8}"
+    ]
+
+    totals = new_cascade_stats()
+    for base_name in sorted(cascades.keys()):
+        stats = cascades[base_name]['stats']
+        for key in totals:
+            totals[key] += stats.get(key, 0)
+        lines.append(format_cascade_row(base_name, stats))
+
+    lines.append(format_cascade_row('TOTAL', totals))
+    return "\n".join(lines)
+
+def format_cascade_row(label : str, stats : dict[str, int]) -> str:
+    hit_rate   = 100.0 * stats['decided'] / stats['changed'] if stats['changed'] else 0.0
+    skip_rate  = 100.0 * stats['detector_skips'] / stats['scans'] if stats['scans'] else 0.0
+    agreement  = 100.0 * stats['agreed'] / stats['audited'] if stats['audited'] else 0.0
+    return f"{label:<28} {stats['scans']:>6} {stats['changed']:>8} {hit_rate:>7.1f} {skip_rate:>7.1f} {stats['audited']:>8} {agreement:>8.1f}"
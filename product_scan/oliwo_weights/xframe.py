@@ -0,0 +1,143 @@
+import os
+import weakref
+import threading
+import cv2   as cv
+import numpy as np
+from PIL import Image
+
+from oliwo_weights.xcodiff import (
+    DIFF_SCALE,
+    downscale_gray,
+    decode_diff_gray
+)
+
+class FrameContext:
+    """
+    One camera frame shared by every scan stage.
+    A file is read once into memory on first access, so every view comes
+    from the same frame even when the camera service replaces the file
+    meanwhile. The full frame is decoded at most once (cv.imdecode applies
+    the EXIF orientation like ImageOps.exif_transpose); RGB, grayscale,
+    PIL and 1/4-scale diff views are derived lazily and cached. A diff view
+    asked for before the full frame comes from a reduced JPEG decode of the
+    same bytes. decode_count counts both kinds of decode.
+    """
+
+    # every frame not yet garbage collected, for memory accounting
+    instances : 'weakref.WeakSet[FrameContext]' = weakref.WeakSet()
+    instances_lock = threading.Lock()
+
+    def __init__(self, source : str | np.ndarray, name : str | None = None):
+        if isinstance(source, np.ndarray):
+            self.path = None
+            self._bgr = source
+        else:
+            self.path = source
+            self._bgr = None
+        self._data : bytes | None = None
+
+        if name is None and self.path is not None:
+            name = os.path.splitext(os.path.basename(self.path))[0]
+        self.name = name
+
+        self._views : dict[str, any] = {}
+        self.decode_count = 0
+
+        # capture trace (frame_trace) and (stage, start, end) wall-clock spans
+        self.trace : dict[str, any] | None = None
+        self.spans : list[tuple[str, float, float]] = []
+        with FrameContext.instances_lock:
+            FrameContext.instances.add(self)
+
+    @classmethod
+    def from_array(cls, frame_bgr : np.ndarray, name : str | None = None) -> 'FrameContext':
+        return cls(frame_bgr, name)
+
+    @classmethod
+    def live_buffers(cls) -> tuple[int, int]:
+        # (frames holding decoded pixels, bytes held by them and their views)
+        with cls.instances_lock:
+            frames = list(cls.instances)
+        count, nbytes = 0, 0
+        for frame in frames:
+            held = frame.held_bytes()
+            if held:
+                count  += 1
+                nbytes += held
+        return (count, nbytes)
+
+    def held_bytes(self) -> int:
+        # Image.fromarray copies, a PIL view holds its own pixels
+        held = self._bgr.nbytes if self._bgr is not None else 0
+        held += len(self._data) if self._data is not None else 0
+        for view in list(self._views.values()):
+            if isinstance(view, np.ndarray):
+                held += view.nbytes
+            elif isinstance(view, Image.Image):
+                held += view.width * view.height * len(view.getbands())
+        return held
+
+    def is_decoded(self) -> bool:
+        return self._bgr is not None
+
+    def data(self) -> bytes:
+        # encoded file contents, read once
+        if self._data is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self._data = f.read()
+            except OSError as e:
+                raise ValueError(f"Could not read frame: {self.path}") from e
+        return self._data
+
+    def bgr(self) -> np.ndarray:
+        if self._bgr is None:
+            image = cv.imdecode(np.frombuffer(self.data(), dtype = np.uint8), cv.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode frame: {self.path}")
+            self._bgr = image
+            self.decode_count += 1
+        return self._bgr
+
+    def rgb(self) -> np.ndarray:
+        if 'rgb' not in self._views:
+            self._views['rgb'] = cv.cvtColor(self.bgr(), cv.COLOR_BGR2RGB)
+        return self._views['rgb']
+
+    def gray(self) -> np.ndarray:
+        if 'gray' not in self._views:
+            self._views['gray'] = cv.cvtColor(self.bgr(), cv.COLOR_BGR2GRAY)
+        return self._views['gray']
+
+    def pil(self) -> Image.Image:
+        # copy of the cached RGB view, counted in held_bytes
+        if 'pil' not in self._views:
+            self._views['pil'] = Image.fromarray(self.rgb())
+        return self._views['pil']
+
+    def diff_gray(self, scale : float = DIFF_SCALE) -> np.ndarray | None:
+        key = f'diff_gray_{scale}'
+        if key not in self._views:
+            if self.is_decoded():
+                # derive from the frame we already hold
+                self._views[key] = downscale_gray(self.bgr(), scale)
+            else:
+                # cheap reduced decode, full frame may never be needed
+                try:
+                    self._views[key] = decode_diff_gray(self.data(), scale)
+                except ValueError:
+                    return None
+                self.decode_count += 1
+        return self._views[key]
+
+    @property
+    def size(self) -> tuple[int, int]:
+        height, width = self.bgr().shape[:2]
+        return (width, height)
+
+    def release(self) -> None:
+        # drop decoded buffers and file contents, keep the source path
+        self._views.clear()
+        if self.path is not None:
+            self._bgr  = None
+            self._data = None
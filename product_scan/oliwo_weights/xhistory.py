@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import datetime
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from oliwo_weights.xstate import STATE_CODES
+
+# one raw little-endian file per column and day
+COLUMNS = {
+    'ts'      : np.dtype('<f8'),  # epoch seconds
+    'camera'  : np.dtype('<u2'),  # id in cameras.json
+    'product' : np.dtype('<u4'),  # index in the camera catalog
+    'old'     : np.dtype('u1'),   # state codes, see xstate.STATE_NAMES
+    'new'     : np.dtype('u1')
+}
+
+EMPTY = STATE_CODES['empty']
+
+def day_name(timestamp : float) -> str:
+    return datetime.date.fromtimestamp(timestamp).isoformat()
+
+class TransitionHistory:
+    """
+    Append-only history of product state transitions, stored column-wise as
+    memory-mapped NumPy segments in one directory per (local) day. Range
+    queries only open the days they touch; aggregations are vectorized over
+    the columns. Products without a transition in the range are not reported.
+    """
+
+    def __init__(self, history_dir : str):
+        self.history_dir = history_dir
+        self.lock = threading.Lock()
+
+        self.cameras_file = os.path.join(history_dir, 'cameras.json')
+        self.cameras : list[str] = []
+        self.camera_ids : dict[str, int] = {}
+        self.load_cameras()
+
+    def load_cameras(self) -> None:
+        # another process may have registered cameras since
+        if os.path.exists(self.cameras_file):
+            with open(self.cameras_file, 'r') as f:
+                self.cameras = json.load(f)
+        self.camera_ids = {name : i for i, name in enumerate(self.cameras)}
+
+    def camera_id(self, camera : str) -> int:
+        camera_id = self.camera_ids.get(camera)
+        if camera_id is not None:
+            return camera_id
+
+        # registry is only ever appended to, written atomically
+        os.makedirs(self.history_dir, exist_ok = True)
+        with open(os.path.join(self.history_dir, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # another process may have registered it meanwhile
+            self.load_cameras()
+            if camera in self.camera_ids:
+                return self.camera_ids[camera]
+
+            camera_id = len(self.cameras)
+            self.cameras.append(camera)
+            self.camera_ids[camera] = camera_id
+            tmp_file = f"{self.cameras_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.cameras, f, indent = 2)
+            os.replace(tmp_file, self.cameras_file)
+        return camera_id
+
+    def append(self, camera : str, transitions : list[tuple[int, int, int]], timestamp : float | None = None) -> None:
+        if not transitions:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        count = len(transitions)
+
+        with self.lock:
+            products, olds, news = zip(*transitions)
+            columns = {
+                'ts'      : np.full(count, timestamp),
+                'camera'  : np.full(count, self.camera_id(camera)),
+                'product' : np.array(products),
+                'old'     : np.array(olds),
+                'new'     : np.array(news)
+            }
+
+            day_dir = os.path.join(self.history_dir, day_name(timestamp))
+            os.makedirs(day_dir, exist_ok = True)
+
+            # the scanner and the camera service UI may append to the same day
+            with open(os.path.join(day_dir, '.lock'), 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                for name, dtype in COLUMNS.items():
+                    with open(os.path.join(day_dir, f"{name}.bin"), 'ab') as f:
+                        f.write(columns[name].astype(dtype).tobytes())
+
+    def load_day(self, day : str) -> dict[str, np.ndarray] | None:
+        day_dir = os.path.join(self.history_dir, day)
+        if not os.path.isdir(day_dir):
+            return None
+
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            path = os.path.join(day_dir, f"{name}.bin")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < dtype.itemsize:
+                return None
+            columns[name] = np.memmap(path, dtype = dtype, mode = 'r', shape = (size // dtype.itemsize,))
+
+        # an interrupted append can leave some columns one write ahead
+        rows = min(len(x) for x in columns.values())
+        return {name : values[:rows] for name, values in columns.items()}
+
+    def load(self, start : float, end : float, camera : str | None = None) -> dict[str, np.ndarray]:
+        """
+        Transitions with start <= ts < end, in time order.
+        """
+        if camera is not None and camera not in self.camera_ids:
+            self.load_cameras()
+
+        segments = []
+        day   = datetime.date.fromtimestamp(start)
+        final = datetime.date.fromtimestamp(end)
+        while day <= final:
+            columns = self.load_day(day.isoformat())
+            if columns is not None:
+                # appends from several threads and processes are only roughly
+                # in time order, so the range is a mask and not a binary search
+                keep = (columns['ts'] >= start) & (columns['ts'] < end)
+                segments.append({name : values[keep] for name, values in columns.items()})
+            day += datetime.timedelta(days = 1)
+
+        if segments:
+            result = {name : np.concatenate([x[name] for x in segments]) for name in COLUMNS}
+            order  = np.argsort(result['ts'], kind = 'stable')
+            result = {name : values[order] for name, values in result.items()}
+        else:
+            result = {name : np.empty(0, dtype = dtype) for name, dtype in COLUMNS.items()}
+
+        if camera is not None:
+            camera_id = self.camera_ids.get(camera)
+            if camera_id is None:
+                keep = np.zeros(len(result['camera']), dtype = bool)
+            else:
+                keep = result['camera'] == camera_id
+            result = {name : values[keep] for name, values in result.items()}
+        return result
+
+    def _grouped(self, start : float, end : float, camera : str | None = None) -> dict[str, np.ndarray]:
+        # transitions grouped by product, time order kept within each product
+        columns = self.load(start, end, camera)
+        key = (columns['camera'].astype(np.uint64) << np.uint64(32)) | columns['product'].astype(np.uint64)
+        order = np.argsort(key, kind = 'stable')
+
+        grouped = {name : columns[name][order] for name in ('ts', 'old', 'new')}
+        grouped['key'] = key = key[order]
+
+        grouped['first'] = np.ones(len(key), dtype = bool)
+        grouped['first'][1:] = key[1:] != key[:-1]
+        grouped['last'] = np.ones(len(key), dtype = bool)
+        grouped['last'][:-1] = grouped['first'][1:]
+        return grouped
+
+    def intervals(self, start : float, end : float, camera : str | None = None, grouped : dict[str, np.ndarray] | None = None) -> dict[str, np.ndarray]:
+        """
+        Per-product state intervals clipped to [start, end): every transition
+        opens an interval in its new state that lasts until the next transition
+        of the same product; the first one also closes an interval in its old
+        state that began at start.
+        """
+        g = self._grouped(start, end, camera) if grouped is None else grouped
+        first = g['first']
+
+        next_ts = np.empty_like(g['ts'])
+        next_ts[:-1] = g['ts'][1:]
+        next_ts[g['last']] = end
+
+        # state before the first transition in range
+        lead_key = g['key'][first]
+        return {
+            'key'   : np.concatenate([g['key'], lead_key]),
+            'state' : np.concatenate([g['new'], g['old'][first]]),
+            'begin' : np.concatenate([g['ts'], np.full(len(lead_key), start)]),
+            'end'   : np.concatenate([next_ts, g['ts'][first]])
+        }
+
+    def state_durations(self, start : float, end : float, state : int = EMPTY, camera : str | None = None, grouped : dict[str, np.ndarray] | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Seconds each product spent in a state, as (camera ids, product indices, seconds).
+        """
+        spans = self.intervals(start, end, camera, grouped)
+        keep  = spans['state'] == state
+        keys, inverse = np.unique(spans['key'][keep], return_inverse = True)
+        seconds = np.bincount(inverse, weights = spans['end'][keep] - spans['begin'][keep], minlength = len(keys))
+        return split_key(keys) + (seconds,)
+
+    def replenishment_latencies(self, start : float, end : float, camera : str | None = None, grouped : dict[str, np.ndarray] | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Time from a product becoming empty to its next transition (restocked),
+        as (camera ids, product indices, seconds), one entry per stock-out.
+        """
+        g = self._grouped(start, end, camera) if grouped is None else grouped
+
+        # stock-outs followed by another transition of the same product in range
+        index = np.flatnonzero((g['new'] == EMPTY) & ~g['last'])
+        seconds = g['ts'][index + 1] - g['ts'][index]
+        return split_key(g['key'][index]) + (seconds,)
+
+    def shelf_stats(self, start : float, end : float) -> dict[str, dict[str, float]]:
+        """
+        Per-camera stock-outs, empty product-hours and replenishment latency.
+        """
+        self.load_cameras()
+        cameras = len(self.cameras)
+        g = self._grouped(start, end)
+
+        stockout_cam, _ = split_key(g['key'][g['new'] == EMPTY])
+        stockouts = np.bincount(stockout_cam, minlength = cameras)
+
+        empty_cam, _, empty_seconds = self.state_durations(start, end, grouped = g)
+        empty_total = np.bincount(empty_cam, weights = empty_seconds, minlength = cameras)
+
+        latency_cam, _, latency = self.replenishment_latencies(start, end, grouped = g)
+        latency_total = np.bincount(latency_cam, weights = latency, minlength = cameras)
+        latency_count = np.bincount(latency_cam, minlength = cameras)
+
+        stats = {}
+        for camera_id, camera in enumerate(self.cameras):
+            if stockouts[camera_id] == 0 and empty_total[camera_id] == 0:
+                continue
+            stats[camera] = {
+                'stockouts'            : int(stockouts[camera_id]),
+                'empty_hours'          : float(empty_total[camera_id]) / 3600.0,
+                'restocked'            : int(latency_count[camera_id]),
+                'mean_restock_minutes' : float(latency_total[camera_id] / latency_count[camera_id]) / 60.0 if latency_count[camera_id] else 0.0
+            }
+        return stats
+
+def split_key(keys : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # (camera << 32 | product) -> camera ids, product indices
+    return ((keys >> np.uint64(32)).astype(np.uint16), (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+
+def format_history_report(stats : dict[str, dict[str, float]]) -> str:
+    lines = [f"{'Camera':<28} {'Stock-outs':>10} {'Empty h':>8} {'Restocked':>10} {'Restock min':>12}"]
+    for camera in sorted(stats.keys()):
+        x = stats[camera]
+        lines.append(f"{camera:<28} {x['stockouts']:>10} {x['empty_hours']:>8.2f} {x['restocked']:>10} {x['mean_restock_minutes']:>12.1f}")
+    return "\n".join(lines)
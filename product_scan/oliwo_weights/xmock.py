@@ -0,0 +1,132 @@
+import json
+import time
+import hashlib
+import numpy as np
+from PIL import Image
+
+from oliwo_weights.xdetect import ShelfDetector, PartialPrediction, order_slices, slice_boxes
+
+# synthetic_shelf lives in the project root (on sys.path in shelf_scan)
+from synthetic_shelf import shelf_layout
+
+# facings per camera, must match the synthetic frames being scanned
+MOCK_PRODUCTS = 48
+
+# simulated cost of one 512px slice (and of the full frame pass), seconds
+MOCK_SLICE_LATENCY = 0.05
+
+# part of that cost spent on the CPU, the rest waiting (accelerator)
+MOCK_CPU_FRACTION = 0.5
+
+# a pixel belongs to a facing when its channels differ by more than this
+# (synthetic facings are saturated, the wall is grey)
+FACING_SPREAD = 30
+
+# fraction of facing pixels above which a half facing counts as present
+FACING_FILL = 0.5
+
+# frames are analysed at this fraction of their size
+ANALYSIS_SCALE = 4
+
+class MockOliwoModel(ShelfDetector):
+    """
+    Deterministic OliwoModel stand-in without weights or torch, to benchmark
+    the scanner on any machine. Facings come from the synthetic shelf
+    layout for the frame size (synthetic_shelf.shelf_layout); one is
+    detected whole when both halves are coloured, as its lower half when
+    only that is (reduced), not at all on bare wall (empty), so the boxes
+    of a synthetic frame match its product states. Every slice of the
+    sliced inference, and the full frame pass, costs slice_latency
+    seconds: cpu_fraction of it hashing a buffer (CPU bound, the GIL is
+    released like in torch kernels), the rest sleeping.
+    """
+
+    def __init__(self, products : int = MOCK_PRODUCTS, slice_latency : float = MOCK_SLICE_LATENCY, cpu_fraction : float = MOCK_CPU_FRACTION):
+        self.products      = products
+        self.slice_latency = slice_latency
+        self.cpu_fraction  = min(1.0, max(0.0, cpu_fraction))
+        self.layouts : dict[tuple[int, int], np.ndarray] = {}
+        self.buffer  = bytes(256 * 1024)
+
+        print("|")
+        print("| Mock Oliwo Model       :", f"{products} facings, {1000.0 * slice_latency:.0f} ms per slice, {100.0 * self.cpu_fraction:.0f}% CPU")
+        print("|")
+
+    @classmethod
+    def from_config(cls, config_path : str | None = None) -> 'MockOliwoModel':
+        # JSON with any of: products, slice_latency, cpu_fraction
+        config = {}
+        if config_path:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+        return cls(**{x : config[x] for x in ('products', 'slice_latency', 'cpu_fraction') if x in config})
+
+    def layout(self, size : tuple[int, int]) -> np.ndarray:
+        if size not in self.layouts:
+            self.layouts[size] = shelf_layout(size[0], size[1], self.products)[0]
+        return self.layouts[size]
+
+    def spend(self, seconds : float) -> None:
+        end  = time.perf_counter() + seconds
+        busy = time.perf_counter() + seconds * self.cpu_fraction
+        while time.perf_counter() < busy:
+            hashlib.sha256(self.buffer).digest()
+        remaining = end - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def detect(self, input_image : Image.Image) -> list[list[int]]:
+        # facing pixels counted per half box with a summed-area table
+        small  = np.asarray(input_image.convert('RGB').reduce(ANALYSIS_SCALE), dtype = np.int16)
+        spread = (small.max(axis = 2) - small.min(axis = 2)) > FACING_SPREAD
+        table  = np.zeros((spread.shape[0] + 1, spread.shape[1] + 1), dtype = np.int32)
+        table[1:, 1:] = spread.cumsum(axis = 0).cumsum(axis = 1)
+
+        def filled(x0 : int, y0 : int, x1 : int, y1 : int) -> bool:
+            x0, y0 = x0 // ANALYSIS_SCALE, y0 // ANALYSIS_SCALE
+            x1, y1 = max(x0 + 1, x1 // ANALYSIS_SCALE), max(y0 + 1, y1 // ANALYSIS_SCALE)
+            count = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+            return count > FACING_FILL * (x1 - x0) * (y1 - y0)
+
+        boxes = []
+        for x0, y0, x1, y1 in self.layout(input_image.size).tolist():
+            middle = (y0 + y1) // 2
+            if not filled(x0, middle, x1, y1):
+                continue
+            boxes.append([x0, y0, x1, y1] if filled(x0, y0, x1, middle) else [x0, middle, x1, y1])
+        return boxes
+
+    def predict(self, input_image : Image.Image) -> list[list[int]]:
+        image_width, image_height = input_image.size
+        slices = slice_boxes(image_width, image_height)
+        # every slice plus the full frame pass, like get_sliced_prediction
+        self.spend(self.slice_latency * (len(slices) + (1 if len(slices) > 1 else 0)))
+        return self.detect(input_image)
+
+    def predict_anytime(self, input_image : Image.Image, budget : float, focus : list[list[int]] | None = None) -> PartialPrediction:
+        # same slice order and deadline rule as OliwoModel.predict_anytime
+        start = time.perf_counter()
+        image_width, image_height = input_image.size
+        slices = order_slices(slice_boxes(image_width, image_height), focus)
+
+        processed = []
+        for slice_box in slices:
+            if processed and time.perf_counter() - start + self.slice_latency > budget:
+                break
+            self.spend(self.slice_latency)
+            processed.append(slice_box)
+
+        full_pass = len(processed) == len(slices) and len(slices) > 1 and time.perf_counter() - start + self.slice_latency <= budget
+        if full_pass:
+            self.spend(self.slice_latency)
+
+        # a slice only finds facings that lie inside it
+        boxes = self.detect(input_image)
+        if not full_pass and len(processed) < len(slices):
+            boxes = [
+                box for box in boxes
+                if any(sx0 <= box[0] and sy0 <= box[1] and box[2] <= sx1 and box[3] <= sy1 for sx0, sy0, sx1, sy1 in processed)
+            ]
+        return PartialPrediction(
+            boxes, processed, len(slices), (image_width, image_height), time.perf_counter() - start
+        )
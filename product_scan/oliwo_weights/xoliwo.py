@@ -1,16 +1,21 @@
 import os
+import time
 import torch
 import platform
-import json
-from PIL          import Image, ImageDraw, ImageOps
+from PIL          import Image, ImageOps
 from sahi         import AutoDetectionModel
 from sahi.predict import get_sliced_prediction, predict, get_prediction
+from sahi.slicing import get_slice_bboxes
+from sahi.postprocess.combine import GreedyNMMPostprocess
 from transformers import (
     RTDetrImageProcessor, 
     DetrForObjectDetection
 )
 
-class OliwoModel:
+# model independent parts, also used by the mock backend (re-exported)
+from oliwo_weights.xdetect import ShelfDetector, PartialPrediction, order_slices
+
+class OliwoModel(ShelfDetector):
     def __init__(self):
         
         # get model path
@@ -67,81 +72,63 @@ class OliwoModel:
             
         return bounding_boxes
     
-    def predict_to_file(self, image_path : str, output_file : str) -> None:
-        
-        # load image 
-        print("| Input >", image_path)
-        image = self.load_image(image_path)
-
-        # predict xyxy
-        predicte_products = self.predict(image)
-
-        # create information name
-        pred_prod : list[dict[str, any]] = []
-        for i in range(len(predicte_products)):
-            
-            # create placeholder product name
-            indx_str = str(i).zfill(3)
-            indx_str = f'product_{indx_str}'
-
-            # create product values
-            x = {
-                'name'   : indx_str,
-                'coords' : predicte_products[i]
-            }
-            pred_prod.append(x)
-
-        # convert to json
-        with open(output_file, "w") as f:
-            json.dump(pred_prod, f, indent = 2)
+    def predict_anytime(self, input_image : Image.Image, budget : float, focus : list[list[int]] | None = None) -> PartialPrediction:
+        """
+        Sliced prediction that stops once the time budget would be exceeded.
+        Slices covering the focus boxes (changed product regions) run first.
+        The full frame pass of predict() runs last, only when time remains.
+        """
+        start = time.perf_counter()
+        image_width, image_height = input_image.size
+
+        slices = get_slice_bboxes(
+            image_height = image_height,
+            image_width  = image_width,
+            slice_height = 512,
+            slice_width  = 512,
+            overlap_height_ratio = 0.45,
+            overlap_width_ratio  = 0.45
+        )
+        slices = order_slices(slices, focus)
+
+        object_predictions = []
+        processed = []
+        slice_cost = 0.0
+        for slice_box in slices:
+            elapsed = time.perf_counter() - start
+
+            # at least one slice, then only if the next one still fits
+            if processed and elapsed + slice_cost > budget:
+                break
+
+            slice_start = time.perf_counter()
+            x0, y0, x1, y1 = slice_box
+            prediction_result = get_prediction(
+                input_image.crop((x0, y0, x1, y1)),
+                self.__detection_model__,
+                shift_amount = [x0, y0],
+                full_shape   = [image_height, image_width],
+                verbose      = 0
+            )
+            for object_prediction in prediction_result.object_prediction_list:
+                object_predictions.append(object_prediction.get_shifted_object_prediction())
 
-        print("| Output >", output_file)        
+            processed.append(slice_box)
+            slice_cost = max(slice_cost, time.perf_counter() - slice_start)
 
-    def predict_yolo(self, input_image : Image.Image) -> list[list[float]]:
-        # get image dimensions
-        img_width, img_height = input_image.size
+        # whole frame pass for large products, like get_sliced_prediction
+        if len(processed) == len(slices) and len(slices) > 1 and time.perf_counter() - start + slice_cost <= budget:
+            prediction_result = get_prediction(input_image, self.__detection_model__, verbose = 0)
+            object_predictions.extend(prediction_result.object_prediction_list)
 
-        # object prediction in xyxy 
-        object_prediction_list = self.predict(input_image)
-        
-        # Extract bounding boxes
-        bounding_boxes = []
-        for object_prediction in object_prediction_list:
-            x_min, y_min, x_max, y_max = object_prediction
-            x_center = (x_min + x_max) / 2.0 / img_width
-            y_center = (y_min + y_max) / 2.0 / img_height
-            width    = (x_max - x_min) / img_width
-            height   = (y_max - y_min) / img_height
-            bounding_boxes.append([0, x_center, y_center, width, height])            
-        return bounding_boxes
+        if len(object_predictions) > 1:
+            postprocess = GreedyNMMPostprocess(match_threshold = 0.5, match_metric = 'IOS', class_agnostic = False)
+            object_predictions = postprocess(object_predictions)
 
-    def overlay(self, source_image : Image.Image, predictions : list[list[float]], fill_alpha : int = 64, line_width : int = 3) -> Image.Image:
-        # Convert image to RGBA if not already
-        if source_image.mode != 'RGBA':
-            source_image = source_image.convert('RGBA')
-        
-        # Create a new image for overlay
-        overlay = Image.new('RGBA', source_image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-        
-        # Draw semi-transparent red boxes
-        for bbox in predictions:
-            draw.rectangle(
-                bbox, 
-                outline = (128, 0, 128, 128), 
-                fill    = (255, 0, 0,   fill_alpha),
-                width   = line_width
-            )
-        
-        # Composite the overlay with the original image
-        combined = Image.alpha_composite(source_image, overlay)
-        combined = combined.convert("RGB")
-        return combined
-
-    def load_image(self, fpath : str) -> Image.Image:
-        image_cam : Image.Image = Image.open(fpath)
-        image_cam : Image.Image = ImageOps.exif_transpose(image_cam)
-        return image_cam
+        bounding_boxes = [[int(x) for x in op.bbox.to_xyxy()] for op in object_predictions]
+        return PartialPrediction(
+            bounding_boxes, processed, len(slices), (image_width, image_height), time.perf_counter() - start
+        )
     
 if __name__ == "__main__":
     print("OLIWO MODEL")
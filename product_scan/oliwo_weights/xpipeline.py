@@ -0,0 +1,258 @@
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+
+class PipelineStage:
+    """
+    One step of the scan pipeline: a blocking function run on an executor and
+    fed by a bounded queue. The function takes a job and returns it (or None
+    to drop it). Busy time and queue depth are tracked so the bottleneck is
+    the stage with the highest utilization and the deepest queue.
+    """
+
+    def __init__(self, name : str, func, executor : Executor, workers : int = 1, queue_size : int = 4):
+        self.name       = name
+        self.func       = func
+        self.executor   = executor
+        self.workers    = workers
+        self.queue_size = queue_size
+        self.queue : asyncio.Queue | None = None
+
+        self.processed = 0
+        self.errors    = 0
+        self.busy      = 0.0
+
+        # queue depth sampled whenever a worker picks up a job
+        self.depth_max   = 0
+        self.depth_total = 0
+        self.depth_count = 0
+
+    def sample_depth(self) -> None:
+        depth = self.queue.qsize()
+        self.depth_max    = max(self.depth_max, depth)
+        self.depth_total += depth
+        self.depth_count += 1
+
+    def depth_mean(self) -> float:
+        return self.depth_total / self.depth_count if self.depth_count else 0.0
+
+    def utilization(self, elapsed : float) -> float:
+        # fraction of the worker capacity spent busy
+        if elapsed <= 0:
+            return 0.0
+        return self.busy / (elapsed * self.workers)
+
+class PipelineItem:
+    def __init__(self, key : str, job):
+        self.key     = key
+        self.job     = job
+        self.created = time.monotonic()
+
+def percentile(values, q : float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+class ScanPipeline:
+    """
+    Stages connected by bounded queues, each stage running on its own executor
+    so work for different keys (cameras) overlaps. At most one job per key is
+    in flight and each key has a single "latest pending" slot: a job offered
+    before the previous one started processing overwrites it (coalesced).
+    With a latency target, a key that was admitted less than one target ago
+    is shed while the estimated backlog delay exceeds the target: its frame
+    is parked in the deferred slot (still coalescing newer frames) and
+    admitted once nothing else is waiting for the first stage. With a
+    priority function (key -> score) the highest scoring waiting key enters
+    the first stage whenever it has room; otherwise keys go in arrival order.
+    """
+
+    def __init__(self, stages : list[PipelineStage], on_error = None, latency_target : float | None = None, age_window : int = 1000, priority = None):
+        self.stages   = stages
+        self.on_error = on_error
+        self.latency_target = latency_target
+        self.priority = priority
+
+        self.waiting   : deque[PipelineItem] = deque()
+        self.slots     : dict[str, PipelineItem] = {}
+        self.deferred  : dict[str, PipelineItem] = {}
+        self.in_flight : set[str] = set()
+        self.admitted  : dict[str, float] = {}
+
+        self.started   = time.monotonic()
+        self.completed = 0
+        self.coalesced = 0
+        self.shed      = 0
+
+        # seconds between the (latest) offer and the job leaving the pipeline
+        self.ages : deque[float] = deque(maxlen = age_window)
+        self.tasks : list[asyncio.Task] = []
+        self.wake  : asyncio.Event | None = None
+        self.room  : asyncio.Event | None = None
+
+    def start(self) -> None:
+        # queues and tasks are bound to the running loop
+        self.started = time.monotonic()
+        self.wake = asyncio.Event()
+        self.room = asyncio.Event()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize = stage.queue_size)
+
+        self.tasks.append(asyncio.create_task(self._dispatch()))
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self.tasks.append(asyncio.create_task(self._work(index)))
+
+    def offer(self, key : str, job) -> bool:
+        # newer frame overwrites the one still waiting for this key
+        pending = self.slots.get(key) or self.deferred.get(key)
+        if pending is not None:
+            pending.job     = job
+            pending.created = time.monotonic()
+            self.coalesced += 1
+            return True
+
+        item = PipelineItem(key, job)
+        if self.should_shed(key):
+            # parked, the latest change of this key is still scanned later
+            self.shed += 1
+            self.deferred[key] = item
+            return False
+
+        self.admitted[key] = item.created
+        if key in self.in_flight:
+            self.deferred[key] = item
+        else:
+            self._admit(item)
+        return True
+
+    def _admit(self, item : PipelineItem) -> None:
+        self.in_flight.add(item.key)
+        self.slots[item.key] = item
+        self.waiting.append(item)
+        self.wake.set()
+
+    def pending(self) -> int:
+        return len(self.waiting) + len(self.deferred) + sum(x.queue.qsize() for x in self.stages)
+
+    def seconds_per_job(self) -> float:
+        # throughput of the slowest stage
+        costs = [x.busy / x.processed / x.workers for x in self.stages if x.processed]
+        return max(costs) if costs else 0.0
+
+    def estimated_delay(self) -> float:
+        return self.pending() * self.seconds_per_job()
+
+    def should_shed(self, key : str) -> bool:
+        if not self.latency_target or self.estimated_delay() <= self.latency_target:
+            return False
+
+        # every key still gets admitted at least once per latency target
+        last = self.admitted.get(key)
+        return last is not None and time.monotonic() - last < self.latency_target
+
+    def _next_waiting(self) -> PipelineItem:
+        if self.priority is None or len(self.waiting) == 1:
+            return self.waiting.popleft()
+
+        # ties keep arrival order
+        best = max(range(len(self.waiting)), key = lambda i: (self.priority(self.waiting[i].key), -i))
+        item = self.waiting[best]
+        del self.waiting[best]
+        return item
+
+    async def _dispatch(self) -> None:
+        first = self.stages[0]
+        while True:
+            await self.wake.wait()
+            self.wake.clear()
+
+            while self.waiting:
+                # choose only once there is room, so late high priority keys still win
+                if first.queue.full():
+                    self.room.clear()
+                    await self.room.wait()
+                    continue
+                first.queue.put_nowait(self._next_waiting())
+
+    def _finish(self, item : PipelineItem) -> None:
+        self.completed += 1
+        self.in_flight.discard(item.key)
+        self.ages.append(time.monotonic() - item.created)
+
+        # newer job for the same key was waiting for this one
+        deferred = self.deferred.pop(item.key, None)
+        if deferred is not None:
+            self._admit(deferred)
+        self._release_shed()
+
+    def _release_shed(self) -> None:
+        # shed frames go in, oldest first, whenever the first stage would idle
+        if self.waiting:
+            return
+        for key, item in self.deferred.items():
+            if key not in self.in_flight:
+                del self.deferred[key]
+                self.admitted[key] = time.monotonic()
+                self._admit(item)
+                return
+
+    async def _work(self, index : int) -> None:
+        loop  = asyncio.get_running_loop()
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = await stage.queue.get()
+            stage.sample_depth()
+            if index == 0:
+                self.room.set()
+
+            # started processing, later offers wait in the deferred slot
+            if index == 0 and self.slots.get(item.key) is item:
+                del self.slots[item.key]
+
+            start  = time.perf_counter()
+            result = None
+            try:
+                result = await loop.run_in_executor(stage.executor, stage.func, item.job)
+            except Exception as e:
+                stage.errors += 1
+                if self.on_error is not None:
+                    self.on_error(stage.name, item.job, e)
+            finally:
+                stage.busy += time.perf_counter() - start
+                stage.processed += 1
+                stage.queue.task_done()
+
+            if result is None or next_stage is None:
+                self._finish(item)
+                continue
+
+            item.job = result
+            await next_stage.queue.put(item)
+
+    async def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions = True)
+        self.tasks.clear()
+
+def format_pipeline_report(pipeline : ScanPipeline) -> str:
+    elapsed = time.monotonic() - pipeline.started
+    lines = [
+        f"Pipeline: {pipeline.completed} jobs in {elapsed:.1f}s ({pipeline.completed / elapsed if elapsed > 0 else 0.0:.2f}/s), {pipeline.pending()} pending",
+        f"Frames coalesced: {pipeline.coalesced}, shed: {pipeline.shed}",
+        f"Frame age when processed: p50 {percentile(pipeline.ages, 50):.2f}s, p95 {percentile(pipeline.ages, 95):.2f}s, p99 {percentile(pipeline.ages, 99):.2f}s",
+        f"{'Stage':<10} {'Jobs':>6} {'Errors':>7} {'ms/job':>8} {'Util %':>7} {'Queue avg':>10} {'Queue max':>10}"
+    ]
+    for stage in pipeline.stages:
+        per_job = 1000.0 * stage.busy / stage.processed if stage.processed else 0.0
+        lines.append(
+            f"{stage.name:<10} {stage.processed:>6} {stage.errors:>7} {per_job:>8.1f} "
+            f"{100.0 * stage.utilization(elapsed):>7.1f} {stage.depth_mean():>10.2f} {stage.depth_max:>10}"
+        )
+    return "\n".join(lines)
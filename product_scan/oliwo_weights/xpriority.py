@@ -0,0 +1,71 @@
+import time
+
+class CameraPriority:
+    """
+    Ranks cameras waiting for a scan so a fixed inference budget goes to the
+    shelves that move. The score adds how stale the camera is (relative to
+    min_refresh), the fraction of its recent scans that changed a product
+    state, and the fraction of its products currently reduced or empty.
+    A camera not scanned for min_refresh seconds is overdue and ranks above
+    every camera that is not, oldest first.
+    """
+
+    def __init__(self, min_refresh : float = 60.0, change_alpha : float = 0.2, stale_weight : float = 1.0, change_weight : float = 1.0, stock_weight : float = 0.5):
+        self.min_refresh   = min_refresh
+        self.change_alpha  = change_alpha
+        self.stale_weight  = stale_weight
+        self.change_weight = change_weight
+        self.stock_weight  = stock_weight
+
+        self.last_scan   : dict[str, float] = {}
+        self.change_rate : dict[str, float] = {}
+        self.attention   : dict[str, float] = {}
+
+    def seed(self, key : str, attention : tuple[int, int]) -> None:
+        # (reduced or empty products, total products), before the first scan
+        count, total = attention
+        self.attention[key] = count / total if total else 0.0
+
+    def record_scan(self, key : str, state_changes : int, attention : tuple[int, int] | None = None) -> None:
+        self.last_scan[key] = time.monotonic()
+
+        # exponentially weighted fraction of scans that changed a state
+        changed = 1.0 if state_changes > 0 else 0.0
+        rate = self.change_rate.get(key, 0.0)
+        self.change_rate[key] = (1.0 - self.change_alpha) * rate + self.change_alpha * changed
+
+        if attention is not None:
+            self.seed(key, attention)
+
+    def staleness(self, key : str, now : float | None = None) -> float:
+        last = self.last_scan.get(key)
+        if last is None:
+            return float('inf')
+        now = time.monotonic() if now is None else now
+        return (now - last) / self.min_refresh
+
+    def score(self, key : str) -> float:
+        staleness = self.staleness(key)
+
+        # guaranteed minimum refresh, never-scanned cameras count as overdue
+        if staleness >= 1.0:
+            return 1000.0 + min(staleness, 1000.0)
+
+        return (
+            self.stale_weight  * staleness +
+            self.change_weight * self.change_rate.get(key, 0.0) +
+            self.stock_weight  * self.attention.get(key, 0.0)
+        )
+
+    def __call__(self, key : str) -> float:
+        return self.score(key)
+
+def format_priority_report(priority : CameraPriority) -> str:
+    lines = [f"{'Camera':<28} {'Score':>7} {'Stale':>6} {'Change':>7} {'Stock':>6}"]
+    keys = set(priority.last_scan) | set(priority.attention)
+    for key in sorted(keys, key = priority.score, reverse = True):
+        lines.append(
+            f"{key:<28} {priority.score(key):>7.2f} {min(priority.staleness(key), 99.0):>6.2f} "
+            f"{priority.change_rate.get(key, 0.0):>7.2f} {priority.attention.get(key, 0.0):>6.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+
+try:
+    from torch.profiler import profile as torch_profile, ProfilerActivity
+except ImportError:
+    torch_profile = None
+
+# slow scan reports kept on disk, oldest removed first
+MAX_REPORTS = 200
+
+# distinct stacks kept per scan, further new stacks are counted as truncated
+MAX_STACKS = 5000
+
+def folded_stack(frame, root : str) -> str:
+    # flamegraph.pl / speedscope "folded" stack, outermost frame first
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(root)
+    return ';'.join(reversed(names))
+
+class ScanProfile:
+    def __init__(self):
+        self.stacks : dict[str, int] = {}
+        self.samples   = 0
+        self.truncated = 0
+        self.torch_ops : str | None = None
+
+class TailProfiler:
+    """
+    Always-armed sampling profiler for slow scans. While a scan stage runs,
+    its thread is sampled every `interval` seconds from a background thread
+    (sys._current_frames, no tracing hooks); with no stage running the
+    sampler blocks. Samples are kept per scan and written as folded stacks
+    (flamegraph.pl, speedscope) plus a JSON file with the camera, frame and
+    scan parameters, only when the scan took longer than the `percentile` of
+    recent scans. torch.profiler op summaries are collected for every
+    `torch_every`th inference and for cameras whose last scan was slow,
+    and are kept on the same condition.
+    """
+
+    def __init__(self, output_dir : str, percentile : float = 99.0, interval : float = 0.005, window : int = 500, min_scans : int = 50, torch_every : int = 0, params : dict[str, any] | None = None):
+        self.output_dir  = output_dir
+        # service configuration, saved with every report
+        self.params      = params or {}
+        self.percentile  = percentile
+        self.interval    = interval
+        self.min_scans   = min_scans
+        self.torch_every = torch_every
+
+        self.durations : deque[float] = deque(maxlen = window)
+        self.profiles  : dict[any, ScanProfile] = {}
+        self.threads   : dict[int, tuple[any, str]] = {}
+        self.slow_cameras : set[str] = set()
+        self.inferences = 0
+        self.lock   = threading.Lock()
+        self.active = threading.Event()
+
+        # sampler cost, reported as overhead
+        self.sample_count   = 0
+        self.sample_seconds = 0.0
+        self.started  = time.perf_counter()
+        self.reports  = 0
+
+        self.running = True
+        self.thread  = threading.Thread(target = self.sample_loop, name = 'tail-profiler', daemon = True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.running = False
+        self.active.set()
+        self.thread.join(timeout = 1.0)
+
+    def stage(self, key : any, name : str) -> 'ProfiledStage':
+        # with profiler.stage(frame, 'detect'): ...
+        return ProfiledStage(self, key, name)
+
+    def enter(self, key : any, name : str) -> None:
+        with self.lock:
+            if key not in self.profiles:
+                self.profiles[key] = ScanProfile()
+            self.threads[threading.get_ident()] = (key, name)
+            self.active.set()
+
+    def leave(self) -> None:
+        with self.lock:
+            self.threads.pop(threading.get_ident(), None)
+            if not self.threads:
+                self.active.clear()
+
+    def sample_loop(self) -> None:
+        while self.running:
+            # idle: nothing is sampled (or woken) until a stage starts
+            self.active.wait()
+            time.sleep(self.interval)
+
+            start = time.perf_counter()
+            with self.lock:
+                threads = dict(self.threads)
+            frames = sys._current_frames()
+            for thread_id, (key, name) in threads.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = folded_stack(frame, name)
+                with self.lock:
+                    profile = self.profiles.get(key)
+                    if profile is None:
+                        continue
+                    profile.samples += 1
+                    if stack in profile.stacks or len(profile.stacks) < MAX_STACKS:
+                        profile.stacks[stack] = profile.stacks.get(stack, 0) + 1
+                    else:
+                        profile.truncated += 1
+            del frames
+
+            self.sample_count   += 1
+            self.sample_seconds += time.perf_counter() - start
+
+    def threshold(self) -> float | None:
+        # seconds above which a scan is kept, None while warming up
+        if len(self.durations) < self.min_scans:
+            return None
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(round(self.percentile / 100.0 * (len(ordered) - 1))))]
+
+    def torch_ops(self, key : any, camera : str) -> 'TorchOps':
+        # op summary for a sample of inferences and cameras that were slow
+        self.inferences += 1
+        enabled = torch_profile is not None and (
+            (self.torch_every > 0 and self.inferences % self.torch_every == 0) or camera in self.slow_cameras
+        )
+        return TorchOps(self, key if enabled else None)
+
+    def discard(self, key : any) -> None:
+        with self.lock:
+            self.profiles.pop(key, None)
+
+    def finish(self, key : any, duration : float, camera : str, meta : dict[str, any]) -> str | None:
+        """
+        Scan done: returns the folded stack file when it was slow enough to keep.
+        """
+        with self.lock:
+            profile = self.profiles.pop(key, None)
+        threshold = self.threshold()
+        self.durations.append(duration)
+
+        if threshold is None or duration <= threshold or profile is None:
+            self.slow_cameras.discard(camera)
+            return None
+        self.slow_cameras.add(camera)
+
+        os.makedirs(self.output_dir, exist_ok = True)
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{camera}_{meta.get('trace_id') or id(profile)}"
+        base = os.path.join(self.output_dir, name)
+        with open(f"{base}.folded", 'w') as f:
+            for stack, count in sorted(profile.stacks.items(), key = lambda x: -x[1]):
+                f.write(f"{stack} {count}\n")
+        with open(f"{base}.json", 'w') as f:
+            json.dump({
+                'camera'     : camera,
+                'duration'   : duration,
+                'threshold'  : threshold,
+                'percentile' : self.percentile,
+                'interval'   : self.interval,
+                'samples'    : profile.samples,
+                'truncated'  : profile.truncated,
+                'torch_ops'  : profile.torch_ops,
+                'service'    : self.params,
+                **meta
+            }, f, indent = 2)
+
+        self.reports += 1
+        self.prune()
+        return f"{base}.folded"
+
+    def prune(self) -> None:
+        reports = sorted(x for x in os.listdir(self.output_dir) if x.endswith('.folded'))
+        for file in reports[:-MAX_REPORTS]:
+            for path in (os.path.join(self.output_dir, file), os.path.join(self.output_dir, file[:-len('.folded')] + '.json')):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def overhead(self) -> float:
+        # fraction of wall time the sampler spent sampling
+        elapsed = time.perf_counter() - self.started
+        return self.sample_seconds / elapsed if elapsed > 0 else 0.0
+
+class ProfiledStage:
+    def __init__(self, profiler : TailProfiler, key : any, name : str):
+        self.profiler = profiler
+        self.key      = key
+        self.name     = name
+
+    def __enter__(self) -> 'ProfiledStage':
+        self.profiler.enter(self.key, self.name)
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.profiler.leave()
+        return False
+
+class TorchOps:
+    def __init__(self, profiler : TailProfiler, key : any):
+        self.profiler = profiler
+        self.key      = key
+        self.prof     = None
+
+    def __enter__(self) -> 'TorchOps':
+        if self.key is not None:
+            self.prof = torch_profile(activities = [ProfilerActivity.CPU])
+            self.prof.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        if self.prof is None:
+            return False
+        self.prof.__exit__(*exc)
+        table = self.prof.key_averages().table(sort_by = 'cpu_time_total', row_limit = 25)
+        with self.profiler.lock:
+            profile = self.profiler.profiles.get(self.key)
+            if profile is not None:
+                profile.torch_ops = table
+        return False
+
+def format_profiler_report(profiler : TailProfiler) -> str:
+    threshold = profiler.threshold()
+    threshold_text = f"{threshold:.2f}s" if threshold is not None else f"warming up ({len(profiler.durations)}/{profiler.min_scans} scans)"
+    per_sample = 1000.0 * profiler.sample_seconds / profiler.sample_count if profiler.sample_count else 0.0
+    return (
+        f"Tail profiler: p{profiler.percentile:g} threshold {threshold_text}, {profiler.reports} slow scans saved, "
+        f"{profiler.sample_count} samples ({per_sample:.3f} ms each), overhead {100.0 * profiler.overhead():.2f}%"
+    )
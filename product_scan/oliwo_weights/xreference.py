@@ -0,0 +1,90 @@
+import os
+import numpy as np
+
+from oliwo_weights.xcodiff import load_diff_gray
+
+class ReferenceFrameStore:
+    """
+    Per-camera reference frames kept in memory as 1/4-scale grayscale arrays.
+    Each reference is persisted as <camera>.npy in the reference directory only
+    when it changed meaningfully, or on flush() at shutdown. A missing .npy
+    falls back to the legacy <camera>.jpg reference in the same directory.
+    """
+
+    def __init__(self, reference_dir : str):
+        self.reference_dir = reference_dir
+
+        self.frames  : dict[str, np.ndarray] = {}
+        self.pending : dict[str, tuple[np.ndarray, bool]] = {}
+        self.unsaved : set[str] = set()
+
+    def npy_path(self, base_name : str) -> str:
+        return os.path.join(self.reference_dir, f"{base_name}.npy")
+
+    def jpg_path(self, base_name : str) -> str:
+        return os.path.join(self.reference_dir, f"{base_name}.jpg")
+
+    def get(self, base_name : str) -> np.ndarray | None:
+        gray = self.frames.get(base_name)
+        if gray is not None:
+            return gray
+
+        # compact snapshot first
+        npy_file = self.npy_path(base_name)
+        if os.path.exists(npy_file):
+            try:
+                gray = np.load(npy_file)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Could not load reference {npy_file}: {e}")
+                gray = None
+
+        # legacy JPEG reference, decoded once
+        if gray is None and os.path.exists(self.jpg_path(base_name)):
+            gray = load_diff_gray(self.jpg_path(base_name))
+            if gray is not None:
+                self.unsaved.add(base_name)
+
+        if gray is not None:
+            self.frames[base_name] = gray
+        return gray
+
+    def preload(self, base_names : list[str]) -> int:
+        return sum(1 for base_name in base_names if self.get(base_name) is not None)
+
+    def set(self, base_name : str, gray : np.ndarray, persist : bool = True) -> None:
+        self.frames[base_name] = gray
+        self.unsaved.add(base_name)
+        if persist:
+            self.save(base_name)
+
+    def stage(self, base_name : str, gray : np.ndarray, changed : bool) -> None:
+        # latest frame becomes the reference once the scan has been processed
+        self.pending[base_name] = (gray, changed)
+
+    def commit(self, base_name : str) -> bool:
+        staged = self.pending.pop(base_name, None)
+        if staged is None:
+            return False
+        gray, changed = staged
+        self.set(base_name, gray, persist = changed)
+        return True
+
+    def save(self, base_name : str) -> None:
+        gray = self.frames.get(base_name)
+        if gray is None:
+            return
+
+        # write atomically, a crash never leaves a truncated reference
+        os.makedirs(self.reference_dir, exist_ok = True)
+        npy_file = self.npy_path(base_name)
+        tmp_file = f"{npy_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.save(f, gray)
+        os.replace(tmp_file, npy_file)
+        self.unsaved.discard(base_name)
+
+    def flush(self) -> int:
+        base_names = list(self.unsaved)
+        for base_name in base_names:
+            self.save(base_name)
+        return len(base_names)
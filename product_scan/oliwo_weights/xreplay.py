@@ -0,0 +1,520 @@
+import os
+import json
+import time
+import shutil
+import bisect
+import threading
+import numpy as np
+
+from oliwo_weights.xstate    import STATE_CODES
+from oliwo_weights.xevents   import read_events
+from oliwo_weights.xpipeline import percentile
+
+# frame_trace lives in the project root (on sys.path in shelf_scan)
+from frame_trace import parse_frame_trace, strip_frame_trace, new_frame_trace, write_traced_jpeg
+
+# files of a recording directory
+RECORDING_INFO = 'recording.json'
+MANIFEST       = 'manifest.jsonl'
+TRANSITIONS    = 'transitions.jsonl'
+FRAMES_DIR     = 'frames'
+INITIAL_DIR    = 'initial'
+
+# app_root state a replay starts from (copied when the recording starts)
+STATE_DIRS = ('product_information', 'last_state', 'facing_cascade', 'background_model')
+
+# marks an app_root created by a replay, the only kind restore() replaces
+REPLAY_MARKER = '.replay_root'
+
+# seconds per replay report window (latency percentiles, service RSS)
+REPLAY_WINDOW = 60.0
+
+# a fed frame without a scan event after this long is counted as lost
+ACK_TIMEOUT = 30.0
+
+# the replay ends once no event arrived for this long after the last frame
+DRAIN_QUIET = 5.0
+
+# a replayed transition matches a recorded one this many frames of its camera apart
+MATCH_TOLERANCE = 1
+
+def process_rss(pid : int) -> float | None:
+    # resident size of another process (the replayed service), linux only
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return float(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def drift_per_hour(windows : list[dict[str, any]], key : str) -> float | None:
+    # least-squares slope per hour over the windows after the first (warm-up)
+    points = [(x['t'], x[key]) for x in windows[1:] if x.get(key) is not None and not x.get('partial')]
+    if len(points) < 2 or points[-1][0] == points[0][0]:
+        return None
+    t, y = np.array(points, dtype = np.float64).T
+    return float(np.polyfit(t, y, 1)[0] * 3600.0)
+
+class FrameRecorder:
+    """
+    Archives the frames written to active_state/devices for replay: every
+    new frame is copied without its trace to frames/, with camera, capture
+    time and trace id in manifest.jsonl. snapshot() copies the app_root
+    state the recorded run started from; finish() stores the transitions
+    the running service made, each attributed to the recorded frame that
+    caused it, so a replay can be compared against them.
+    """
+
+    def __init__(self, recording_dir : str, app_root : str):
+        self.path     = recording_dir
+        self.app_root = app_root
+        os.makedirs(os.path.join(recording_dir, FRAMES_DIR))
+
+        self.started_at = time.time()
+        self.seq        = 0
+        self.last : dict[str, tuple[str | None, float]] = {}
+        self.frames : dict[str, list[tuple[float, int, str | None]]] = {}
+        self.traced : dict[str, int] = {}
+        self.manifest = open(os.path.join(recording_dir, MANIFEST), 'a')
+
+    def snapshot(self, devices_dir : str, export_states) -> None:
+        # export_states(directory) writes product_state JSON (ShelfStateDB.export_json)
+        initial = os.path.join(self.path, INITIAL_DIR)
+        for name in STATE_DIRS:
+            source = os.path.join(self.app_root, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(initial, name))
+        shutil.copytree(devices_dir, os.path.join(initial, 'devices'), ignore = shutil.ignore_patterns('*.tmp'))
+        export_states(os.path.join(initial, 'product_state'))
+
+    def add(self, camera : str, path : str, mtime : float) -> dict[str, any] | None:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if data[:2] != b'\xff\xd8':
+            return None
+
+        # frames without a trace (other writers) are known by their mtime
+        trace = parse_frame_trace(data)
+        trace_id    = trace['trace_id'] if trace is not None else None
+        captured_at = trace['captured_at'] if trace is not None else mtime
+        if self.last.get(camera) == (trace_id, captured_at):
+            return None
+        self.last[camera] = (trace_id, captured_at)
+
+        file_name = f"{self.seq:08d}_{camera}.jpg"
+        with open(os.path.join(self.path, FRAMES_DIR, file_name), 'wb') as f:
+            f.write(strip_frame_trace(data))
+
+        entry = {'seq' : self.seq, 'camera' : camera, 'file' : file_name, 'captured_at' : captured_at, 'trace_id' : trace_id, 'recorded_at' : time.time()}
+        self.manifest.write(json.dumps(entry) + "\n")
+        self.manifest.flush()
+        self.frames.setdefault(camera, []).append((captured_at, self.seq, trace_id))
+        if trace_id is not None:
+            self.traced[trace_id] = self.seq
+        self.seq += 1
+        return entry
+
+    def attribute(self, transition : dict[str, any]) -> int | None:
+        # seq of the recorded frame behind a transition: same trace id, or
+        # the latest frame of its camera captured at or before it
+        if transition['trace_id'] in self.traced:
+            return self.traced[transition['trace_id']]
+        frames = self.frames.get(transition['camera'])
+        if not frames:
+            return None
+        at = transition['captured_at'] if transition['captured_at'] is not None else transition['ts']
+        index = bisect.bisect_right(frames, (at, float('inf'))) - 1
+        return frames[index][1] if index >= 0 else None
+
+    def finish(self, transitions : list[dict[str, any]], latencies : dict[str, list[float]]) -> dict[str, any]:
+        """
+        Close the recording with the service's transitions since it started
+        (ShelfStateDB.transitions) and its capture -> visible latencies
+        (load_frame_latencies). Transitions of frames captured before the
+        recording are left out. Returns the recording info.
+        """
+        self.manifest.close()
+        attributed = 0
+        with open(os.path.join(self.path, TRANSITIONS), 'w') as f:
+            for transition in transitions:
+                seq = self.attribute(transition)
+                if seq is None:
+                    continue
+                f.write(json.dumps({'seq' : seq, 'camera' : transition['camera'], 'product' : transition['product'], 'old' : transition['old'], 'new' : transition['new'], 'ts' : transition['ts']}) + "\n")
+                attributed += 1
+
+        values = [x for camera in latencies.values() for x in camera]
+        info = {
+            'started_at'  : self.started_at,
+            'stopped_at'  : time.time(),
+            'frames'      : self.seq,
+            'cameras'     : {camera : len(frames) for camera, frames in sorted(self.frames.items())},
+            'transitions' : attributed,
+            'latency'     : {
+                'frames' : len(values),
+                'p50'    : percentile(values, 50),
+                'p95'    : percentile(values, 95),
+                'p99'    : percentile(values, 99)
+            } if values else None
+        }
+        with open(os.path.join(self.path, RECORDING_INFO), 'w') as f:
+            json.dump(info, f, indent = 2)
+        return info
+
+class Recording:
+    """
+    A finished FrameRecorder directory: manifest entries in recording
+    order, recorded transitions and the initial app_root state.
+    """
+
+    def __init__(self, path : str):
+        self.path = path
+        with open(os.path.join(path, RECORDING_INFO), 'r') as f:
+            self.info = json.load(f)
+        with open(os.path.join(path, MANIFEST), 'r') as f:
+            self.entries = [json.loads(x) for x in f if x.strip()]
+        with open(os.path.join(path, TRANSITIONS), 'r') as f:
+            self.transitions = [json.loads(x) for x in f if x.strip()]
+
+        # position of every frame among the frames of its camera
+        counts : dict[str, int] = {}
+        self.positions : dict[int, int] = {}
+        for entry in self.entries:
+            self.positions[entry['seq']] = counts.get(entry['camera'], 0)
+            counts[entry['camera']] = self.positions[entry['seq']] + 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def frame_bytes(self, entry : dict[str, any]) -> bytes:
+        with open(os.path.join(self.path, FRAMES_DIR, entry['file']), 'rb') as f:
+            return f.read()
+
+    def span(self) -> float:
+        # recorded time of one pass, plus one mean frame interval before the next loop
+        if len(self.entries) < 2:
+            return 1.0
+        first, last = self.entries[0]['captured_at'], self.entries[-1]['captured_at']
+        return (last - first) * len(self.entries) / (len(self.entries) - 1)
+
+    def restore(self, app_root : str) -> None:
+        """
+        Recreate the initial app_root state in app_root, which is replaced
+        when an earlier replay created it and refused otherwise, so a live
+        app_root is never overwritten. The state database is not part of
+        it, product_state JSON is imported by the caller.
+        """
+        if os.path.isdir(app_root) and os.listdir(app_root) and not os.path.exists(os.path.join(app_root, REPLAY_MARKER)):
+            raise ValueError(f"Not a replay app_root, refusing to replace it: {app_root}")
+        shutil.rmtree(app_root, ignore_errors = True)
+
+        initial = os.path.join(self.path, INITIAL_DIR)
+        for name in os.listdir(initial):
+            target = os.path.join(app_root, 'active_state', name) if name == 'devices' else os.path.join(app_root, name)
+            shutil.copytree(os.path.join(initial, name), target)
+        os.makedirs(os.path.join(app_root, 'active_state', 'devices'), exist_ok = True)
+        with open(os.path.join(app_root, REPLAY_MARKER), 'w') as f:
+            f.write(self.path + "\n")
+
+def state_agreement(recorded : list[tuple[int, str, int, int]], replayed : list[tuple[int, str, int, int]], positions : dict[int, int], tolerance : int = MATCH_TOLERANCE) -> dict[str, any]:
+    """
+    Compare transitions (seq, camera, product, new code) of a replay with
+    the recorded run. A replayed transition matches a recorded one of the
+    same product and new state at most tolerance frames of that camera
+    apart (coalescing moves a change to a later frame). Agreement is
+    matched / (recorded + replayed - matched); final_mismatches counts
+    products whose last state differs.
+    """
+    expected : dict[tuple[str, int], list[tuple[int, int]]] = {}
+    for seq, camera, product, new in recorded:
+        expected.setdefault((camera, product), []).append((positions[seq], new))
+    actual : dict[tuple[str, int], list[tuple[int, int]]] = {}
+    for seq, camera, product, new in replayed:
+        actual.setdefault((camera, product), []).append((positions[seq], new))
+
+    matched = 0
+    final_mismatches = 0
+    for key in set(expected) | set(actual):
+        wanted = expected.get(key, [])
+        free   = list(actual.get(key, []))
+        for position, new in wanted:
+            for i, (other, other_new) in enumerate(free):
+                if other_new == new and abs(other - position) <= tolerance:
+                    matched += 1
+                    del free[i]
+                    break
+        last_expected = wanted[-1][1] if wanted else None
+        last_actual   = actual[key][-1][1] if key in actual else None
+        if last_expected != last_actual:
+            final_mismatches += 1
+
+    union = len(recorded) + len(replayed) - matched
+    return {
+        'recorded'         : len(recorded),
+        'replayed'         : len(replayed),
+        'matched'          : matched,
+        'agreement'        : matched / union if union else 1.0,
+        'final_mismatches' : final_mismatches
+    }
+
+class FrameReplayer:
+    """
+    Feeds a Recording into a running scanner through its devices directory
+    (traced, atomically replaced JPEGs, exactly what the camera service
+    writes) and follows the scanner's state events. speed > 0 keeps the
+    recorded capture timing scaled by speed; speed 0 (max) writes the next
+    frame of a camera as soon as its previous one was scanned. Every frame
+    gets a new trace id, so each scan event gives its capture -> visible
+    latency and transitions are attributed to the frame that caused them.
+    Loops repeat the recording (soak runs); a report window records
+    throughput, latency percentiles and the service RSS to show drift.
+    """
+
+    def __init__(self, recording : Recording, devices_dir : str, socket_path : str, speed : float = 1.0, loops : int = 1, duration : float | None = None, window : float = REPLAY_WINDOW, ack_timeout : float = ACK_TIMEOUT, rss = None):
+        self.recording   = recording
+        self.devices_dir = devices_dir
+        self.socket_path = socket_path
+        self.speed       = speed
+        self.loops       = loops
+        self.duration    = duration
+        self.window      = window
+        self.ack_timeout = ack_timeout
+        self.rss         = rss
+
+        self.condition   = threading.Condition()
+        self.stop_event  = threading.Event()
+        self.listener    = None
+        self.last_event  = 0.0
+
+        # trace id -> (loop, seq, camera, fed at) until its scan event arrives
+        self.pending     : dict[str, tuple[int, int, str, float]] = {}
+        self.outstanding : dict[str, str] = {}
+        self.replayed    : dict[int, list[tuple[int, str, int, int]]] = {}
+        self.latencies   : list[float] = []
+        self.window_latencies : list[float] = []
+        self.fed      = 0
+        self.scanned  = 0
+        self.lost     = 0
+        self.windows  : list[dict[str, any]] = []
+
+    def connect(self, timeout : float, alive = None) -> dict[str, any]:
+        # the service may still be loading its model, retry until it listens
+        deadline = time.time() + timeout
+        while True:
+            try:
+                events = read_events(self.socket_path, timeout = 0.5)
+                hello  = next(events)
+                break
+            except (OSError, StopIteration):
+                if time.time() > deadline or (alive is not None and not alive()):
+                    raise TimeoutError(f"Scanner not listening on {self.socket_path}")
+                time.sleep(0.5)
+
+        self.last_event = time.time()
+        self.listener = threading.Thread(target = self.listen, args = (events,), name = 'replay-events', daemon = True)
+        self.listener.start()
+        return hello
+
+    def settle(self, quiet : float = 2.0, timeout : float = ACK_TIMEOUT) -> None:
+        # the initial frames are scanned at startup, wait until that is done
+        deadline = time.time() + timeout
+        while time.time() < deadline and time.time() - self.last_event < quiet:
+            time.sleep(0.1)
+
+    def listen(self, events) -> None:
+        for event in events:
+            if self.stop_event.is_set():
+                break
+            if event is None:
+                continue
+            self.last_event = time.time()
+            if event['type'] == 'transition':
+                self.transition(event)
+            elif event['type'] == 'scan':
+                self.ack(event)
+
+    def transition(self, event : dict[str, any]) -> None:
+        # published before the scan event of the same frame
+        with self.condition:
+            fed = self.pending.get(event.get('trace_id'))
+            if fed is None:
+                return
+            loop, seq, camera, _ = fed
+            self.replayed.setdefault(loop, []).append((seq, camera, event['index'], STATE_CODES[event['new']]))
+
+    def ack(self, event : dict[str, any]) -> None:
+        with self.condition:
+            fed = self.pending.pop(event.get('trace_id'), None)
+            if fed is None:
+                return
+            latency = event['latency'] if event.get('latency') is not None else event['ts'] - event['captured_at']
+            self.latencies.append(latency)
+            self.window_latencies.append(latency)
+            self.scanned += 1
+            if self.outstanding.get(fed[2]) == event['trace_id']:
+                del self.outstanding[fed[2]]
+            self.condition.notify_all()
+
+    def feed(self, entry : dict[str, any], loop : int) -> None:
+        camera = entry['camera']
+        trace  = new_frame_trace(camera, source = 'replay')
+        trace['replay_of'] = entry['trace_id']
+        with self.condition:
+            self.pending[trace['trace_id']] = (loop, entry['seq'], camera, time.time())
+            self.outstanding[camera] = trace['trace_id']
+        write_traced_jpeg(os.path.join(self.devices_dir, f"{camera}.jpg"), self.recording.frame_bytes(entry), trace)
+        self.fed += 1
+
+    def wait_scanned(self, camera : str) -> None:
+        # max speed: one frame per camera in flight
+        deadline = time.time() + self.ack_timeout
+        with self.condition:
+            while camera in self.outstanding and not self.stop_event.is_set():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.condition.wait(min(remaining, 0.5))
+
+    def expire(self, now : float) -> None:
+        # coalesced, shed or failed frames never get a scan event
+        with self.condition:
+            for trace_id, (_, _, camera, fed_at) in list(self.pending.items()):
+                if now - fed_at > self.ack_timeout:
+                    del self.pending[trace_id]
+                    if self.outstanding.get(camera) == trace_id:
+                        del self.outstanding[camera]
+                    self.lost += 1
+
+    def sample(self, start : float, last : dict[str, any], final : bool = False) -> None:
+        now = time.time()
+        self.expire(now)
+        if now - last['at'] < self.window and not final:
+            return
+        with self.condition:
+            latencies, self.window_latencies = self.window_latencies, []
+        self.windows.append({
+            't'       : now - start,
+            'fed'     : self.fed - last['fed'],
+            'scanned' : len(latencies),
+            'p50'     : percentile(latencies, 50) if latencies else None,
+            'p95'     : percentile(latencies, 95) if latencies else None,
+            'rss'     : self.rss() if self.rss is not None else None,
+            # a short last window would skew the drift
+            'partial' : now - last['at'] < self.window / 2
+        })
+        last.update({'at' : now, 'fed' : self.fed})
+
+    def run(self) -> dict[str, any]:
+        """
+        Replay loops times (or until duration seconds passed), wait for the
+        last scan events and return the report (see format_replay_report).
+        Stops early when stop_event is set.
+        """
+        entries = self.recording.entries
+        first   = entries[0]['captured_at']
+        span    = self.recording.span()
+        start   = time.time()
+        last    = {'at' : start, 'fed' : 0}
+
+        loop = 0
+        while not self.stop_event.is_set():
+            for entry in entries:
+                if self.stop_event.is_set() or (self.duration is not None and time.time() - start >= self.duration):
+                    break
+                if self.speed > 0:
+                    target = start + (loop * span + entry['captured_at'] - first) / self.speed
+                    while time.time() < target and not self.stop_event.is_set():
+                        self.stop_event.wait(min(target - time.time(), 0.5))
+                        self.sample(start, last)
+                else:
+                    self.wait_scanned(entry['camera'])
+                self.feed(entry, loop)
+                self.sample(start, last)
+            loop += 1
+            if self.duration is not None and time.time() - start >= self.duration:
+                break
+            if self.duration is None and loop >= self.loops:
+                break
+        fed_until = time.time()
+
+        # the last frames are still in the pipeline, coalesced ones never report
+        deadline = time.time() + self.ack_timeout
+        while self.pending and time.time() < deadline and time.time() - max(self.last_event, fed_until) < DRAIN_QUIET:
+            time.sleep(0.1)
+        with self.condition:
+            self.lost += len(self.pending)
+            self.pending.clear()
+        self.sample(start, last, final = True)
+        self.stop_event.set()
+        elapsed = time.time() - start
+
+        recorded = [(x['seq'], x['camera'], x['product'], x['new']) for x in self.recording.transitions]
+        return {
+            'speed'      : self.speed,
+            'loops'      : loop,
+            'elapsed'    : elapsed,
+            'fed'        : self.fed,
+            'scanned'    : self.scanned,
+            'lost'       : self.lost,
+            'feed_rate'  : self.fed / max(1e-9, fed_until - start),
+            'throughput' : self.scanned / max(1e-9, elapsed),
+            'latency'    : {
+                'p50' : percentile(self.latencies, 50),
+                'p95' : percentile(self.latencies, 95),
+                'p99' : percentile(self.latencies, 99),
+                'max' : max(self.latencies, default = 0.0)
+            },
+            'recorded_latency' : self.recording.info.get('latency'),
+            'agreement'  : {
+                index : state_agreement(recorded, self.replayed.get(index, []), self.recording.positions)
+                for index in range(loop)
+            },
+            'windows'    : self.windows,
+            'drift'      : {
+                'p95_per_hour' : drift_per_hour(self.windows, 'p95'),
+                'rss_per_hour' : drift_per_hour(self.windows, 'rss')
+            }
+        }
+
+def format_replay_report(report : dict[str, any]) -> str:
+    speed = f"{report['speed']:g}x" if report['speed'] > 0 else 'max'
+    latency = report['latency']
+    lines = [
+        f"Replay: {report['loops']} loop(s) at {speed} in {report['elapsed']:.1f}s",
+        f"Frames: {report['fed']} fed ({report['feed_rate']:.2f}/s), {report['scanned']} scanned ({report['throughput']:.2f}/s), {report['lost']} coalesced, shed or lost",
+        f"Capture -> visible latency: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, p99 {latency['p99']:.2f}s, max {latency['max']:.2f}s"
+    ]
+    recorded = report.get('recorded_latency')
+    if recorded:
+        lines.append(f"Recorded run latency:       p50 {recorded['p50']:.2f}s, p95 {recorded['p95']:.2f}s, p99 {recorded['p99']:.2f}s")
+
+    if len(report['agreement']) > 1:
+        lines.append("Loops after the first start from the previous loop's end state, not the recorded one")
+    lines.append(f"{'Loop':>5} {'Recorded':>9} {'Replayed':>9} {'Matched':>8} {'Agree %':>8} {'Final diff':>11}")
+    for index, result in sorted(report['agreement'].items(), key = lambda x: int(x[0])):
+        lines.append(
+            f"{int(index):>5} {result['recorded']:>9} {result['replayed']:>9} {result['matched']:>8} "
+            f"{100.0 * result['agreement']:>8.1f} {result['final_mismatches']:>11}"
+        )
+
+    if len(report['windows']) > 1:
+        lines.append(f"{'Window s':>9} {'Fed':>6} {'Scanned':>8} {'p50 s':>7} {'p95 s':>7} {'RSS MB':>8}")
+        for window in report['windows']:
+            lines.append(
+                f"{window['t']:>9.0f} {window['fed']:>6} {window['scanned']:>8} "
+                f"{window['p50'] if window['p50'] is not None else float('nan'):>7.2f} "
+                f"{window['p95'] if window['p95'] is not None else float('nan'):>7.2f} "
+                f"{window['rss'] / (1024 * 1024) if window['rss'] is not None else float('nan'):>8.1f}"
+            )
+        drift = report['drift']
+        if drift['p95_per_hour'] is None and drift['rss_per_hour'] is None:
+            lines.append("Drift: not enough windows (needs 3)")
+        else:
+            lines.append(
+                "Drift per hour:"
+                + (f" p95 latency {drift['p95_per_hour']:+.3f}s" if drift['p95_per_hour'] is not None else '')
+                + (f", RSS {drift['rss_per_hour'] / (1024 * 1024):+.1f} MB" if drift['rss_per_hour'] is not None else '')
+            )
+    return "\n".join(lines)
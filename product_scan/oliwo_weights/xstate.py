@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+
+# product states, stored as uint8 codes in this order
+STATE_NAMES = ('full', 'reduced', 'empty')
+STATE_CODES = {name : code for code, name in enumerate(STATE_NAMES)}
+
+class ShelfCatalog:
+    """
+    Products of one camera from product_information/<camera>.json.
+    Names and coordinates are kept as compact arrays; the list of dicts the
+    matching helpers expect is built once and shared read-only.
+    """
+
+    def __init__(self, products_list : list[dict[str, any]], mtime : float = 0.0):
+        self.mtime    = mtime
+        self.names    = [x['name'] for x in products_list]
+        self.coords   = np.array([x['coords'] for x in products_list], dtype = np.int32).reshape(-1, 4)
+        self.index    = {name : i for i, name in enumerate(self.names)}
+        self.products = [{'name' : name, 'coords' : [int(v) for v in box]} for name, box in zip(self.names, self.coords)]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+class ShelfStateStore:
+    """
+    In-memory product catalogs and states for every camera.
+    Catalogs are parsed once and reloaded only when their file changes;
+    states are uint8 code arrays aligned with the catalog. The JSON state
+    file keeps its format and is rewritten atomically only when a product
+    actually changed state (or when it does not exist yet).
+    With a database (ShelfStateDB) catalogs and states are read from and
+    written to it, one transaction per scan, and the JSON files are an
+    optional export. The cache is dropped whenever another process (the
+    service, a UI scanner, setup) committed to the database.
+    Transitions are also appended to a TransitionHistory and published on a
+    StateEventBus when those are given. Each product remembers the capture
+    trace (trace_id, captured_at) of the frame that last changed its state.
+    """
+
+    def __init__(self, information_dir : str, state_dir : str, database = None, export_json : bool = True, history = None, events = None):
+        self.information_dir = information_dir
+        self.state_dir       = state_dir
+        self.database        = database
+        self.history         = history
+        self.events          = events
+        self.export_json     = export_json or database is None
+
+        self.catalogs : dict[str, ShelfCatalog] = {}
+        self.codes    : dict[str, np.ndarray]   = {}
+        self.traces   : dict[str, list[dict[str, any] | None]] = {}
+
+        # database version the cache was loaded at
+        self.db_version : int | None = None
+
+        # scan stages of several cameras share the store; re-entrant since
+        # apply and states go through catalog (and sync)
+        self.lock = threading.RLock()
+
+    def information_path(self, camera : str) -> str:
+        return os.path.join(self.information_dir, f"{camera}.json")
+
+    def state_path(self, camera : str) -> str:
+        return os.path.join(self.state_dir, f"{camera}.json")
+
+    def sync(self) -> None:
+        # another connection committed since the cache was loaded
+        with self.lock:
+            version = self.database.data_version()
+            if version != self.db_version:
+                self.db_version = version
+                self.catalogs.clear()
+                self.codes.clear()
+                self.traces.clear()
+
+    def catalog(self, camera : str) -> ShelfCatalog | None:
+        with self.lock:
+            if self.database is not None:
+                return self.database_catalog(camera)
+
+            info_path = self.information_path(camera)
+            try:
+                mtime = os.path.getmtime(info_path)
+            except OSError:
+                return None
+
+            cached = self.catalogs.get(camera)
+            if cached is not None and cached.mtime == mtime:
+                return cached
+
+            # new or regenerated by setup, previous states no longer line up
+            with open(info_path, 'r') as file:
+                catalog = ShelfCatalog(json.load(file), mtime)
+            self.catalogs[camera] = catalog
+            self.codes.pop(camera, None)
+            self.traces.pop(camera, None)
+            return catalog
+
+    def database_catalog(self, camera : str) -> ShelfCatalog | None:
+        self.sync()
+        cached = self.catalogs.get(camera)
+        if cached is not None:
+            return cached
+
+        # every process scans against the catalog in the database
+        catalog = self.database.load_catalog(camera)
+        if catalog is None:
+            # first scan after setup wrote product_information
+            info_path = self.information_path(camera)
+            if not os.path.exists(info_path):
+                return None
+            with open(info_path, 'r') as file:
+                catalog = ShelfCatalog(json.load(file), os.path.getmtime(info_path))
+            self.database.put_catalog(camera, catalog)
+        self.catalogs[camera] = catalog
+        return catalog
+
+    def states(self, camera : str) -> np.ndarray | None:
+        with self.lock:
+            catalog = self.catalog(camera)
+            if catalog is None:
+                return None
+
+            codes = self.codes.get(camera)
+            if codes is not None:
+                return codes
+
+            # last export, also tells which frame changed each product
+            entries = []
+            state_path = self.state_path(camera)
+            if os.path.exists(state_path):
+                with open(state_path, 'r') as file:
+                    entries = json.load(file)
+
+            traces = [None] * len(catalog)
+            for prod in entries:
+                i = catalog.index.get(prod.get('name'))
+                if i is not None and prod.get('trace_id') is not None:
+                    traces[i] = {'trace_id' : prod['trace_id'], 'captured_at' : prod.get('captured_at')}
+            self.traces[camera] = traces
+
+            if self.database is not None:
+                codes = self.database.load_states(camera, len(catalog))
+                if codes is not None:
+                    self.codes[camera] = codes
+                    return codes
+
+            # everything is full until a state file says otherwise
+            codes = np.zeros(len(catalog), dtype = np.uint8)
+            for prod in entries:
+                i = catalog.index.get(prod.get('name'))
+                if i is not None:
+                    codes[i] = STATE_CODES.get(prod.get('state'), 0)
+            self.codes[camera] = codes
+
+            # first time this camera is seen by the database
+            if self.database is not None:
+                self.database.write_states(camera, codes)
+            return codes
+
+    def state_list(self, camera : str) -> list[dict[str, any]]:
+        # product_state JSON layout
+        with self.lock:
+            catalog = self.catalog(camera)
+            codes   = self.states(camera)
+            if catalog is None:
+                return []
+            traces = self.traces.get(camera) or [None] * len(catalog)
+
+            state_list = []
+            for prod, code, trace in zip(catalog.products, codes, traces):
+                entry = {
+                    'name'   : prod['name'],
+                    'coords' : prod['coords'],
+                    'state'  : STATE_NAMES[code]
+                }
+                # frame that last changed this product
+                if trace is not None:
+                    entry.update(trace)
+                state_list.append(entry)
+            return state_list
+
+    def attention(self, camera : str) -> tuple[int, int]:
+        with self.lock:
+            codes = self.states(camera)
+            if codes is None:
+                return (0, 0)
+            return (int(np.count_nonzero(codes)), len(codes))
+
+    def apply(self, camera : str, new_codes : np.ndarray, trace : dict[str, any] | None = None) -> list[tuple[int, int, int]]:
+        """
+        Replace the states of a camera, returns (product index, old code, new code)
+        for every transition. Written through to disk only on a transition.
+        trace is the capture trace of the scanned frame (frame_trace).
+        """
+        with self.lock:
+            codes = self.states(camera)
+            if codes is None or len(codes) != len(new_codes):
+                # catalog was regenerated while the scan ran
+                return []
+
+            changed = np.flatnonzero(codes != new_codes)
+            transitions = [(int(i), int(codes[i]), int(new_codes[i])) for i in changed]
+            self.codes[camera] = np.array(new_codes, dtype = np.uint8)
+
+            trace_info = None
+            if trace is not None:
+                trace_info = {'trace_id' : trace['trace_id'], 'captured_at' : trace['captured_at']}
+                for i in changed:
+                    self.traces[camera][i] = trace_info
+
+            # same timestamp in the database and the history
+            timestamp = time.time()
+            if self.database is not None:
+                self.database.record_scan(camera, transitions, timestamp, trace_info)
+            if self.history is not None:
+                self.history.append(camera, transitions, timestamp)
+            if self.events is not None:
+                names = self.catalogs[camera].names
+                for i, old, new in transitions:
+                    self.events.publish(
+                        'transition', 
+                        ts      = timestamp, 
+                        camera  = camera, 
+                        product = names[i], 
+                        index   = i, 
+                        old     = STATE_NAMES[old], 
+                        new     = STATE_NAMES[new],
+                        **(trace_info or {})
+                    )
+
+            if self.export_json and (transitions or not os.path.exists(self.state_path(camera))):
+                self.save(camera)
+            return transitions
+
+    def reset(self) -> None:
+        # setup starts every camera from scratch
+        with self.lock:
+            self.catalogs.clear()
+            self.codes.clear()
+            self.traces.clear()
+            if self.database is not None:
+                self.database.clear()
+
+    def save(self, camera : str) -> None:
+        # write atomically so readers never see a partial file
+        with self.lock:
+            os.makedirs(self.state_dir, exist_ok = True)
+            state_path = self.state_path(camera)
+            tmp_path   = f"{state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state_list(camera), f, indent = 2)
+            os.replace(tmp_path, state_path)
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import queue
+import threading
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from oliwo_weights.xstate import STATE_NAMES
+
+# longest long-poll a client may ask for (seconds)
+MAX_WAIT = 60.0
+
+class ShelfStateView:
+    """
+    In-memory copy of every camera's product states for the HTTP API,
+    seeded from the state database and kept current from the event bus.
+    Per-camera and store-wide state counts are adjusted per transition.
+    Every change takes the next version number; the version of a resource
+    (with the bus epoch) is its ETag, and encoded bodies are cached per version.
+    """
+
+    def __init__(self, bus, database, visual_dir : str | None = None):
+        self.bus       = bus
+        self.database  = database
+        self.condition = threading.Condition()
+
+        self.version = 0
+        self.products : dict[str, list[dict[str, any]]] = {}
+        self.rows     : dict[str, dict[str, int]]       = {}
+        self.counts   : dict[str, dict[str, int]]       = {}
+        self.totals   : dict[str, int] = {x : 0 for x in STATE_NAMES}
+        self.visuals  : dict[str, str] = {}
+
+        # resource key -> version of its last change
+        self.versions : dict[any, int] = {'summary' : 0}
+        self.bodies   : dict[any, tuple[int, bytes, str]] = {}
+
+        # subscribe before the snapshot, replayed transitions are idempotent
+        self.running = True
+        _, self.subscriber = bus.subscribe()
+        self.load()
+
+        # overlays written before this service started
+        if visual_dir is not None and os.path.isdir(visual_dir):
+            with self.condition:
+                for file in os.listdir(visual_dir):
+                    if file.lower().endswith(('.jpg', '.jpeg')):
+                        self.visuals[os.path.splitext(file)[0]] = os.path.join(visual_dir, file)
+                self.bump([('visual', x) for x in self.visuals])
+
+        self.thread = threading.Thread(target = self.follow, name = 'state-view', daemon = True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.running = False
+        self.bus.unsubscribe(self.subscriber)
+        self.thread.join(timeout = 1.0)
+
+    def load(self, camera : str | None = None) -> None:
+        cameras : dict[str, list[dict[str, any]]] = {}
+        for prod in self.database.snapshot(camera):
+            cameras.setdefault(prod['camera'], []).append(
+                {'name' : prod['name'], 'coords' : prod['coords'], 'state' : prod['state'], 'updated_at' : prod['updated_at']}
+            )
+
+        with self.condition:
+            replaced = list(self.products) if camera is None else [camera]
+            for name in replaced:
+                self.products.pop(name, None)
+                self.rows.pop(name, None)
+                self.counts.pop(name, None)
+            self.products.update(cameras)
+
+            for name, products in cameras.items():
+                self.rows[name]   = {prod['name'] : i for i, prod in enumerate(products)}
+                self.counts[name] = {x : 0 for x in STATE_NAMES}
+                for prod in products:
+                    self.counts[name][prod['state']] += 1
+
+            self.totals = {x : sum(counts[x] for counts in self.counts.values()) for x in STATE_NAMES}
+            self.bump(['summary'] + [('states', x) for x in set(replaced) | set(cameras)])
+
+    def bump(self, keys : list) -> None:
+        # caller holds the condition
+        self.version += 1
+        for key in keys:
+            self.versions[key] = self.version
+        self.condition.notify_all()
+
+    def follow(self) -> None:
+        while self.running:
+            try:
+                event = self.subscriber.get(timeout = 0.5)
+            except queue.Empty:
+                continue
+            if event is None:
+                # dropped for falling behind, start over from the database
+                _, self.subscriber = self.bus.subscribe()
+                self.load()
+                continue
+            self.apply(event)
+
+    def apply(self, event : dict[str, any]) -> None:
+        camera = event.get('camera')
+        if event['type'] == 'transition':
+            with self.condition:
+                row = self.rows.get(camera, {}).get(event['product'])
+                if row is not None:
+                    prod = self.products[camera][row]
+                    if prod['state'] != event['new']:
+                        self.counts[camera][prod['state']] -= 1
+                        self.counts[camera][event['new']]  += 1
+                        self.totals[prod['state']] -= 1
+                        self.totals[event['new']]  += 1
+                        prod['state'] = event['new']
+                    prod['updated_at'] = event['ts']
+                    self.bump(['summary', ('states', camera)])
+                    return
+
+            # new camera or regenerated catalog, the database already has it
+            self.load(camera)
+
+        elif event['type'] == 'scan':
+            if camera not in self.products:
+                self.load(camera)
+            if event.get('visual'):
+                with self.condition:
+                    self.visuals[camera] = event['visual']
+                    self.bump([('visual', camera)])
+
+    def resource(self, path : str) -> any:
+        parts = [unquote(x) for x in path.strip('/').split('/') if x]
+        if parts in ([], ['summary']):
+            return 'summary'
+        if parts == ['cameras']:
+            return 'cameras'
+        if len(parts) == 2 and parts[0] == 'cameras':
+            return ('states', parts[1])
+        if len(parts) == 3 and parts[0] == 'cameras' and parts[2] == 'visual':
+            return ('visual', parts[1])
+        return None
+
+    def resource_version(self, key : any) -> int | None:
+        # camera list changes together with the summary
+        return self.versions.get('summary' if key == 'cameras' else key)
+
+    def etag(self, version : int | None) -> str | None:
+        return None if version is None else f'"{self.bus.epoch}-{version}"'
+
+    def wait_for_change(self, key : any, etag : str | None, timeout : float) -> None:
+        # long-poll: block while the client already has the current version
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.running and etag is not None and etag == self.etag(self.resource_version(key)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self.condition.wait(remaining)
+
+    def body(self, key : any) -> tuple[int, bytes, str] | None:
+        """
+        (version, encoded body, content type) of a resource, None when it does not exist.
+        """
+        with self.condition:
+            version = self.resource_version(key)
+            if version is None:
+                return None
+            cached = self.bodies.get(key)
+            if cached is not None and cached[0] == version:
+                return cached
+
+            if key == 'summary':
+                data = {'epoch' : self.bus.epoch, 'version' : version, 'total' : dict(self.totals), 'cameras' : {x : dict(y) for x, y in self.counts.items()}}
+            elif key == 'cameras':
+                data = [{'camera' : x, 'products' : len(self.products[x]), **self.counts[x]} for x in sorted(self.products)]
+            elif key[0] == 'states':
+                if key[1] not in self.products:
+                    return None
+                data = {'camera' : key[1], 'version' : version, 'products' : self.products[key[1]]}
+            else:
+                visual = self.visuals.get(key[1])
+                data = None
+
+        if data is None:
+            # latest annotated frame, read once per version
+            try:
+                with open(visual, 'rb') as f:
+                    encoded = (version, f.read(), 'image/jpeg')
+            except OSError:
+                return None
+        else:
+            encoded = (version, json.dumps(data).encode('utf-8'), 'application/json')
+
+        with self.condition:
+            self.bodies[key] = encoded
+        return encoded
+
+class StateAPIHandler(BaseHTTPRequestHandler):
+    view : ShelfStateView = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        key = self.view.resource(url.path)
+        if key is None:
+            self.send_error(404, "Unknown resource")
+            return
+
+        try:
+            wait = min(float(parse_qs(url.query).get('wait', ['0'])[0]), MAX_WAIT)
+        except ValueError:
+            self.send_error(400, "wait must be a number of seconds")
+            return
+
+        client_etag = self.headers.get('If-None-Match')
+        if wait > 0:
+            self.view.wait_for_change(key, client_etag, wait)
+
+        encoded = self.view.body(key)
+        if encoded is None:
+            self.send_error(404, "No data for this camera")
+            return
+
+        version, body, content_type = encoded
+        etag = self.view.etag(version)
+        if client_etag == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # dashboards poll constantly, keep the service output readable
+        pass
+
+class StateAPIServer:
+    """
+    Local HTTP API over a ShelfStateView:
+      GET /summary                  store-wide and per-camera state counts
+      GET /cameras                  cameras with their product counts
+      GET /cameras/<camera>         product states of one camera
+      GET /cameras/<camera>/visual  latest annotated frame (JPEG)
+    Responses carry an ETag; If-None-Match returns 304 when nothing changed,
+    and ?wait=<seconds> holds the request until it does (long-poll).
+    """
+
+    def __init__(self, view : ShelfStateView, host : str = '127.0.0.1', port : int = 8765):
+        self.view  = view
+        handler    = type('BoundStateAPIHandler', (StateAPIHandler,), {'view' : view})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+
+        self.thread = threading.Thread(target = self.httpd.serve_forever, kwargs = {'poll_interval' : 0.5}, name = 'state-api', daemon = True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.view.close()
+        with self.view.condition:
+            self.view.condition.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+
+from oliwo_weights.xstate import ShelfCatalog, STATE_CODES, STATE_NAMES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    camera  TEXT    NOT NULL,
+    product INTEGER NOT NULL,
+    name    TEXT    NOT NULL,
+    x0 INTEGER NOT NULL, y0 INTEGER NOT NULL, x1 INTEGER NOT NULL, y1 INTEGER NOT NULL,
+    PRIMARY KEY (camera, product)
+);
+CREATE TABLE IF NOT EXISTS state (
+    camera     TEXT    NOT NULL,
+    product    INTEGER NOT NULL,
+    state      INTEGER NOT NULL,
+    updated_at REAL    NOT NULL,
+    PRIMARY KEY (camera, product)
+);
+CREATE INDEX IF NOT EXISTS state_by_state ON state (state, camera);
+CREATE TABLE IF NOT EXISTS transitions (
+    id        INTEGER PRIMARY KEY,
+    ts        REAL    NOT NULL,
+    camera    TEXT    NOT NULL,
+    product   INTEGER NOT NULL,
+    old_state INTEGER NOT NULL,
+    new_state INTEGER NOT NULL,
+    trace_id    TEXT,
+    captured_at REAL
+);
+CREATE INDEX IF NOT EXISTS transitions_by_camera ON transitions (camera, ts);
+CREATE TABLE IF NOT EXISTS state_names (
+    state INTEGER PRIMARY KEY,
+    name  TEXT    NOT NULL
+);
+CREATE VIEW IF NOT EXISTS product_state AS
+    SELECT c.camera, c.name, c.x0, c.y0, c.x1, c.y1, n.name AS state, s.updated_at
+    FROM catalog c
+    JOIN state s       ON s.camera = c.camera AND s.product = c.product
+    JOIN state_names n ON n.state  = s.state;
+"""
+
+class ShelfStateDB:
+    """
+    Product catalog, current state and state transitions in one SQLite file.
+    WAL mode lets the UI and launcher read consistent snapshots while the
+    scanner writes; every scan is written in a single transaction. States are
+    stored as codes, the product_state view joins names for ad-hoc queries.
+    """
+
+    def __init__(self, db_path : str, read_only : bool = False):
+        self.db_path = db_path
+        self.lock    = threading.Lock()
+
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri = True, check_same_thread = False, timeout = 5.0)
+            return
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok = True)
+        self.conn = sqlite3.connect(db_path, check_same_thread = False, timeout = 5.0)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+            # databases created before transitions carried the capture trace
+            columns = [x[1] for x in self.conn.execute("PRAGMA table_info(transitions)")]
+            if 'trace_id' not in columns:
+                self.conn.execute("ALTER TABLE transitions ADD COLUMN trace_id TEXT")
+                self.conn.execute("ALTER TABLE transitions ADD COLUMN captured_at REAL")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO state_names (state, name) VALUES (?, ?)", list(enumerate(STATE_NAMES))
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    def clear(self) -> None:
+        # catalogs and current states, the transition history is kept
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM catalog")
+            self.conn.execute("DELETE FROM state")
+
+    def cameras(self) -> list[str]:
+        with self.lock:
+            rows = self.conn.execute("SELECT DISTINCT camera FROM catalog ORDER BY camera").fetchall()
+        return [x[0] for x in rows]
+
+    def put_catalog(self, camera : str, catalog : ShelfCatalog) -> bool:
+        """
+        Store the catalog of a camera. Returns True when it differs from the
+        stored one, in which case the stored states no longer apply and are dropped.
+        """
+        rows = [
+            (camera, i, name, *[int(v) for v in box])
+            for i, (name, box) in enumerate(zip(catalog.names, catalog.coords))
+        ]
+        with self.lock:
+            stored = self.conn.execute(
+                "SELECT camera, product, name, x0, y0, x1, y1 FROM catalog WHERE camera = ? ORDER BY product", (camera,)
+            ).fetchall()
+            if stored == rows:
+                return False
+
+            with self.conn:
+                self.conn.execute("DELETE FROM catalog WHERE camera = ?", (camera,))
+                self.conn.execute("DELETE FROM state WHERE camera = ?", (camera,))
+                self.conn.executemany("INSERT INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return True
+
+    def load_catalog(self, camera : str) -> ShelfCatalog | None:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name, x0, y0, x1, y1 FROM catalog WHERE camera = ? ORDER BY product", (camera,)
+            ).fetchall()
+        if not rows:
+            return None
+        return ShelfCatalog([{'name' : name, 'coords' : [x0, y0, x1, y1]} for name, x0, y0, x1, y1 in rows])
+
+    def data_version(self) -> int:
+        # changes whenever another connection (or process) commits
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_states(self, camera : str, size : int) -> np.ndarray | None:
+        with self.lock:
+            rows = self.conn.execute("SELECT product, state FROM state WHERE camera = ?", (camera,)).fetchall()
+        if not rows:
+            return None
+
+        codes = np.zeros(size, dtype = np.uint8)
+        for product, state in rows:
+            if product < size:
+                codes[product] = state
+        return codes
+
+    def write_states(self, camera : str, codes : np.ndarray, timestamp : float | None = None) -> None:
+        timestamp = time.time() if timestamp is None else timestamp
+        rows = [(camera, i, int(code), timestamp) for i, code in enumerate(codes)]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)", rows)
+
+    def record_scan(self, camera : str, transitions : list[tuple[int, int, int]], timestamp : float | None = None, trace : dict[str, any] | None = None) -> None:
+        # one transaction per scan for the state rows and their history
+        if not transitions:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        trace_id, captured_at = (trace['trace_id'], trace['captured_at']) if trace is not None else (None, None)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE state SET state = ?, updated_at = ? WHERE camera = ? AND product = ?",
+                [(new, timestamp, camera, i) for i, _, new in transitions]
+            )
+            self.conn.executemany(
+                "INSERT INTO transitions (ts, camera, product, old_state, new_state, trace_id, captured_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(timestamp, camera, i, old, new, trace_id, captured_at) for i, old, new in transitions]
+            )
+
+    def transitions(self, since : float, until : float | None = None, camera : str | None = None) -> list[dict[str, any]]:
+        # recorded transitions in time order, product as catalog index, states as codes
+        query  = "SELECT ts, camera, product, old_state, new_state, trace_id, captured_at FROM transitions WHERE ts >= ?"
+        params = [since]
+        if until is not None:
+            query += " AND ts < ?"
+            params.append(until)
+        if camera is not None:
+            query += " AND camera = ?"
+            params.append(camera)
+        query += " ORDER BY id"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            {'ts' : ts, 'camera' : cam, 'product' : product, 'old' : old, 'new' : new, 'trace_id' : trace_id, 'captured_at' : captured_at}
+            for ts, cam, product, old, new, trace_id, captured_at in rows
+        ]
+
+    def snapshot(self, camera : str | None = None, state : str | None = None) -> list[dict[str, any]]:
+        """
+        Current products as dicts (camera, name, coords, state, updated_at),
+        read in one statement so every row comes from the same snapshot.
+        """
+        query  = "SELECT c.camera, c.name, c.x0, c.y0, c.x1, c.y1, s.state, s.updated_at FROM state s JOIN catalog c ON c.camera = s.camera AND c.product = s.product"
+        where  = []
+        params = []
+        if camera is not None:
+            where.append("s.camera = ?")
+            params.append(camera)
+        if state is not None:
+            where.append("s.state = ?")
+            params.append(STATE_CODES[state])
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY c.camera, c.product"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            {
+                'camera'     : cam,
+                'name'       : name,
+                'coords'     : [x0, y0, x1, y1],
+                'state'      : STATE_NAMES[code],
+                'updated_at' : updated_at
+            }
+            for cam, name, x0, y0, x1, y1, code, updated_at in rows
+        ]
+
+    def state_counts(self) -> dict[str, dict[str, int]]:
+        with self.lock:
+            rows = self.conn.execute("SELECT camera, state, COUNT(*) FROM state GROUP BY camera, state").fetchall()
+        counts : dict[str, dict[str, int]] = {}
+        for camera, code, count in rows:
+            counts.setdefault(camera, {x : 0 for x in STATE_NAMES})[STATE_NAMES[code]] = count
+        return counts
+
+    def import_json(self, information_dir : str, state_dir : str) -> int:
+        """
+        Migrate product_information/ and product_state/ JSON files.
+        Cameras without a state file start with every product full.
+        """
+        imported = 0
+        for file in sorted(os.listdir(information_dir)):
+            if not file.endswith('.json'):
+                continue
+            camera = os.path.splitext(file)[0]
+            with open(os.path.join(information_dir, file), 'r') as f:
+                catalog = ShelfCatalog(json.load(f))
+            self.put_catalog(camera, catalog)
+
+            codes = np.zeros(len(catalog), dtype = np.uint8)
+            state_path = os.path.join(state_dir, file)
+            timestamp  = time.time()
+            if os.path.exists(state_path):
+                timestamp = os.path.getmtime(state_path)
+                with open(state_path, 'r') as f:
+                    for prod in json.load(f):
+                        i = catalog.index.get(prod.get('name'))
+                        if i is not None:
+                            codes[i] = STATE_CODES.get(prod.get('state'), 0)
+            self.write_states(camera, codes, timestamp)
+            imported += 1
+        return imported
+
+    def export_json(self, state_dir : str) -> int:
+        # product_state/<camera>.json in the layout the scanner always wrote
+        os.makedirs(state_dir, exist_ok = True)
+        cameras : dict[str, list[dict[str, any]]] = {}
+        for prod in self.snapshot():
+            cameras.setdefault(prod['camera'], []).append(
+                {'name' : prod['name'], 'coords' : prod['coords'], 'state' : prod['state']}
+            )
+
+        for camera, products in cameras.items():
+            state_path = os.path.join(state_dir, f"{camera}.json")
+            tmp_path   = f"{state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(products, f, indent = 2)
+            os.replace(tmp_path, state_path)
+        return len(cameras)
@@ -1,8 +1,12 @@
 import os
-import time
+import sys
 import argparse
 from oliwo_weights.xoliwo import OliwoModel
 
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame_watcher import FrameWatcher
+
 def find_jpg_images(directory):
     jpg_images = []
     for root, _, files in os.walk(directory):
@@ -36,30 +40,21 @@ if __name__ == "__main__":
     ## automatic updates here
     oliow_model = OliwoModel()
 
-    # image files
-    last_modified_time = [0] * len(image_file_list)
+    # debounced frame-ready events, new cameras are picked up as they appear
+    watcher = FrameWatcher(root_directory, extensions = ('.jpg',))
+    print("Watching :", watcher.mode)
 
     try:
         while True:
             
-            # enumare the file list
-            for i, file_path in enumerate(image_file_list):
-            
-                # Check if the file has been modified
-                current_modified = os.path.getmtime(file_path)
-                
-                # check current modified time
-                if current_modified == last_modified_time[i]:
-                    continue
-                
+            # block until a frame has been written
+            for event in watcher.wait():
+                file_path = event.path
                 file_name = os.path.basename(file_path)
 
-                # last updated time is diffrent
+                # frame has been updated
                 print("Updating :", file_name)
 
-                # update time
-                last_modified_time[i] = current_modified
-
                 # load image frame
                 image = oliow_model.load_image(file_path)
 
@@ -78,8 +73,9 @@ if __name__ == "__main__":
                 output_path = os.path.join(working_directory, file_name)
                 ovelayed.save(output_path)
 
-            time.sleep(1)  # Simulate some work
     except KeyboardInterrupt:
         print("Received Ctrl+C. Exiting gracefully...")
+    finally:
+        watcher.close()
     
     print("Exiting...")
@@ -13,6 +13,16 @@ from PyQt6.QtCore import QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QPixmap
 from PyQt6.QtCore import Qt
 
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory_budget import MemoryMonitor, MEMORY_CHECK_INTERVAL
+
+# activity log lines kept, older ones are dropped (the UI runs for days)
+LOG_MAX_LINES = 2000
+
+# resident memory above which the activity log shows a warning (MB)
+UI_MEMORY_BUDGET_MB = 1024
+
 class ProductScanThread(QThread):
     status_updated = pyqtSignal(str)
     progress_updated = pyqtSignal(int)
@@ -74,6 +84,56 @@ class ProductScanThread(QThread):
             self.process.terminate()
             self.status_updated.emit("Process terminated")
 
+class ProductStateEventThread(QThread):
+    event_received = pyqtSignal(dict)
+    connection_changed = pyqtSignal(bool)
+    
+    def __init__(self, socket_path):
+        super().__init__()
+        self.socket_path = socket_path
+        self.running = True
+        
+        # position in the event stream, resumed after a reconnect
+        self.seq = 0
+        self.epoch = None
+        
+    def run(self):
+        from oliwo_weights.xevents import read_events
+        
+        connected = False
+        while self.running:
+            try:
+                # the first connection always asks for a resync (snapshot)
+                for event in read_events(self.socket_path, self.seq, self.epoch, timeout=0.5):
+                    if not self.running:
+                        break
+                    if event is None:
+                        continue
+                    if not connected:
+                        connected = True
+                        self.connection_changed.emit(True)
+                        
+                    if event['type'] == 'hello':
+                        self.epoch = event['epoch']
+                    if 'seq' in event and event['type'] != 'hello':
+                        self.seq = event['seq']
+                    self.event_received.emit(event)
+            except (OSError, ValueError):
+                pass
+                
+            if connected:
+                connected = False
+                self.connection_changed.emit(False)
+                
+            # service not running (yet), try again shortly
+            for _ in range(20):
+                if not self.running:
+                    break
+                self.msleep(100)
+                
+    def stop(self):
+        self.running = False
+
 class ProductScannerWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -83,9 +143,28 @@ class ProductScannerWindow(QMainWindow):
         self.current_thread = None
         self.setup_completed = False
         
+        # (camera, product name) -> row in the product state table
+        self.product_rows = {}
+        
         self.init_ui()
         self.check_setup_status()
         
+        # live state deltas from the running service instead of re-reading files
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        events_socket = os.path.join(base_dir, "retruxosaproject", "app_root", "state_events.sock")
+        self.events_thread = ProductStateEventThread(events_socket)
+        self.events_thread.event_received.connect(self.on_state_event)
+        self.events_thread.connection_changed.connect(self.on_events_connection)
+        self.events_thread.start()
+        
+        # RSS against the budget, warnings go to the activity log
+        self.memory = MemoryMonitor('product_scanner_ui', UI_MEMORY_BUDGET_MB)
+        self.memory.count('product_rows', lambda: len(self.product_rows))
+        self.memory.count('log_lines', lambda: self.status_log.document().blockCount())
+        self.memory_timer = QTimer()
+        self.memory_timer.timeout.connect(self.check_memory)
+        self.memory_timer.start(int(MEMORY_CHECK_INTERVAL * 1000))
+        
     def init_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -127,6 +206,7 @@ class ProductScannerWindow(QMainWindow):
         self.status_log = QTextEdit()
         self.status_log.setMaximumHeight(150)
         self.status_log.setReadOnly(True)
+        self.status_log.document().setMaximumBlockCount(LOG_MAX_LINES)
         log_layout.addWidget(self.status_log)
         
         clear_log_btn = QPushButton("Clear Log")
@@ -324,6 +404,9 @@ class ProductScannerWindow(QMainWindow):
         self.refresh_states_btn.clicked.connect(self.refresh_product_states)
         state_layout.addWidget(self.refresh_states_btn)
         
+        self.live_status_label = QLabel("Live updates: service not running")
+        state_layout.addWidget(self.live_status_label)
+        
         layout.addWidget(state_group)
         
         return tab
@@ -507,9 +590,20 @@ class ProductScannerWindow(QMainWindow):
             
     def refresh_product_states(self):
         self.product_state_table.setRowCount(0)
+        self.product_rows = {}
         
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         state_dir = os.path.join(base_dir, "retruxosaproject", "app_root", "product_state")
+        state_db = os.path.join(base_dir, "retruxosaproject", "app_root", "shelf_state.db")
+        
+        # Shared state database gives one consistent snapshot of every camera
+        if os.path.exists(state_db):
+            try:
+                self.refresh_product_states_db(state_db)
+                return
+            except Exception as e:
+                self.log_status(f"Error reading state database, falling back to JSON: {e}")
+                self.product_state_table.setRowCount(0)
         
         if not os.path.exists(state_dir):
             self.log_status("Product state directory not found")
@@ -537,6 +631,7 @@ class ProductScannerWindow(QMainWindow):
                         mod_time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mod_time))
                         self.product_state_table.setItem(row, 3, QTableWidgetItem(mod_time_str))
                         
+                        self.product_rows[(os.path.splitext(file)[0], product.get('name'))] = row
                         row += 1
                         
                 except Exception as e:
@@ -544,6 +639,58 @@ class ProductScannerWindow(QMainWindow):
                     
         self.log_status(f"Loaded {row} product states")
         
+    def refresh_product_states_db(self, state_db):
+        from oliwo_weights.xstatedb import ShelfStateDB
+        
+        database = ShelfStateDB(state_db, read_only=True)
+        try:
+            products = database.snapshot()
+        finally:
+            database.close()
+            
+        self.product_state_table.setRowCount(len(products))
+        for row, product in enumerate(products):
+            self.product_state_table.setItem(row, 0, QTableWidgetItem(f"{product['camera']}/{product['name']}"))
+            self.product_state_table.setItem(row, 1, QTableWidgetItem(product['state']))
+            
+            coords_str = f"[{', '.join(map(str, product['coords']))}]"
+            self.product_state_table.setItem(row, 2, QTableWidgetItem(coords_str))
+            
+            mod_time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(product['updated_at']))
+            self.product_state_table.setItem(row, 3, QTableWidgetItem(mod_time_str))
+            
+            self.product_rows[(product['camera'], product['name'])] = row
+            
+        self.log_status(f"Loaded {len(products)} product states from database")
+        
+    def on_state_event(self, event):
+        if event['type'] == 'resync':
+            # missed events are gone (or the service restarted), reload once
+            self.refresh_product_states()
+            
+        elif event['type'] == 'transition':
+            row = self.product_rows.get((event['camera'], event['product']))
+            if row is None:
+                # catalog changed since the table was loaded
+                self.refresh_product_states()
+                return
+            self.product_state_table.setItem(row, 1, QTableWidgetItem(event['new']))
+            mod_time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event['ts']))
+            self.product_state_table.setItem(row, 3, QTableWidgetItem(mod_time_str))
+            self.log_status(f"{event['camera']}/{event['product']}: {event['old']} -> {event['new']}")
+            
+        elif event['type'] == 'scan':
+            scan_time_str = time.strftime("%H:%M:%S", time.localtime(event['ts']))
+            self.live_status_label.setText(f"Live updates: last scan {event['camera']} at {scan_time_str} ({event['state_changes']} changes)")
+            
+    def on_events_connection(self, connected):
+        if connected:
+            self.live_status_label.setText("Live updates: connected")
+            self.log_status("Subscribed to product state events")
+        else:
+            self.live_status_label.setText("Live updates: service not running")
+            self.log_status("Product state events disconnected")
+        
     def clear_log(self):
         self.status_log.clear()
         self.log_status("Log cleared")
@@ -552,12 +699,20 @@ class ProductScannerWindow(QMainWindow):
         timestamp = time.strftime("%H:%M:%S")
         self.status_log.append(f"[{timestamp}] {message}")
         
+    def check_memory(self):
+        _, *warnings = self.memory.check()
+        for line in warnings:
+            self.log_status(line)
+        
     def closeEvent(self, event):
         if self.current_thread and self.current_thread.isRunning():
             self.current_thread.stop()
             self.current_thread.wait()
         if self.monitor_timer.isActive():
             self.monitor_timer.stop()
+        self.memory_timer.stop()
+        self.events_thread.stop()
+        self.events_thread.wait()
         event.accept()
 
 def main():
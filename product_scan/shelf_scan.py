@@ -1,22 +1,149 @@
 import os
+import sys
 import json
 import time
-import shutil
+import shlex
+import signal
+import asyncio
+import threading
+import subprocess
+import itertools
 import argparse
+import contextlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 
-from oliwo_weights.xoliwo  import OliwoModel
+from oliwo_weights.xdetect import ShelfDetector, PartialPrediction, load_detector, DETECTORS
 from oliwo_weights.xcodiff import (
-    find_differences, 
     find_jpg_images, 
     create_directory_force,
     copy_directory_contents,
     grab_file_from_path,
-    get_matching_prod_names
+    get_matching_prod_names,
+    load_diff_gray,
+    compare_gray_frames,
+    MAX_DRIFT_PX
 )
+from oliwo_weights.xreference import ReferenceFrameStore
+from oliwo_weights.xframe     import FrameContext
+from oliwo_weights.xstate     import ShelfStateStore, ShelfCatalog, STATE_CODES, STATE_NAMES
+from oliwo_weights.xstatedb   import ShelfStateDB
+from oliwo_weights.xhistory   import TransitionHistory, format_history_report
+from oliwo_weights.xpipeline  import PipelineStage, ScanPipeline, format_pipeline_report, percentile
+from oliwo_weights.xpriority  import CameraPriority, format_priority_report
+from oliwo_weights.xevents    import StateEventBus, EventSocketServer, read_events
+from oliwo_weights.xstateapi  import ShelfStateView, StateAPIServer
+from oliwo_weights.xprofile   import TailProfiler, format_profiler_report
+
+# shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame_watcher import FrameWatcher
+from shelf_metrics import REGISTRY, MetricsServer
+from memory_budget import MemoryMonitor, SoakTracker, freeze_after_load, format_soak_report, MEMORY_CHECK_INTERVAL, SOAK_EVERY
+from frame_trace import (
+    parse_frame_trace,
+    new_frame_trace,
+    trace_comment,
+    FrameTraceFile,
+    load_frame_latencies,
+    format_latency_report
+)
+from oliwo_weights.xreplay import FrameRecorder, FrameReplayer, Recording, process_rss, format_replay_report, REPLAY_WINDOW
+from oliwo_weights.xbackground import (
+    BackgroundModel,
+    new_trigger_stats,
+    record_trigger,
+    format_trigger_report
+)
+from oliwo_weights.xfacing import (
+    calibrate_facing_thresholds,
+    classify_changed_facings,
+    should_audit_cascade,
+    load_facing_cascade,
+    save_facing_cascade,
+    format_cascade_report,
+    FacingCascadeStore
+)
+
+# every Nth cascaded scan per camera also runs the detector to measure agreement
+CASCADE_AUDIT_EVERY = 20
+
+# background model snapshot to disk every N committed scans per camera
+BACKGROUND_SNAPSHOT_EVERY = 10
+
+# decode / diff / write threads, inference always runs on its own single thread
+IO_WORKERS = 4
+
+# shed frames of recently scanned cameras while the backlog exceeds this (seconds)
+LATENCY_TARGET = 5.0
+
+# per-scan detector time budget in seconds (0 runs every slice)
+DETECT_BUDGET = 0.0
+
+# every camera is scanned at least this often (seconds) when it has a frame
+MIN_REFRESH = 60.0
+
+# state transition / scan completed events for the UIs and other consumers
+EVENTS_SOCKET = 'state_events.sock'
+
+# local HTTP state API (127.0.0.1), 0 disables it
+HTTP_PORT = 8765
+
+# per-frame spans (Chrome trace event format) in app_root
+TRACE_FILE = 'frame_traces.json'
+
+# Prometheus metrics on 127.0.0.1, 0 disables the endpoint
+METRICS_PORT = 9108
+
+# scans slower than this percentile keep their stack samples (0 disables)
+PROFILE_PERCENTILE = 99.0
+
+# stack sampling interval while a scan stage runs (seconds)
+PROFILE_INTERVAL = 0.005
+
+# torch.profiler op summary for every Nth inference (0: only after a slow scan)
+PROFILE_TORCH_EVERY = 50
+
+# slow scan profiles (folded stacks + JSON) in app_root
+PROFILE_DIR = 'slow_scans'
+
+# resident memory above which the service warns (MB, 0 disables)
+MEMORY_BUDGET_MB = 0.0
+
+# soak test memory samples (JSON lines) in app_root
+SOAK_LOG = 'memory_soak.jsonl'
+
+# recorded frame sequences for replay, in app_root
+RECORDINGS_DIR = 'recordings'
+
+# seconds the recorder waits after its last frame for the service to scan it
+RECORD_GRACE = 10.0
+
+# seconds a replayed service may take to load its model and listen
+REPLAY_STARTUP_TIMEOUT = 300.0
+
+# recorded always, rendered only when scraped
+SCANS_TOTAL         = REGISTRY.counter('shelf_scans_total', 'Completed scans per camera')
+DECODE_FAILURES     = REGISTRY.counter('shelf_decode_failures_total', 'Frames that could not be decoded per camera')
+INFERENCES_TOTAL    = REGISTRY.counter('shelf_inferences_total', 'Scans by detector decision (run, or gated by the facing cascade)')
+SCAN_STAGE_SECONDS  = REGISTRY.histogram('shelf_scan_stage_seconds', 'Time spent in each scan pipeline stage')
+DIFF_SECONDS        = REGISTRY.histogram('shelf_diff_seconds', 'Frame difference time by method')
+INFERENCE_SECONDS   = REGISTRY.histogram('shelf_inference_seconds', 'Detector prediction time by mode')
+STATE_WRITE_SECONDS = REGISTRY.histogram('shelf_state_write_seconds', 'Product state update and write-through time')
+OVERLAY_SECONDS     = REGISTRY.histogram('shelf_overlay_seconds', 'Overlay rendering and save time')
+
+# print pipeline stage metrics and save trigger stats every N completed scans
+PIPELINE_REPORT_EVERY = 50
 
 def get_absolute_root_directory():
     """Get the correct path to retruxosaproject directory based on actual structure"""
+    # replays run the scanner on their own app_root
+    if os.environ.get('SHELF_APP_ROOT'):
+        retrux_path = os.path.join(os.path.abspath(os.environ['SHELF_APP_ROOT']), 'active_state')
+        os.makedirs(os.path.join(retrux_path, 'devices'), exist_ok = True)
+        return retrux_path
+
     # Get the directory where this script is located (product_scan/)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
@@ -56,151 +183,562 @@ def get_absolute_root_directory():
 # Use the function to get correct path
 absolute_root_directory = get_absolute_root_directory()
 
-def predict_single_file(oliwo : OliwoModel, src : str, trg : str) -> None:
+# product catalogs and states kept in memory, written through on transitions
+# to the shared SQLite state database (and product_state JSON for compatibility);
+# created on first use so report commands and importers never open the database
+shelf_states : ShelfStateStore | None = None
+shelf_states_lock = threading.Lock()
+
+def get_shelf_states() -> ShelfStateStore:
+    global absolute_root_directory, shelf_states
+
+    # the first scans of several cameras may ask at the same time
+    with shelf_states_lock:
+        if shelf_states is None:
+            parent_dir = os.path.dirname(absolute_root_directory)  # app_root
+            shelf_states = ShelfStateStore(
+                os.path.join(parent_dir, 'product_information'),
+                os.path.join(parent_dir, 'product_state'),
+                database = ShelfStateDB(os.path.join(parent_dir, 'shelf_state.db')),
+                history  = TransitionHistory(os.path.join(parent_dir, 'state_history'))
+            )
+        return shelf_states
+
+def predict_single_file(oliwo : ShelfDetector, src : str, trg : str) -> None:
     oliwo.predict_to_file(
         image_path  = src,
         output_file = trg
     )
 
 def load_products(latest_frame_file : str):
-    global absolute_root_directory
-
-    # get directories - fix path structure
-    parent_dir = os.path.dirname(absolute_root_directory)  # app_root
-    src_dir = os.path.join(absolute_root_directory, 'devices')
-    ltt_dir = os.path.join(parent_dir, 'last_state')  # Fixed: use parent_dir
-    inf_dir = os.path.join(parent_dir, 'product_information')  # Fixed: use parent_dir
-    stt_dir = os.path.join(parent_dir, 'product_state')  # Fixed: use parent_dir
+    shelf_states = get_shelf_states()
 
     fname, base_name = grab_file_from_path(latest_frame_file)
-    prod_info_jsf = os.path.join(inf_dir, f"{base_name}.json")
+    catalog = shelf_states.catalog(base_name)
     
     # Check if product info file exists
-    if not os.path.exists(prod_info_jsf):
+    if catalog is None:
+        prod_info_jsf = shelf_states.information_path(base_name)
         print(f"ERROR: Product info file not found: {prod_info_jsf}")
         raise FileNotFoundError(f"Product info file not found: {prod_info_jsf}")
-    
-    with open(prod_info_jsf, 'r') as file:
-        products_list : list[dict[str, any]] = json.load(file)
-
-    # Load existing product state or create initial state
-    prod_state_jsf = os.path.join(stt_dir, f"{base_name}.json")
-    if os.path.exists(prod_state_jsf):
-        with open(prod_state_jsf, 'r') as file:
-            product_latest_state : list[dict[str, any]] = json.load(file)
-    else:
-        # Create initial state - assuming everything is full initially
-        product_latest_state = [
-            {
-                'name'   : x['name'],
-                'coords' : x['coords'],
-                'state'  : 'full'
-            }
-            for x in products_list
-        ]
 
-    return (products_list, product_latest_state)
+    # existing product state, or everything full initially
+    return (catalog.products, shelf_states.state_list(base_name))
+
+
+def load_frame_trace(frame : FrameContext) -> dict[str, any]:
+    # capture trace written by the camera service, file mtime otherwise
+    if frame.path is None:
+        return new_frame_trace(frame.name, source = 'memory')
+
+    # parsed from the bytes the views decode, not a second read of the file
+    try:
+        trace = parse_frame_trace(frame.data())
+    except ValueError:
+        trace = None
+    if trace is None:
+        try:
+            captured_at = os.path.getmtime(frame.path)
+        except OSError:
+            captured_at = None
+        trace = new_frame_trace(frame.name, captured_at = captured_at, source = 'mtime')
+    return trace
+
+class DeviceScan:
+    """
+    State carried between the stages of one camera scan:
+    diff (prepare_device_scan) -> detect (detect_device_scan) -> write (finish_device_scan).
+    """
+
+    def __init__(self, image_file : str, frame : FrameContext):
+        self.image_file = image_file
+        self.frame      = frame
 
+        self.diffrence_xyxy : list = []
+        self.predicted_xyxy : list = []
 
-def compute_device_diff(oliwo : OliwoModel, image_file : str) -> tuple:
+        # camera moved too far to compare, the scan keeps the previous states
+        self.drifted = False
+
+        # None when setup has not created product information yet
+        self.products_list  : list[dict[str, any]] | None = None
+        self.previous_codes : np.ndarray | None = None
+        self.img_diff_names : list[str] = []
+
+        self.cascades       : FacingCascadeStore | None = None
+        self.cascade        : dict[str, any] | None = None
+        self.cascade_states : dict[str, str] = {}
+        self.audit_scan     = False
+        self.run_detector   = False
+
+        # (product index, old code, new code) for every state this scan changed
+        self.transitions : list[tuple[int, int, int]] = []
+        self.state_changes = 0
+
+        # set when the detector ran under a time budget
+        self.prediction : PartialPrediction | None = None
+
+        # wall clock time the new states were written and published
+        self.visible_at : float | None = None
+
+def prepare_device_scan(image_file : str, use_cascade : bool = True, audit_every : int = CASCADE_AUDIT_EVERY, background : BackgroundModel | None = None, register : bool = True, max_drift : float = MAX_DRIFT_PX, references : ReferenceFrameStore | None = None, frame : FrameContext | None = None, cascades : FacingCascadeStore | None = None) -> DeviceScan | None:
     global absolute_root_directory
 
     # get directories - fix path structure
     parent_dir = os.path.dirname(absolute_root_directory)  # app_root
     src_dir = os.path.join(absolute_root_directory, 'devices')
     ltt_dir = os.path.join(parent_dir, 'last_state')  # Fixed: use parent_dir
-    inf_dir = os.path.join(parent_dir, 'product_information')  # Fixed: use parent_dir
-    stt_dir = os.path.join(parent_dir, 'product_state')  # Fixed: use parent_dir
+    cas_dir = os.path.join(parent_dir, 'facing_cascade')
     
     # get file names
     latest_frame_file   = os.path.join(src_dir, f"{image_file}.jpg")
     previous_frame_file = os.path.join(ltt_dir, f"{image_file}.jpg")
 
     # Check if files exist before processing
-    if not os.path.exists(latest_frame_file):
+    if frame is None and not os.path.exists(latest_frame_file):
         print(f"ERROR: Latest frame not found: {latest_frame_file}")
-        return [], []
-        
-    if not os.path.exists(previous_frame_file):
-        print(f"INFO: Previous frame not found: {previous_frame_file}")
+        return None
+
+    # decoded once, shared by diff, cascade and detector
+    if frame is None:
+        frame = FrameContext(latest_frame_file)
+    if frame.trace is None:
+        frame.trace = load_frame_trace(frame)
+    scan = DeviceScan(image_file, frame)
+
+    # 1/4-scale grayscale view of the latest frame
+    latest_gray = frame.diff_gray()
+    if latest_gray is None:
+        DECODE_FAILURES.inc(camera = image_file)
+        print(f"ERROR: Could not read latest frame: {latest_frame_file}")
+        return None
+
+    # in-memory reference, falls back to the last_state JPEG
+    if references is not None:
+        reference_gray = references.get(image_file)
+    elif os.path.exists(previous_frame_file):
+        reference_gray = load_diff_gray(previous_frame_file)
+    else:
+        reference_gray = None
+
+    if background is not None:
+        # seed the model from the reference frame the first time
+        if not background.is_ready() and reference_gray is not None:
+            background.initialize(reference_gray)
+
+        # compare against the adaptive background model
+        with DIFF_SECONDS.time(method = 'background'):
+            scan.diffrence_xyxy, scan.drifted = background.compare(latest_gray)
+        print(f"Found {len(scan.diffrence_xyxy)} differences against background model")
+    elif reference_gray is None:
+        print(f"INFO: No reference frame for: {image_file}")
         print("This is normal during first scan - no differences to detect")
-        diffrence_xyxy = []
     else:
         # find all differences between them
-        print(f"Comparing: {previous_frame_file} -> {latest_frame_file}")
-        diffrence_xyxy = find_differences(previous_frame_file, latest_frame_file)
-        print(f"Found {len(diffrence_xyxy)} differences")
+        print(f"Comparing: reference -> {latest_frame_file}")
+        with DIFF_SECONDS.time(method = 'reference'):
+            scan.diffrence_xyxy, scan.drifted = compare_gray_frames(
+                reference_gray, latest_gray, register = register, max_drift = max_drift
+            )
+        print(f"Found {len(scan.diffrence_xyxy)} differences")
+
+    # latest frame becomes the reference, persisted only when it changed
+    if references is not None:
+        references.stage(image_file, latest_gray, changed = scan.drifted or len(scan.diffrence_xyxy) > 0)
+
+    # facings no longer line up with their coordinates, re-anchor and skip
+    if scan.drifted:
+        print("Skipped scan: camera drifted, previous product states kept")
+        return scan
 
-    # predict all boxes in current frame
-    latest_image = oliwo.load_image(latest_frame_file)
-    predicted_xyxy = oliwo.predict(latest_image)
-    print(f"Predicted {len(predicted_xyxy)} objects in current frame")
-    
     # Load product info - check if file exists first
     fname, base_name = grab_file_from_path(latest_frame_file)
-    prod_info_jsf = os.path.join(inf_dir, f"{base_name}.json")
+    shelf_states = get_shelf_states()
+    catalog = shelf_states.catalog(base_name)
     
-    if not os.path.exists(prod_info_jsf):
-        print(f"ERROR: Product info file not found: {prod_info_jsf}")
+    if catalog is None:
+        print(f"ERROR: Product info file not found: {shelf_states.information_path(base_name)}")
         print("Run setup first to create product information")
-        return diffrence_xyxy, predicted_xyxy
+        scan.run_detector = True
+        return scan
     
-    products_list, product_latest_state = load_products(latest_frame_file)
+    # cached catalog and states, no JSON parsing per scan
+    scan.products_list  = catalog.products
+    scan.previous_codes = shelf_states.states(base_name).copy()
+
+    # get valid product names that match with difference boxes
+    scan.img_diff_names = get_matching_prod_names(scan.diffrence_xyxy, scan.products_list)
+    print(f"Products with differences: {scan.img_diff_names}")
+
+    # cheap first stage: decide confident changed facings without the detector
+    # (in-memory cascade, read from facing_cascade/ once per store)
+    scan.cascades = cascades if cascades is not None else FacingCascadeStore(cas_dir)
+    scan.cascade  = scan.cascades.get(base_name) if use_cascade else None
+    if scan.cascade is not None and scan.img_diff_names:
+        scan.cascade_states = classify_changed_facings(frame.rgb(), scan.products_list, scan.img_diff_names, scan.cascade)
+        print(f"Cascade decided {len(scan.cascade_states)}/{len(scan.img_diff_names)} changed facings")
+
+    # only ambiguous facings (or an audit) need the detector
+    ambiguous_names = [xn for xn in scan.img_diff_names if xn not in scan.cascade_states]
+    scan.audit_scan = scan.cascade is not None and len(scan.cascade_states) > 0 and should_audit_cascade(scan.cascade, audit_every)
+    scan.run_detector = scan.cascade is None or len(ambiguous_names) > 0 or scan.audit_scan
+
+    return scan
+
+def detect_device_scan(oliwo : ShelfDetector, scan : DeviceScan, budget : float | None = None) -> DeviceScan:
+    # predict all boxes in current frame
+    if scan.run_detector and budget:
+        # changed facings the cascade could not decide are looked at first
+        focus = None
+        if scan.products_list is not None:
+            focus_names = [xn for xn in scan.img_diff_names if xn not in scan.cascade_states] or scan.img_diff_names
+            focus = [x['coords'] for x in scan.products_list if x['name'] in focus_names]
+
+        with INFERENCE_SECONDS.time(mode = 'anytime'):
+            scan.prediction = oliwo.predict_anytime(scan.frame.pil(), budget, focus)
+        scan.predicted_xyxy = scan.prediction.boxes
+        print(f"Predicted {len(scan.predicted_xyxy)} objects in {scan.prediction.elapsed:.2f}s, coverage {100.0 * scan.prediction.coverage:.0f}% ({len(scan.prediction.slices)}/{scan.prediction.total_slices} slices)")
+    elif scan.run_detector:
+        with INFERENCE_SECONDS.time(mode = 'full'):
+            scan.predicted_xyxy = oliwo.predict(scan.frame.pil())
+        print(f"Predicted {len(scan.predicted_xyxy)} objects in current frame")
+    else:
+        scan.predicted_xyxy = []
+        print("Skipped detector: no ambiguous facings")
+    INFERENCES_TOTAL.inc(decision = 'run' if scan.run_detector else 'gated')
+    return scan
+
+def finish_device_scan(scan : DeviceScan, trigger_stats : dict[str, int] | None = None) -> DeviceScan:
+    global absolute_root_directory
 
-    # get valid product names that match with detected boxes
-    img_diff_names = get_matching_prod_names(diffrence_xyxy, products_list)
-    img_pred_names = get_matching_prod_names(predicted_xyxy, products_list)
+    # nothing to update before setup created product information or after a drift
+    if scan.products_list is None:
+        return scan
 
-    print(f"Products with differences: {img_diff_names}")
+    base_name = scan.image_file
+
+    products_list  = scan.products_list
+    img_diff_names = scan.img_diff_names
+    cascade_states = scan.cascade_states
+
+    img_pred_names = get_matching_prod_names(scan.predicted_xyxy, products_list)
     print(f"Products with objects detected: {img_pred_names}")
 
     # Update product states based on detection results
-    for i in range(len(product_latest_state)):
-        prod = product_latest_state[i]
+    diff_names = set(img_diff_names)
+    pred_names = set(img_pred_names)
+    new_codes  = scan.previous_codes.copy()
+    detector_states : dict[str, str] = {}
+    for i in range(len(products_list)):
+        prod = products_list[i]
         prod_name = prod['name']
 
         # check if product exists in both difference and prediction
-        exist_in_diff = any([xn == prod_name for xn in img_diff_names])
-        exist_in_pred = any([xn == prod_name for xn in img_pred_names])
+        exist_in_diff = prod_name in diff_names
+        exist_in_pred = prod_name in pred_names
+
+        # detector ran out of time before reaching this facing
+        covered = scan.prediction is None or scan.prediction.covers(prod['coords'])
+
+        # what the detector would decide, kept for the cascade audit
+        if exist_in_diff and scan.run_detector and covered:
+            detector_states[prod_name] = 'reduced' if exist_in_pred else 'empty'
 
         # State logic:
+        # - If the cascade is confident about a changed facing -> use it
+        # - If the detector did not cover the facing -> keep previous state
         # - If there's a difference AND objects detected -> reduced
         # - If there's a difference AND no objects detected -> empty  
         # - If no difference detected -> keep previous state
-        if exist_in_diff and exist_in_pred:
-            product_latest_state[i]['state'] = 'reduced'
+        if prod_name in cascade_states:
+            new_codes[i] = STATE_CODES[cascade_states[prod_name]]
+            print(f"  {prod_name}: {cascade_states[prod_name]} (cascade)")
+        elif exist_in_diff and not covered:
+            print(f"  {prod_name}: {STATE_NAMES[new_codes[i]]} (not covered before deadline)")
+        elif exist_in_diff and exist_in_pred:
+            new_codes[i] = STATE_CODES['reduced']
             print(f"  {prod_name}: reduced")
         elif exist_in_diff and not exist_in_pred:
-            product_latest_state[i]['state'] = 'empty'
+            new_codes[i] = STATE_CODES['empty']
             print(f"  {prod_name}: empty")
         # If no difference, keep previous state (no change)
 
-    # Save updated product state
-    os.makedirs(stt_dir, exist_ok=True)
-    prod_state_jsf = os.path.join(stt_dir, f"{base_name}.json")
-    with open(prod_state_jsf, "w") as f:
-        json.dump(product_latest_state, f, indent = 2)
-    
-    print(f"Updated product state saved to: {prod_state_jsf}")
+    # written through (atomically) only when a product changed state
+    shelf_states = get_shelf_states()
+    with STATE_WRITE_SECONDS.time():
+        scan.transitions = shelf_states.apply(base_name, new_codes, scan.frame.trace)
+    scan.visible_at = time.time()
+    scan.state_changes = len(scan.transitions)
+    if scan.transitions:
+        print(f"Updated product state saved to: {shelf_states.state_path(base_name)} ({scan.state_changes} changes)")
+    else:
+        print("Product state unchanged")
+
+    # a trigger that changed no product state was spurious
+    if trigger_stats is not None:
+        record_trigger(trigger_stats, len(img_diff_names), scan.state_changes)
+
+    # keep the cascade hit rate and audit agreement with the camera thresholds
+    if scan.cascade is not None and img_diff_names:
+        scan.cascades.record(
+            base_name, 
+            len(img_diff_names), 
+            cascade_states, 
+            scan.run_detector,
+            detector_states if scan.audit_scan else None
+        )
+
+    return scan
+
+def compute_device_diff(oliwo : ShelfDetector, image_file : str, use_cascade : bool = True, audit_every : int = CASCADE_AUDIT_EVERY, background : BackgroundModel | None = None, trigger_stats : dict[str, int] | None = None, register : bool = True, max_drift : float = MAX_DRIFT_PX, references : ReferenceFrameStore | None = None, frame : FrameContext | None = None, cascades : FacingCascadeStore | None = None) -> tuple:
+    # all three scan stages in sequence
+    scan = prepare_device_scan(
+        image_file, 
+        use_cascade = use_cascade, 
+        audit_every = audit_every, 
+        background  = background, 
+        register    = register, 
+        max_drift   = max_drift, 
+        references  = references, 
+        frame       = frame,
+        cascades    = cascades
+    )
+    if scan is None:
+        return [], []
+
+    detect_device_scan(oliwo, scan)
+    finish_device_scan(scan, trigger_stats)
+
+    # a one-off store has no shutdown to flush it
+    if cascades is None and scan.cascades is not None:
+        scan.cascades.flush()
 
-    return diffrence_xyxy, predicted_xyxy
+    return scan.diffrence_xyxy, scan.predicted_xyxy
 
-def update_last_state(current_frame_path: str):
-    """Update last_state with current frame after inference"""
+def calibrate_facing_cascade(image_path : str) -> None:
     global absolute_root_directory
-    
+
     parent_dir = os.path.dirname(absolute_root_directory)
-    last_state_dir = os.path.join(parent_dir, 'last_state')
-    os.makedirs(last_state_dir, exist_ok=True)
-    
-    fname, base_name = grab_file_from_path(current_frame_path)
-    last_state_path = os.path.join(last_state_dir, f"{base_name}.jpg")
-    
-    # Copy current frame to last_state (will be used for next comparison)
-    shutil.copy2(current_frame_path, last_state_path)
-    print(f"Updated last_state: {last_state_path}")
+    cas_dir = os.path.join(parent_dir, 'facing_cascade')
+
+    _, base_name = grab_file_from_path(image_path)
+    products_list, _ = load_products(image_path)
+
+    # every facing in the setup frame is stocked
+    frame = FrameContext(image_path)
+    cascade = calibrate_facing_thresholds(frame.rgb(), products_list)
+    if cascade is None:
+        print(f"  No facings to calibrate for: {base_name}")
+        return
+
+    save_facing_cascade(cas_dir, base_name, cascade)
+    thresholds = cascade['thresholds']
+    print(f"  Calibrated {base_name}: edge empty < {thresholds['edge_empty']:.4f}, stocked >= {thresholds['edge_stocked']:.4f}, texture empty < {thresholds['texture_empty']:.2f}")
+
+def cascade_report() -> None:
+    global absolute_root_directory
+
+    parent_dir = os.path.dirname(absolute_root_directory)
+    cas_dir = os.path.join(parent_dir, 'facing_cascade')
+
+    if not os.path.exists(cas_dir):
+        print(f"ERROR: No cascade data found in: {cas_dir}")
+        print("Run setup first to calibrate the facing cascade")
+        return
+
+    cascades = {}
+    for file in sorted(os.listdir(cas_dir)):
+        if not file.endswith('.json'):
+            continue
+        base_name = os.path.splitext(file)[0]
+        cascade = load_facing_cascade(cas_dir, base_name)
+        if cascade is not None:
+            cascades[base_name] = cascade
+
+    print(format_cascade_report(cascades))
+
+def migrate_state() -> None:
+    shelf_states = get_shelf_states()
+
+    inf_dir = shelf_states.information_dir
+    stt_dir = shelf_states.state_dir
+
+    if not os.path.exists(inf_dir):
+        print(f"ERROR: Product info directory not found: {inf_dir}")
+        return
+
+    imported = shelf_states.database.import_json(inf_dir, stt_dir)
+    print(f"Imported {imported} cameras into: {shelf_states.database.db_path}")
+
+def history_report(hours : float = 24.0, camera : str | None = None) -> None:
+    global absolute_root_directory
+
+    # read-only, the state database is not needed
+    parent_dir = os.path.dirname(absolute_root_directory)  # app_root
+    history = TransitionHistory(os.path.join(parent_dir, 'state_history'))
+    end   = time.time()
+    start = end - hours * 3600.0
+
+    print(f"State history: last {hours:g} hours")
+    print(format_history_report(history.shelf_stats(start, end)))
+
+    if camera is None:
+        return
+
+    # per-product empty time for one shelf, names from product_information
+    catalog = None
+    info_path = os.path.join(parent_dir, 'product_information', f"{camera}.json")
+    if os.path.exists(info_path):
+        with open(info_path, 'r') as f:
+            catalog = ShelfCatalog(json.load(f))
+    _, products, seconds = history.state_durations(start, end, camera = camera)
+    print(f"\n{'Product':<20} {'Empty min':>10}")
+    for product, value in sorted(zip(products, seconds), key = lambda x: -x[1]):
+        name = catalog.names[product] if catalog is not None and product < len(catalog) else str(product)
+        print(f"{name:<20} {value / 60.0:>10.1f}")
 
-def setup_directories(oliwo : OliwoModel) -> None:
+def export_state(state_dir : str | None = None) -> None:
+    shelf_states = get_shelf_states()
+
+    state_dir = state_dir or shelf_states.state_dir
+    exported = shelf_states.database.export_json(state_dir)
+    print(f"Exported {exported} cameras to: {state_dir}")
+
+def trace_report(hours : float = 24.0) -> None:
+    global absolute_root_directory
+
+    trace_file = os.path.join(os.path.dirname(absolute_root_directory), TRACE_FILE)
+    if not os.path.exists(trace_file):
+        print(f"ERROR: No frame traces found in: {trace_file}")
+        print("Run the service first")
+        return
+
+    print(f"Capture -> visible state latency: last {hours:g} hours")
+    print(format_latency_report(load_frame_latencies(trace_file, time.time() - hours * 3600.0)))
+    print(f"Open {trace_file} in Perfetto (ui.perfetto.dev) or chrome://tracing for per-frame spans")
+
+def watch_events(since : int | None = None, epoch : str | None = None) -> None:
+    global absolute_root_directory
+
+    # print the events of a running service as JSON lines
+    socket_path = os.path.join(os.path.dirname(absolute_root_directory), EVENTS_SOCKET)
+    try:
+        for event in read_events(socket_path, since, epoch):
+            print(json.dumps(event), flush = True)
+    except OSError as e:
+        print(f"ERROR: Cannot connect to state events at {socket_path}: {e}")
+        print("Start the service first")
+
+def record_frames(name : str, duration : float = 0.0, grace : float = RECORD_GRACE) -> None:
+    global absolute_root_directory
+
+    shelf_states  = get_shelf_states()
+    parent_dir    = os.path.dirname(absolute_root_directory)  # app_root
+    src_dir       = os.path.join(absolute_root_directory, 'devices')
+    recording_dir = os.path.join(parent_dir, RECORDINGS_DIR, name)
+    try:
+        recorder = FrameRecorder(recording_dir, parent_dir)
+    except FileExistsError:
+        print(f"ERROR: Recording already exists: {recording_dir}")
+        return
+
+    # state the recorded run starts from, frames follow as they are written
+    recorder.snapshot(src_dir, shelf_states.database.export_json)
+    watcher = FrameWatcher(src_dir, extensions = ('.jpg',), emit_existing = False)
+    print(f"Recording frames of {src_dir} to {recording_dir} ({watcher.mode}), Ctrl+C to stop")
+    try:
+        while not duration or time.time() - recorder.started_at < duration:
+            for event in watcher.wait(0.5):
+                if recorder.add(event.camera, event.path, event.mtime) is not None and recorder.seq % 100 == 0:
+                    print(f"Recorded {recorder.seq} frames")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    # the service is still scanning the last frames
+    print(f"Waiting {grace:g}s for the service to scan the last frames...")
+    time.sleep(grace)
+    info = recorder.finish(
+        shelf_states.database.transitions(recorder.started_at),
+        load_frame_latencies(os.path.join(parent_dir, TRACE_FILE), since = recorder.started_at)
+    )
+    print(f"Recorded {info['frames']} frames of {len(info['cameras'])} cameras and {info['transitions']} state transitions in {info['stopped_at'] - info['started_at']:.0f}s")
+
+def replay_frames(name : str, speed : float = 1.0, loops : int = 1, hours : float = 0.0, window : float = REPLAY_WINDOW, app_root : str | None = None, service_args : str = '', detector : str = 'oliwo', detector_config : str | None = None, startup_timeout : float = REPLAY_STARTUP_TIMEOUT) -> None:
+    global absolute_root_directory
+
+    parent_dir    = os.path.dirname(absolute_root_directory)  # app_root
+    recording_dir = name if os.path.isdir(name) else os.path.join(parent_dir, RECORDINGS_DIR, name)
+    try:
+        recording = Recording(recording_dir)
+    except OSError as e:
+        print(f"ERROR: Cannot read recording {recording_dir}: {e}")
+        return
+    if len(recording) == 0:
+        print(f"ERROR: Recording has no frames: {recording_dir}")
+        return
+
+    # the recorded start state in a scratch app_root, never the live one
+    replay_root = os.path.abspath(app_root or os.path.join(recording_dir, 'replay_root'))
+    try:
+        recording.restore(replay_root)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return
+    database = ShelfStateDB(os.path.join(replay_root, 'shelf_state.db'))
+    database.import_json(os.path.join(replay_root, 'product_information'), os.path.join(replay_root, 'product_state'))
+    database.close()
+
+    # the scanner runs as it would in production, only its app_root differs
+    command = [sys.executable, os.path.abspath(__file__), '--detector', detector]
+    if detector_config:
+        command += ['--detector-config', detector_config]
+    command += ['service', '--http-port', '0', '--metrics-port', '0'] + shlex.split(service_args)
+    log_path = os.path.join(replay_root, 'service.log')
+    print(f"Starting scanner on {replay_root} (log: {log_path})")
+    with open(log_path, 'w') as log:
+        service = subprocess.Popen(command, stdout = log, stderr = subprocess.STDOUT, env = {**os.environ, 'SHELF_APP_ROOT' : replay_root})
+
+    replayer = FrameReplayer(
+        recording,
+        os.path.join(replay_root, 'active_state', 'devices'),
+        os.path.join(replay_root, EVENTS_SOCKET),
+        speed    = speed,
+        loops    = loops,
+        duration = hours * 3600.0 if hours else None,
+        window   = window,
+        rss      = lambda: process_rss(service.pid)
+    )
+    report = None
+    try:
+        replayer.connect(startup_timeout, alive = lambda: service.poll() is None)
+        replayer.settle()
+        print(f"Replaying {len(recording)} frames at {f'{speed:g}x' if speed > 0 else 'max speed'}...")
+        report = replayer.run()
+    except TimeoutError as e:
+        print(f"ERROR: {e}, see {log_path}")
+    except KeyboardInterrupt:
+        print("\nReplay interrupted")
+    finally:
+        replayer.stop_event.set()
+        service.send_signal(signal.SIGINT)
+        try:
+            service.wait(timeout = 60)
+        except subprocess.TimeoutExpired:
+            service.kill()
+
+    if report is None:
+        return
+    report_dir = os.path.join(recording_dir, 'replays')
+    os.makedirs(report_dir, exist_ok = True)
+    report_path = os.path.join(report_dir, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(report_path, 'w') as f:
+        json.dump({**report, 'service_args' : service_args, 'detector' : detector}, f, indent = 2)
+    print(format_replay_report(report))
+    print(f"Report saved: {report_path}")
+
+def setup_directories(oliwo : ShelfDetector) -> None:
     global absolute_root_directory
 
     print(f"Setting up directories with root: {absolute_root_directory}")
@@ -234,6 +772,14 @@ def setup_directories(oliwo : OliwoModel) -> None:
         target_dir = last_state_dir
     )
 
+    # compact 1/4-scale grayscale references used by the service
+    references = ReferenceFrameStore(last_state_dir)
+    for image_file_path in image_files:
+        _, base_name = grab_file_from_path(image_file_path)
+        reference_gray = load_diff_gray(image_file_path)
+        if reference_gray is not None:
+            references.set(base_name, reference_gray)
+
     print("Setup Product Information Directory")
     information_dir = os.path.join(parent_dir, 'product_information')
     create_directory_force(information_dir)
@@ -241,6 +787,7 @@ def setup_directories(oliwo : OliwoModel) -> None:
     print("Setup Product State Directory")
     product_state_dir = os.path.join(parent_dir, 'product_state')
     create_directory_force(product_state_dir)
+    get_shelf_states().reset()
     
     # STEP 1: Create product information files first
     print("Step 1: Creating product information files...")
@@ -259,6 +806,16 @@ def setup_directories(oliwo : OliwoModel) -> None:
 
     print("Step 1 completed: All product information files created")
 
+    # STEP 1b: Calibrate cheap empty-facing classifier per camera
+    print("Step 1b: Calibrating facing cascade thresholds...")
+    facing_cascade_dir = os.path.join(parent_dir, 'facing_cascade')
+    create_directory_force(facing_cascade_dir)
+    for image_path in image_files:
+        try:
+            calibrate_facing_cascade(image_path)
+        except Exception as e:
+            print(f"  ERROR calibrating cascade for {os.path.basename(image_path)}: {e}")
+
     # STEP 2: Create initial product state files
     print("Step 2: Creating initial product state files...")
     for image_path in image_files:
@@ -276,9 +833,69 @@ def setup_directories(oliwo : OliwoModel) -> None:
     print(f"  - {len(image_files)} files in product_information/") 
     print(f"  - {len(image_files)} files in product_state/")
 
-def running_service(oliwo : OliwoModel):
+def timed_stage(name : str, func, done = None, profiler : TailProfiler | None = None):
+    # pipeline stage function recording its latency and a span on the frame
+    def run(job):
+        frame = job.frame if isinstance(job, DeviceScan) else job
+        start = time.time()
+        sampled = profiler.stage(frame, name) if profiler is not None else contextlib.nullcontext()
+        result = None
+        try:
+            with SCAN_STAGE_SECONDS.time(stage = name), sampled:
+                result = func(job)
+                return result
+        finally:
+            frame.spans.append((name, start, time.time()))
+            if done is not None:
+                done(job)
+            # the scan ends when a stage hands nothing on: write, a diff
+            # without changes, or an error
+            if profiler is not None and result is None:
+                profile_scan(profiler, job)
+    return run
+
+def profile_scan(profiler : TailProfiler, job) -> None:
+    frame = job.frame if isinstance(job, DeviceScan) else job
+    trace = frame.trace or {}
+    stages : dict[str, float] = {}
+    for name, start, end in frame.spans:
+        stages[name] = stages.get(name, 0.0) + end - start
+
+    meta = {
+        'frame'       : frame.path,
+        'trace_id'    : trace.get('trace_id'),
+        'captured_at' : trace.get('captured_at'),
+        'stages'      : stages
+    }
+    if isinstance(job, DeviceScan):
+        meta.update({
+            'differences'   : len(job.diffrence_xyxy),
+            'predicted'     : len(job.predicted_xyxy),
+            'state_changes' : job.state_changes,
+            'run_detector'  : job.run_detector,
+            'audit_scan'    : job.audit_scan,
+            'cascaded'      : len(job.cascade_states),
+            'coverage'      : job.prediction.coverage if job.prediction is not None else None
+        })
+
+    # queue waits are not part of the scan, only time spent in stages
+    path = profiler.finish(frame, sum(stages.values()), frame.name, meta)
+    if path is not None:
+        print(f"Slow scan of {frame.name} ({sum(stages.values()):.2f}s), profile saved: {path}")
+
+def save_background_models(background_models : dict[str, BackgroundModel], bgm_dir : str) -> None:
+    for base_name, background in background_models.items():
+        background.save(os.path.join(bgm_dir, f"{base_name}.npz"))
+
+def save_trigger_stats(trigger_stats : dict[str, dict[str, int]], stats_file : str) -> None:
+    with open(stats_file, "w") as f:
+        json.dump(trigger_stats, f, indent = 2)
+
+def running_service(oliwo : ShelfDetector, use_cascade : bool = True, audit_every : int = CASCADE_AUDIT_EVERY, use_background : bool = False, register : bool = True, max_drift : float = MAX_DRIFT_PX, io_workers : int = IO_WORKERS, latency_target : float = LATENCY_TARGET, use_priority : bool = True, min_refresh : float = MIN_REFRESH, detect_budget : float = DETECT_BUDGET, json_export : bool = True, publish_events : bool = True, http_port : int = HTTP_PORT, metrics_port : int = METRICS_PORT, metrics_textfile : str | None = None, profile_percentile : float = PROFILE_PERCENTILE, profile_interval : float = PROFILE_INTERVAL, profile_torch_every : int = PROFILE_TORCH_EVERY, memory_budget : float = MEMORY_BUDGET_MB, memory_interval : float = MEMORY_CHECK_INTERVAL, trace_frames : int = 0, soak_every : int = 0):
     global absolute_root_directory
 
+    shelf_states = get_shelf_states()
+
     # get directories - fix path structure
     parent_dir = os.path.dirname(absolute_root_directory)  # app_root
     src_dir = os.path.join(absolute_root_directory, 'devices')
@@ -286,88 +903,307 @@ def running_service(oliwo : OliwoModel):
     inf_dir = os.path.join(parent_dir, 'product_information')  # Fixed: use parent_dir
     stt_dir = os.path.join(parent_dir, 'product_state')  # Fixed: use parent_dir
     vos_dir = os.path.join(absolute_root_directory, 'product_visual')
+    bgm_dir = os.path.join(parent_dir, 'background_model')
+    cas_dir = os.path.join(parent_dir, 'facing_cascade')
     os.makedirs(vos_dir, exist_ok = True)
 
     image_file_list = find_jpg_images(src_dir)
     print(f"Found {len(image_file_list)} Devices for monitoring")
 
     if len(image_file_list) == 0:
-        print("ERROR: No image files found to monitor")
-        print("Make sure images are present in devices directory")
-        return
+        print("WARNING: No image files found to monitor yet")
+        print("New camera frames in the devices directory will be picked up automatically")
 
-    # image files modification time tracking
-    last_modified_time = {}
-    for file_path in image_file_list:
-        last_modified_time[file_path] = 0
+    # per-camera spurious trigger tracking
+    trigger_stats_file = os.path.join(parent_dir, 'trigger_stats.json')
+    trigger_stats : dict[str, dict[str, int]] = {}
 
-    print("Starting monitoring service...")
-    scan_count = 0
+    # state database is authoritative, JSON files only for older readers
+    shelf_states.export_json = json_export
 
-    try:
-        while True:
-            
-            # enumerate the file list
-            for file_path in image_file_list:
-            
-                # Check if the file has been modified
-                try:
-                    current_modified = os.path.getmtime(file_path)
-                except OSError:
-                    # File might not exist or be accessible
-                    continue
-                
-                # check current modified time
-                if current_modified == last_modified_time[file_path]:
-                    continue
-                
-                # File has been modified - process it
-                file_name, base_name = grab_file_from_path(file_path)
-                scan_count += 1
-                print(f"\n=== SCAN #{scan_count} ===")
-                print(f"Processing updated file: {file_name}")
-                print(f"Modified time: {time.ctime(current_modified)}")
+    # transitions and completed scans, in-process for the HTTP view
+    events = StateEventBus()
+    shelf_states.events = events
+
+    # subscribers get deltas over app_root/state_events.sock instead of polling
+    event_server = None
+    if publish_events:
+        try:
+            event_server = EventSocketServer(events, os.path.join(parent_dir, EVENTS_SOCKET))
+            print(f"Publishing state events on: {event_server.socket_path}")
+        except OSError as e:
+            print(f"WARNING: State events disabled, cannot listen on socket: {e}")
+
+    # dashboards query the in-memory view instead of the filesystem
+    api_server = None
+    if http_port:
+        try:
+            view = ShelfStateView(events, shelf_states.database, vos_dir)
+            api_server = StateAPIServer(view, port = http_port)
+            print(f"State API on: http://{api_server.address[0]}:{api_server.address[1]}/summary")
+        except OSError as e:
+            print(f"WARNING: State API disabled, cannot listen on port {http_port}: {e}")
+
+    # in-memory reference frames, restored from last_state snapshots
+    references = ReferenceFrameStore(ltt_dir)
+    base_names = [grab_file_from_path(x)[1] for x in image_file_list]
+    print(f"Loaded {references.preload(base_names)} reference frames")
+
+    # in-memory cascades, written after audits and on shutdown
+    cascades = FacingCascadeStore(cas_dir)
+
+    # optional in-memory background models, restored from the last snapshot
+    background_models : dict[str, BackgroundModel] = {}
+    if use_background:
+        os.makedirs(bgm_dir, exist_ok = True)
+
+    # busy, stale and depleted shelves are scanned first
+    priority = CameraPriority(min_refresh = min_refresh) if use_priority else None
+
+    def add_camera(base_name : str) -> None:
+        trigger_stats[base_name] = new_trigger_stats()
+        if priority is not None:
+            priority.seed(base_name, shelf_states.attention(base_name))
+        if use_background:
+            background = BackgroundModel(register = register, max_drift = max_drift)
+            if background.load(os.path.join(bgm_dir, f"{base_name}.npz")):
+                print(f"Restored background model: {base_name}")
+            background_models[base_name] = background
+
+    for base_name in base_names:
+        add_camera(base_name)
+
+    scan_counter = itertools.count(1)
+
+    # Stage 1 (io pool): decode, diff, cascade
+    def diff_stage(frame : FrameContext) -> DeviceScan | None:
+        print(f"\n=== SCAN #{next(scan_counter)} ===")
+        print(f"Processing updated file: {os.path.basename(frame.path)}")
+
+        scan = prepare_device_scan(
+            frame.name, 
+            use_cascade = use_cascade, 
+            audit_every = audit_every,
+            background  = background_models.get(frame.name),
+            register    = register,
+            max_drift   = max_drift,
+            references  = references,
+            frame       = frame,
+            cascades    = cascades
+        )
+        if scan is None:
+            frame.release()
+        return scan
+
+    # always armed, only scans slower than the percentile are kept
+    profiler = None
+    if profile_percentile:
+        profiler = TailProfiler(
+            os.path.join(parent_dir, PROFILE_DIR),
+            percentile  = profile_percentile,
+            interval    = profile_interval,
+            torch_every = profile_torch_every,
+            params      = {
+                'use_cascade'    : use_cascade,
+                'use_background' : use_background,
+                'register'       : register,
+                'max_drift'      : max_drift,
+                'detect_budget'  : detect_budget,
+                'io_workers'     : io_workers
+            }
+        )
+
+    # Stage 2 (inference executor): detector on ambiguous scans only
+    def detect_stage(scan : DeviceScan) -> DeviceScan:
+        if profiler is None or not scan.run_detector:
+            return detect_device_scan(oliwo, scan, detect_budget or None)
+        with profiler.torch_ops(scan.frame, scan.image_file):
+            return detect_device_scan(oliwo, scan, detect_budget or None)
+
+    # Stage 3 (io pool): state update, reference commit, overlay
+    def write_stage(scan : DeviceScan) -> None:
+        base_name = scan.image_file
+        try:
+            finish_device_scan(scan, trigger_stats[base_name])
+            if priority is not None:
+                priority.record_scan(base_name, scan.state_changes, shelf_states.attention(base_name))
+
+            # Update reference frame AFTER inference is complete
+            references.commit(base_name)
+
+            # absorb the frame into the background model, snapshot now and then
+            background = background_models.get(base_name)
+            if background is not None and background.commit():
+                if background.count % BACKGROUND_SNAPSHOT_EVERY == 0:
+                    background.save(os.path.join(bgm_dir, f"{base_name}.npz"))
+
+            # Create visual overlay with detected objects
+            output_path = None
+            if scan.predicted_xyxy:
+                with OVERLAY_SECONDS.time():
+                    overlayed = oliwo.overlay(
+                        scan.frame.pil(), 
+                        scan.predicted_xyxy,
+                        fill_alpha = 0,
+                        line_width = 5
+                    )
+
+                    # Save visual output, replaced atomically for readers (UI, state API)
+                    output_path = os.path.join(vos_dir, os.path.basename(scan.frame.path))
+                    overlayed.save(f"{output_path}.tmp", format = 'JPEG', comment = trace_comment(scan.frame.trace))
+                    os.replace(f"{output_path}.tmp", output_path)
                 
-                try:
-                    # Perform inference and state comparison
-                    diffrence_xyxy, predicted_xyxy = compute_device_diff(oliwo, base_name)
-
-                    # Update last_state AFTER inference is complete
-                    update_last_state(file_path)
-
-                    # Update modification time only after successful processing
-                    last_modified_time[file_path] = current_modified
-
-                    # Load image for visual output
-                    image = oliwo.load_image(file_path)
-
-                    # Create visual overlay with detected objects
-                    if predicted_xyxy:
-                        overlayed = oliwo.overlay(
-                            image, 
-                            predicted_xyxy,
-                            fill_alpha = 0,
-                            line_width = 5
-                        )
-
-                        # Save visual output
-                        output_path = os.path.join(vos_dir, file_name)
-                        overlayed.save(output_path)
-                        
-                        print(f"Generated visual output: {output_path}")
-                    
-                    print(f"Scan #{scan_count} completed successfully")
-                    print(f"  - Differences detected: {len(diffrence_xyxy)}")
-                    print(f"  - Objects predicted: {len(predicted_xyxy)}")
-                    
-                except Exception as e:
-                    print(f"Error processing {file_name}: {e}")
-
-            time.sleep(2)  # Check for file updates every 2 seconds
-            
+                print(f"Generated visual output: {output_path}")
+
+            events.publish(
+                'scan',
+                camera        = base_name,
+                state_changes = scan.state_changes,
+                differences   = len(scan.diffrence_xyxy),
+                predicted     = len(scan.predicted_xyxy),
+                drifted       = scan.drifted,
+                coverage      = scan.prediction.coverage if scan.prediction is not None else 1.0,
+                visual        = output_path,
+                trace_id      = scan.frame.trace['trace_id'],
+                captured_at   = scan.frame.trace['captured_at'],
+                latency       = scan.visible_at - scan.frame.trace['captured_at'] if scan.visible_at is not None else None
+            )
+
+            SCANS_TOTAL.inc(camera = base_name)
+            print(f"Scan of {base_name} completed successfully")
+            print(f"  - Differences detected: {len(scan.diffrence_xyxy)}")
+            print(f"  - Objects predicted: {len(scan.predicted_xyxy)}")
+        finally:
+            scan.frame.release()
+
+    # capture -> visible spans per frame, see trace-report
+    frame_traces = FrameTraceFile(os.path.join(parent_dir, TRACE_FILE))
+
+    def trace_stage(scan : DeviceScan) -> None:
+        frame_traces.write_frame(scan.frame.trace, scan.frame.spans, scan.visible_at, {
+            'differences'   : len(scan.diffrence_xyxy),
+            'predicted'     : len(scan.predicted_xyxy),
+            'state_changes' : scan.state_changes,
+            'run_detector'  : scan.run_detector,
+            'source'        : scan.frame.trace.get('source')
+        })
+
+    def on_error(stage_name : str, job, error : Exception) -> None:
+        print(f"Error in {stage_name} stage: {error}")
+        frame = job.frame if isinstance(job, DeviceScan) else job
+        frame.release()
+
+    # decoding and writes overlap with inference on other cameras
+    io_executor        = ThreadPoolExecutor(max_workers = io_workers, thread_name_prefix = 'scan-io')
+    inference_executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'scan-infer')
+    # short queues ahead of the detector so the camera order is decided late
+    pipeline = ScanPipeline([
+        PipelineStage('diff',   timed_stage('diff',   diff_stage,   profiler = profiler), io_executor,        workers = min(2, io_workers), queue_size = 1),
+        PipelineStage('detect', timed_stage('detect', detect_stage, profiler = profiler), inference_executor, workers = 1, queue_size = 1),
+        PipelineStage('write',  timed_stage('write',  write_stage, trace_stage, profiler = profiler), io_executor, workers = io_workers)
+    ], on_error = on_error, latency_target = latency_target or None, priority = priority)
+
+    # RSS against the budget, live frame buffers and queued jobs; a soak
+    # test also logs every sample and the growth per soak_every scans
+    memory = MemoryMonitor('shelf_scan', memory_budget, trace_frames, log_path = os.path.join(parent_dir, SOAK_LOG) if soak_every else None)
+    memory.count('frames', FrameContext.live_buffers)
+    memory.count('references', lambda: (len(references.frames), sum(x.nbytes for x in list(references.frames.values()))))
+    memory.count('pipeline_jobs', lambda: sum(x.queue.qsize() for x in pipeline.stages if x.queue is not None) + len(pipeline.waiting) + len(pipeline.deferred))
+    if profiler is not None:
+        memory.count('scan_profiles', lambda: len(profiler.profiles))
+    memory.start(memory_interval)
+    soak = SoakTracker(soak_every) if soak_every else None
+
+    # queue depths are read only when scraped
+    REGISTRY.gauge('shelf_pipeline_queue_depth', 'Jobs queued ahead of each pipeline stage', lambda: [
+        ({'stage' : x.name}, x.queue.qsize() if x.queue is not None else 0) for x in pipeline.stages
+    ] + [({'stage' : 'waiting'}, len(pipeline.waiting) + len(pipeline.deferred))])
+    REGISTRY.gauge('shelf_pipeline_frame_age_p95_seconds', 'Frame age at scan completion, 95th percentile', lambda: percentile(list(pipeline.ages), 95))
+    metrics_server = None
+    if metrics_port:
+        try:
+            metrics_server = MetricsServer(metrics_port)
+            print(f"Metrics on: http://{metrics_server.address[0]}:{metrics_server.address[1]}/metrics")
+        except OSError as e:
+            print(f"WARNING: Metrics endpoint disabled, cannot listen on port {metrics_port}: {e}")
+
+    # debounced frame-ready events, existing frames are reported first
+    watcher = FrameWatcher(src_dir, extensions = ('.jpg',))
+    print(f"Starting monitoring service ({watcher.mode}, {io_workers} io workers)...")
+
+    async def watch_frames() -> None:
+        loop = asyncio.get_running_loop()
+        pipeline.start()
+        last_report = pipeline.completed
+        try:
+            while True:
+                # short timeout keeps Ctrl+C responsive
+                events = await loop.run_in_executor(None, watcher.wait, 0.5)
+                for event in events:
+                    _, base_name = grab_file_from_path(event.path)
+                    if base_name not in trigger_stats:
+                        print(f"New camera detected: {base_name}")
+                        add_camera(base_name)
+
+                    # one decode shared by every stage of this scan, an older
+                    # frame still waiting for this camera is overwritten
+                    pipeline.offer(base_name, FrameContext(event.path, base_name))
+
+                if soak is not None:
+                    line = soak.record(pipeline.completed)
+                    if line is not None:
+                        print(line)
+
+                # periodic stats, including the per-stage queue depth and utilization
+                if pipeline.completed - last_report >= PIPELINE_REPORT_EVERY:
+                    last_report = pipeline.completed
+                    save_trigger_stats(trigger_stats, trigger_stats_file)
+                    if metrics_textfile:
+                        REGISTRY.write_textfile(metrics_textfile)
+                    print(format_pipeline_report(pipeline))
+                    if priority is not None:
+                        print(format_priority_report(priority))
+                    if profiler is not None:
+                        print(format_profiler_report(profiler))
+        finally:
+            await pipeline.close()
+
+    try:
+        asyncio.run(watch_frames())
     except KeyboardInterrupt:
         print("\nReceived Ctrl+C. Exiting gracefully...")
-        print(f"Total scans performed: {scan_count}")
+        print(f"Total scans performed: {pipeline.stages[0].processed}")
+    finally:
+        # let in-flight writes finish before persisting
+        io_executor.shutdown(wait = True)
+        inference_executor.shutdown(wait = True)
+        watcher.close()
+        if event_server is not None:
+            event_server.close()
+        if api_server is not None:
+            api_server.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        if profiler is not None:
+            profiler.close()
+        memory.close()
+
+    # persist references, models and spurious trigger rate on shutdown
+    print(f"Saved {references.flush()} reference frames")
+    print(f"Saved {cascades.flush()} facing cascades")
+    save_background_models(background_models, bgm_dir)
+    save_trigger_stats(trigger_stats, trigger_stats_file)
+    if metrics_textfile:
+        REGISTRY.write_textfile(metrics_textfile)
+    print(format_trigger_report(trigger_stats))
+    print(format_pipeline_report(pipeline))
+    if priority is not None:
+        print(format_priority_report(priority))
+    if profiler is not None:
+        print(format_profiler_report(profiler))
+    print("\n".join(memory.check()))
+    if soak is not None:
+        print(format_soak_report(soak))
     
 
 if __name__ == "__main__":
@@ -379,6 +1215,8 @@ if __name__ == "__main__":
     print(f"Resolved root directory: {absolute_root_directory}")
 
     parser = argparse.ArgumentParser(description="Shelf Scan Service")
+    parser.add_argument("--detector", choices = DETECTORS, default = os.environ.get('SHELF_DETECTOR', 'oliwo'), help = "Detector backend: OliwoModel, or the deterministic mock for benchmarks without weights (env SHELF_DETECTOR)")
+    parser.add_argument("--detector-config", default = os.environ.get('SHELF_DETECTOR_CONFIG'), help = "Mock detector JSON: products, slice_latency, cpu_fraction (env SHELF_DETECTOR_CONFIG)")
     subparsers = parser.add_subparsers(dest = "command",  required = True)
 
     # Predict command
@@ -391,6 +1229,71 @@ if __name__ == "__main__":
 
     # Service command
     service_parser = subparsers.add_parser("service", help = "Start service")
+    service_parser.add_argument("--no-cascade", action = "store_true", help = "Always run the detector, skip the cheap facing classifier")
+    service_parser.add_argument("--cascade-audit-every", type = int, default = CASCADE_AUDIT_EVERY, help = "Run the detector on every Nth cascaded scan to measure agreement (0 disables)")
+
+    service_parser.add_argument("--background-model", action = "store_true", help = "Diff against an adaptive per-camera background model instead of last_state")
+
+    service_parser.add_argument("--no-register", action = "store_true", help = "Do not compensate camera shake before diffing")
+    service_parser.add_argument("--max-drift", type = float, default = MAX_DRIFT_PX, help = "Shift in 1/4-scale pixels above which the reference is re-anchored")
+
+    service_parser.add_argument("--io-workers", type = int, default = IO_WORKERS, help = "Threads for decoding, diffing and writes (inference uses its own thread)")
+    service_parser.add_argument("--detect-budget", type = float, default = DETECT_BUDGET, help = "Detector time budget per scan in seconds, changed regions first (0 disables)")
+    service_parser.add_argument("--no-priority", action = "store_true", help = "Scan cameras in arrival order instead of by staleness and activity")
+    service_parser.add_argument("--min-refresh", type = float, default = MIN_REFRESH, help = "Seconds after which a camera is scanned before any other")
+    service_parser.add_argument("--latency-target", type = float, default = LATENCY_TARGET, help = "Backlog delay in seconds above which frames of recently scanned cameras are shed (0 disables)")
+
+    service_parser.add_argument("--no-json-export", action = "store_true", help = "Keep product state only in the state database, do not write product_state JSON")
+    service_parser.add_argument("--no-events", action = "store_true", help = "Do not publish state events on app_root/state_events.sock")
+    service_parser.add_argument("--http-port", type = int, default = HTTP_PORT, help = "Port of the local HTTP state API on 127.0.0.1 (0 disables)")
+    service_parser.add_argument("--metrics-port", type = int, default = METRICS_PORT, help = "Port of the Prometheus /metrics endpoint on 127.0.0.1 (0 disables)")
+    service_parser.add_argument("--metrics-textfile", default = None, help = "Also write metrics to this file (node_exporter textfile collector)")
+    service_parser.add_argument("--profile-percentile", type = float, default = PROFILE_PERCENTILE, help = "Save stack samples of scans slower than this latency percentile to app_root/slow_scans (0 disables)")
+    service_parser.add_argument("--profile-interval", type = float, default = PROFILE_INTERVAL, help = "Stack sampling interval in seconds while a scan runs")
+    service_parser.add_argument("--profile-torch-every", type = int, default = PROFILE_TORCH_EVERY, help = "Collect torch.profiler op summaries for every Nth inference (0: only after a slow scan)")
+    service_parser.add_argument("--memory-budget", type = float, default = MEMORY_BUDGET_MB, help = "Warn with the top allocators when RSS exceeds this many MB (0 disables)")
+    service_parser.add_argument("--memory-interval", type = float, default = MEMORY_CHECK_INTERVAL, help = "Seconds between memory reports")
+    service_parser.add_argument("--tracemalloc", type = int, default = 0, metavar = "FRAMES", help = "Trace Python allocations with this many stack frames for top-allocator reports (0 disables)")
+    service_parser.add_argument("--gc-freeze", action = "store_true", help = "Freeze objects allocated while loading the model out of garbage collection")
+    service_parser.add_argument("--soak", type = int, nargs = "?", const = SOAK_EVERY, default = 0, metavar = "SCANS", help = f"Soak test: report memory growth per SCANS scans (default {SOAK_EVERY}) and log samples to app_root/{SOAK_LOG}")
+
+    # Cascade report command
+    report_parser = subparsers.add_parser("cascade-report", help = "Show facing cascade hit rate and detector agreement")
+
+    # State database commands
+    migrate_parser = subparsers.add_parser("migrate-state", help = "Import product_information / product_state JSON into the state database")
+    export_parser  = subparsers.add_parser("export-state", help = "Export the state database as product_state JSON")
+    export_parser.add_argument("--output", default = None, help = "Target directory (default: product_state)")
+
+    # State history command
+    history_parser = subparsers.add_parser("history-report", help = "Stock-outs, empty time and restock latency from the state history")
+    history_parser.add_argument("--hours",  type = float, default = 24.0, help = "Report window ending now")
+    history_parser.add_argument("--camera", default = None, help = "Also list empty minutes per product for this camera")
+
+    # Frame trace command
+    trace_parser = subparsers.add_parser("trace-report", help = "Capture to visible state latency percentiles per camera")
+    trace_parser.add_argument("--hours", type = float, default = 24.0, help = "Report window ending now")
+
+    # State events command
+    events_parser = subparsers.add_parser("watch-events", help = "Print state transition and scan events of the running service")
+    events_parser.add_argument("--since", type = int, default = None, help = "Resume after this sequence number")
+    events_parser.add_argument("--epoch", default = None, help = "Epoch the sequence number belongs to (from the hello event)")
+
+    # Frame recording / replay commands
+    record_parser = subparsers.add_parser("record", help = "Record camera frames with capture times and the resulting state changes for replay")
+    record_parser.add_argument("--name", default = None, help = f"Recording name in app_root/{RECORDINGS_DIR} (default: start time)")
+    record_parser.add_argument("--duration", type = float, default = 0.0, help = "Seconds to record (0: until Ctrl+C)")
+    record_parser.add_argument("--grace", type = float, default = RECORD_GRACE, help = "Seconds to wait for the service to scan the last frames")
+
+    replay_parser = subparsers.add_parser("replay", help = "Replay a recording into a scanner on a scratch app_root and compare with the recorded run")
+    replay_parser.add_argument("recording", help = f"Recording name in app_root/{RECORDINGS_DIR}, or its directory")
+    replay_parser.add_argument("--speed", type = float, default = 1.0, help = "Playback speed relative to capture time (0: max, next frame when the previous one was scanned)")
+    replay_parser.add_argument("--loops", type = int, default = 1, help = "Times to play the recording")
+    replay_parser.add_argument("--hours", type = float, default = 0.0, help = "Soak run: loop the recording for this many hours (overrides --loops)")
+    replay_parser.add_argument("--window", type = float, default = REPLAY_WINDOW, help = "Seconds per report window for latency and memory drift")
+    replay_parser.add_argument("--app-root", default = None, help = "Scratch app_root of the replayed scanner (default: <recording>/replay_root)")
+    replay_parser.add_argument("--service-args", default = "", help = "Extra service options, e.g. \"--io-workers 6 --detect-budget 1.5\"")
+    replay_parser.add_argument("--startup-timeout", type = float, default = REPLAY_STARTUP_TIMEOUT, help = "Seconds the scanner may take to start listening")
 
     # Parse the Arguments 
     args = parser.parse_args()
@@ -398,13 +1301,62 @@ if __name__ == "__main__":
     # selected ars
     selected_command = str(args.command)
 
+    # report only reads stored stats, no model needed
+    if selected_command == "cascade-report":
+        cascade_report()
+        exit(0)
+
+    if selected_command == "migrate-state":
+        migrate_state()
+        exit(0)
+
+    if selected_command == "export-state":
+        export_state(args.output)
+        exit(0)
+
+    if selected_command == "history-report":
+        history_report(args.hours, args.camera)
+        exit(0)
+
+    if selected_command == "trace-report":
+        trace_report(args.hours)
+        exit(0)
+
+    if selected_command == "record":
+        record_frames(args.name or time.strftime('%Y%m%d-%H%M%S'), args.duration, args.grace)
+        exit(0)
+
+    if selected_command == "replay":
+        replay_frames(
+            args.recording,
+            speed           = max(0.0, args.speed),
+            loops           = max(1, args.loops),
+            hours           = args.hours,
+            window          = args.window,
+            app_root        = args.app_root,
+            service_args    = args.service_args,
+            detector        = args.detector,
+            detector_config = args.detector_config,
+            startup_timeout = args.startup_timeout
+        )
+        exit(0)
+
+    if selected_command == "watch-events":
+        try:
+            watch_events(args.since, args.epoch)
+        except KeyboardInterrupt:
+            pass
+        exit(0)
+
     # setup model 
-    print("Loading OliwoModel...")
+    print(f"Loading {'OliwoModel' if args.detector == 'oliwo' else 'mock detector'}...")
     try:
-        oliow_model_x = OliwoModel()
-        print("OliwoModel loaded successfully")
+        oliow_model_x = load_detector(args.detector, args.detector_config)
+        print("Detector loaded successfully")
+        if getattr(args, 'gc_freeze', False):
+            print(f"Froze {freeze_after_load()} objects out of garbage collection")
     except Exception as e:
-        print(f"ERROR: Failed to load OliwoModel: {e}")
+        print(f"ERROR: Failed to load detector: {e}")
         print("Make sure the oliwo_weights directory contains the required model files")
         exit(1)
 
@@ -422,7 +1374,31 @@ if __name__ == "__main__":
 
     elif selected_command == "service":
         print("Running Shelf Diff Service")
-        running_service(oliow_model_x)
+        running_service(
+            oliow_model_x,
+            use_cascade = not args.no_cascade,
+            audit_every = args.cascade_audit_every,
+            use_background = args.background_model,
+            register       = not args.no_register,
+            max_drift      = args.max_drift,
+            io_workers     = max(1, args.io_workers),
+            latency_target = args.latency_target,
+            use_priority   = not args.no_priority,
+            min_refresh    = args.min_refresh,
+            detect_budget  = args.detect_budget,
+            json_export    = not args.no_json_export,
+            publish_events = not args.no_events,
+            http_port      = args.http_port,
+            metrics_port   = args.metrics_port,
+            metrics_textfile = args.metrics_textfile,
+            profile_percentile  = args.profile_percentile,
+            profile_interval    = args.profile_interval,
+            profile_torch_every = args.profile_torch_every,
+            memory_budget   = args.memory_budget,
+            memory_interval = args.memory_interval,
+            trace_frames    = args.tracemalloc,
+            soak_every      = args.soak
+        )
 
     else:
         print("Arguments need to be Selected")
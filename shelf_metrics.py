@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# latency buckets in seconds, capture and inference run for several seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labels : dict[str, str]) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key : tuple, extra : tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+class Counter:
+    def __init__(self, name : str, help : str):
+        self.name   = name
+        self.help   = help
+        self.values : dict[tuple, float] = {}
+        self.lock   = threading.Lock()
+
+    def inc(self, amount : float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+class Gauge:
+    """
+    Set directly, or computed by a callback only when scraped.
+    """
+
+    def __init__(self, name : str, help : str, callback = None):
+        self.name     = name
+        self.help     = help
+        self.callback = callback
+        self.values   : dict[tuple, float] = {}
+        self.lock     = threading.Lock()
+
+    def set(self, value : float, **labels) -> None:
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self.lock:
+            values = dict(self.values)
+        if self.callback is not None:
+            # callback returns a value or a list of (labels dict, value)
+            result = self.callback()
+            if isinstance(result, list):
+                values.update((_label_key(labels), value) for labels, value in result)
+            elif result is not None:
+                values[()] = result
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name : str, help : str, buckets : tuple[float, ...] = LATENCY_BUCKETS):
+        self.name    = name
+        self.help    = help
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., +Inf count, sum]
+        self.values  : dict[tuple, list[float]] = {}
+        self.lock    = threading.Lock()
+
+    def observe(self, value : float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0.0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, **labels) -> 'Timer':
+        return Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            values = {key : list(counts) for key, counts in self.values.items()}
+        for key, counts in sorted(values.items()):
+            # buckets are stored per interval, exposed cumulative
+            total = 0.0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                total += count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {total:g}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {total:g}")
+        return lines
+
+class Timer:
+    # with histogram.time(stage = 'diff'): ...
+    def __init__(self, histogram : Histogram, labels : dict[str, str]):
+        self.histogram = histogram
+        self.labels    = labels
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class MetricsRegistry:
+    """
+    Counters, gauges and latency histograms of one process in the Prometheus
+    text format. Recording is a lock and a few additions; the text (and any
+    callback gauge) is only produced when scraped or written to a textfile.
+    """
+
+    def __init__(self):
+        self.metrics : dict[str, any] = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name : str, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name : str, help : str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name : str, help : str, callback = None) -> Gauge:
+        gauge = self._get(Gauge, name, help)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name : str, help : str, buckets : tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path : str) -> None:
+        # node_exporter textfile collector, replaced atomically
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+# process wide registry shared by every instrumented module
+REGISTRY = MetricsRegistry()
+
+def resident_memory_bytes() -> float | None:
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return float(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # peak, not current, where /proc is not available (bytes on macOS)
+    peak = float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return peak if sys.platform == 'darwin' else peak * 1024.0
+
+REGISTRY.gauge('process_resident_memory_bytes', 'Resident memory size in bytes', resident_memory_bytes)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry : MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """
+    GET /metrics on a local port, in a daemon thread.
+    """
+
+    def __init__(self, port : int, host : str = '127.0.0.1', registry : MetricsRegistry = REGISTRY):
+        handler    = type('BoundMetricsHandler', (MetricsHandler,), {'registry' : registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+
+        self.thread = threading.Thread(target = self.httpd.serve_forever, kwargs = {'poll_interval' : 0.5}, name = 'metrics', daemon = True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
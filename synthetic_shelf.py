@@ -0,0 +1,127 @@
+import numpy as np
+
+# frame sizes (width, height) used by benchmarks and virtual cameras
+RESOLUTIONS = {
+    '720p'  : (1280, 720),
+    '1080p' : (1920, 1080),
+    '5mp'   : (2592, 1944)
+}
+
+# product state codes, same order as oliwo_weights.xstate.STATE_NAMES
+FULL, REDUCED, EMPTY = 0, 1, 2
+
+def parse_resolution(value : str) -> tuple[int, int]:
+    # '1080p' or '1920x1080'
+    if value in RESOLUTIONS:
+        return RESOLUTIONS[value]
+    width, height = value.lower().split('x')
+    return (int(width), int(height))
+
+def shelf_layout(width : int, height : int, products : int) -> tuple[np.ndarray, list[tuple[int, int]]]:
+    """
+    Facing boxes (products x 4, xyxy) of a shelf with roughly square cells,
+    row by row, and the (top, bottom) rows of every shelf board. Depends
+    only on the frame size and product count, not on the seed.
+    """
+    cols = max(1, int(np.ceil(np.sqrt(products * width / height))))
+    rows = max(1, int(np.ceil(products / cols)))
+    cell_w, cell_h = width / cols, height / rows
+    board = max(2, int(cell_h * 0.08))
+
+    boxes = np.zeros((products, 4), dtype = np.int32)
+    for i in range(products):
+        row, col = divmod(i, cols)
+        x0 = int(col * cell_w + cell_w * 0.08)
+        x1 = int((col + 1) * cell_w - cell_w * 0.08)
+        y0 = int(row * cell_h + cell_h * 0.12)
+        y1 = int((row + 1) * cell_h - board - 1)
+        boxes[i] = (x0, y0, max(x0 + 1, x1), max(y0 + 1, y1))
+
+    boards = [(max(0, int((row + 1) * cell_h) - board), int((row + 1) * cell_h)) for row in range(rows)]
+    return (boxes, boards)
+
+class SyntheticShelf:
+    """
+    Deterministic shelf image of one camera: shelf boards with a grid of
+    product facings, each with its own colour and label stripes on a
+    grey textured back wall, so diffing and registration see real structure
+    and a facing is told apart from the wall by its colour.
+    Product boxes follow the product_information layout and are the ground
+    truth for a state: full facings are drawn whole, reduced ones only
+    their lower half, empty ones not at all. The full and empty shelf are
+    rendered once; a frame is composed from them per state.
+    """
+
+    def __init__(self, width : int, height : int, products : int, seed : int = 0):
+        self.width    = width
+        self.height   = height
+        self.seed     = seed
+        rng = np.random.default_rng(seed)
+
+        self.boxes, boards = shelf_layout(width, height, products)
+
+        # back wall: low-frequency texture plus shelf boards
+        coarse = rng.integers(60, 110, (-(-height // 32), -(-width // 32), 1)).astype(np.uint8)
+        wall = np.repeat(np.repeat(coarse, 32, axis = 0), 32, axis = 1)[:height, :width]
+        self.empty = np.ascontiguousarray(np.repeat(wall, 3, axis = 2))
+        for top, bottom in boards:
+            self.empty[top : bottom] = (40, 50, 60)
+
+        # facings: saturated body colour (one channel raised) with label stripes
+        self.full = self.empty.copy()
+        colours = rng.integers(30, 110, (products, 3))
+        colours[np.arange(products), rng.integers(0, 3, products)] += 120
+        for i, (x0, y0, x1, y1) in enumerate(self.boxes):
+            self.full[y0 : y1, x0 : x1] = colours[i]
+            label_h = max(1, (y1 - y0) // 5)
+            ly = y0 + (y1 - y0) // 2
+            stripes = np.arange(x1 - x0) % 8 < 4
+            self.full[ly : ly + label_h, x0 : x1][:, stripes] = 255 - colours[i]
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def catalog(self) -> list[dict[str, any]]:
+        # product_information/<camera>.json layout
+        return [{'name' : f"product_{i:03d}", 'coords' : [int(v) for v in box]} for i, box in enumerate(self.boxes)]
+
+    def random_states(self, rng : np.random.Generator, p_reduced : float = 0.1, p_empty : float = 0.1) -> np.ndarray:
+        draw = rng.random(len(self))
+        codes = np.full(len(self), FULL, dtype = np.uint8)
+        codes[draw < p_reduced + p_empty] = REDUCED
+        codes[draw < p_empty] = EMPTY
+        return codes
+
+    def visible_boxes(self, codes : np.ndarray | None = None) -> list[list[int]]:
+        # what a perfect detector finds in render(codes)
+        result = []
+        for i, (x0, y0, x1, y1) in enumerate(self.boxes):
+            code = FULL if codes is None else codes[i]
+            if code == FULL:
+                result.append([int(x0), int(y0), int(x1), int(y1)])
+            elif code == REDUCED:
+                result.append([int(x0), int((y0 + y1) // 2), int(x1), int(y1)])
+        return result
+
+    def render(self, codes : np.ndarray | None = None, noise : float = 0.0, shift : tuple[int, int] = (0, 0), rng : np.random.Generator | None = None) -> np.ndarray:
+        """
+        BGR uint8 frame for the product state codes (all full when None),
+        with optional sensor noise (standard deviation in grey levels) and an
+        integer camera shift in pixels.
+        """
+        frame = self.full.copy()
+        if codes is not None:
+            for i in np.flatnonzero(codes != FULL):
+                x0, y0, x1, y1 = self.boxes[i]
+                top = y1 if codes[i] == EMPTY else (y0 + y1) // 2
+                frame[y0 : top, x0 : x1] = self.empty[y0 : top, x0 : x1]
+
+        dx, dy = shift
+        if dx or dy:
+            frame = np.roll(frame, (dy, dx), axis = (0, 1))
+
+        if noise > 0:
+            rng = rng if rng is not None else np.random.default_rng(self.seed)
+            grain = (rng.standard_normal(frame.shape[:2], dtype = np.float32) * noise).astype(np.int16)[..., None]
+            frame = np.clip(frame.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+        return frame
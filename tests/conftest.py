@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+# the services import shared root modules and oliwo_weights.* directly
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'product_scan'))
+
+@pytest.fixture
+def app_root(tmp_path, monkeypatch):
+    # shelf_scan working on a temporary app root with its own state store
+    import shelf_scan
+    active_state = tmp_path / 'active_state'
+    (active_state / 'devices').mkdir(parents = True)
+    monkeypatch.setattr(shelf_scan, 'absolute_root_directory', str(active_state))
+    monkeypatch.setattr(shelf_scan, 'shelf_states', None)
+    yield tmp_path
+    if shelf_scan.shelf_states is not None:
+        shelf_scan.shelf_states.database.close()
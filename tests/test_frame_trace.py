@@ -0,0 +1,66 @@
+import os
+import struct
+import cv2 as cv
+import numpy as np
+
+from frame_trace import (
+    new_frame_trace,
+    embed_frame_trace,
+    parse_frame_trace,
+    strip_frame_trace,
+    read_frame_trace,
+    write_traced_jpeg,
+    TRACE_MARKER
+)
+from synthetic_shelf import SyntheticShelf
+
+def synthetic_jpeg() -> bytes:
+    frame = SyntheticShelf(320, 240, 6).render()
+    ok, encoded = cv.imencode('.jpg', frame)
+    assert ok
+    return encoded.tobytes()
+
+def test_embed_parse_strip_round_trip():
+    jpeg  = synthetic_jpeg()
+    trace = new_frame_trace('camera_000', capture_start = 10.0, captured_at = 10.5)
+
+    traced = embed_frame_trace(jpeg, trace)
+    assert parse_frame_trace(traced) == trace
+    assert strip_frame_trace(traced) == jpeg
+
+    # decoders skip the comment segment
+    decoded = cv.imdecode(np.frombuffer(traced, np.uint8), cv.IMREAD_COLOR)
+    assert np.array_equal(decoded, cv.imdecode(np.frombuffer(jpeg, np.uint8), cv.IMREAD_COLOR))
+
+def test_frames_without_trace():
+    jpeg = synthetic_jpeg()
+    assert parse_frame_trace(jpeg) is None
+    assert strip_frame_trace(jpeg) == jpeg
+    assert parse_frame_trace(b'not a jpeg') is None
+    assert parse_frame_trace(b'') is None
+
+def test_replay_retraces_a_recorded_frame():
+    jpeg     = synthetic_jpeg()
+    recorded = embed_frame_trace(jpeg, new_frame_trace('camera_000', captured_at = 1.0))
+    replay   = new_frame_trace('camera_000', captured_at = 2.0, source = 'replay')
+
+    retraced = embed_frame_trace(strip_frame_trace(recorded), replay)
+    assert parse_frame_trace(retraced) == replay
+    assert retraced.count(TRACE_MARKER) == 1
+
+def test_unreadable_trace_payload_is_still_stripped():
+    jpeg    = synthetic_jpeg()
+    payload = TRACE_MARKER + b'{"trace_id":'
+    broken  = jpeg[:2] + b'\xff\xfe' + struct.pack('>H', len(payload) + 2) + payload + jpeg[2:]
+
+    assert parse_frame_trace(broken) is None
+    assert strip_frame_trace(broken) == jpeg
+
+def test_write_and_read_traced_file(tmp_path):
+    path  = str(tmp_path / 'camera_000_frame.jpg')
+    trace = new_frame_trace('camera_000')
+    write_traced_jpeg(path, synthetic_jpeg(), trace)
+
+    assert read_frame_trace(path) == trace
+    assert not os.path.exists(f"{path}.tmp")
+    assert read_frame_trace(str(tmp_path / 'missing.jpg')) is None
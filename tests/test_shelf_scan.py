@@ -0,0 +1,73 @@
+import json
+import numpy as np
+
+import shelf_scan
+from oliwo_weights.xdetect    import PartialPrediction
+from oliwo_weights.xframe     import FrameContext
+from oliwo_weights.xmock      import MockOliwoModel
+from oliwo_weights.xreference import ReferenceFrameStore
+from synthetic_shelf import SyntheticShelf, FULL, EMPTY
+
+# 1080p, smaller synthetic frames split an emptied facing into diff
+# boxes too small to match its coordinates
+PRODUCTS = 8
+
+def setup_camera(app_root, shelf : SyntheticShelf, camera : str = 'camera_000') -> None:
+    # product_information written by setup
+    information_dir = app_root / 'product_information'
+    information_dir.mkdir(exist_ok = True)
+    with open(information_dir / f"{camera}.json", 'w') as f:
+        json.dump(shelf.catalog(), f)
+
+def scan_frame(detector, references : ReferenceFrameStore, frame_bgr : np.ndarray, camera : str = 'camera_000') -> shelf_scan.DeviceScan:
+    # diff -> detect -> write, like one pass of the service pipeline
+    frame = FrameContext.from_array(frame_bgr, camera)
+    scan  = shelf_scan.prepare_device_scan(camera, use_cascade = False, references = references, frame = frame)
+    shelf_scan.detect_device_scan(detector, scan)
+    shelf_scan.finish_device_scan(scan)
+    references.commit(camera)
+    return scan
+
+def test_drifted_frame_keeps_states_and_reanchors(app_root):
+    shelf = SyntheticShelf(1920, 1080, PRODUCTS)
+    setup_camera(app_root, shelf)
+    mock = MockOliwoModel(products = PRODUCTS, slice_latency = 0.0)
+    references = ReferenceFrameStore(str(app_root / 'last_state'))
+
+    codes = np.full(PRODUCTS, FULL, dtype = np.uint8)
+    scan_frame(mock, references, shelf.render(codes))
+    codes[2] = EMPTY
+    assert scan_frame(mock, references, shelf.render(codes)).transitions == [(2, FULL, EMPTY)]
+
+    # the camera was knocked: nothing is compared, decided or detected
+    codes[3] = EMPTY
+    drifted = scan_frame(mock, references, shelf.render(codes, shift = (480, 0)))
+    assert drifted.drifted
+    assert not drifted.run_detector
+    assert drifted.transitions == []
+    assert shelf_scan.get_shelf_states().states('camera_000')[2:4].tolist() == [EMPTY, FULL]
+
+    # the shifted frame is the new reference
+    again = scan_frame(mock, references, shelf.render(codes, shift = (480, 0)))
+    assert not again.drifted
+    assert again.diffrence_xyxy == []
+
+def test_facing_not_covered_before_deadline_keeps_its_state(app_root):
+    shelf = SyntheticShelf(1920, 1080, PRODUCTS)
+    setup_camera(app_root, shelf)
+    mock = MockOliwoModel(products = PRODUCTS, slice_latency = 0.0)
+    references = ReferenceFrameStore(str(app_root / 'last_state'))
+
+    codes = np.full(PRODUCTS, FULL, dtype = np.uint8)
+    scan_frame(mock, references, shelf.render(codes))
+    codes[[0, 2]] = EMPTY
+    frame = FrameContext.from_array(shelf.render(codes), 'camera_000')
+    scan  = shelf_scan.prepare_device_scan('camera_000', use_cascade = False, references = references, frame = frame)
+    assert {'product_000', 'product_002'} <= set(scan.img_diff_names)
+
+    # the deadline hit after the left half: facing 0 was looked at, 2 was not
+    scan.prediction     = PartialPrediction([], [[0, 0, 960, 540]], 8, (1920, 1080), 0.1)
+    scan.predicted_xyxy = scan.prediction.boxes
+    shelf_scan.finish_device_scan(scan)
+    assert scan.transitions == [(0, FULL, EMPTY)]
+    assert shelf_scan.get_shelf_states().states('camera_000')[[0, 2]].tolist() == [EMPTY, FULL]
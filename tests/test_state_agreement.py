@@ -0,0 +1,90 @@
+import shutil
+import numpy as np
+
+import shelf_scan
+from oliwo_weights.xmock      import MockOliwoModel
+from oliwo_weights.xreference import ReferenceFrameStore
+from oliwo_weights.xreplay    import state_agreement
+from synthetic_shelf import SyntheticShelf, FULL, EMPTY
+from test_shelf_scan import PRODUCTS, setup_camera, scan_frame
+
+# camera shift that knocks a frame past the drift limit
+KNOCK = (480, 0)
+
+def recorded_run(shelf : SyntheticShelf) -> list[np.ndarray]:
+    # ground truth states of one camera, one change per frame on facings
+    # the diff resolves at 1080p (emptied, then restocked)
+    codes = [np.full(len(shelf), FULL, dtype = np.uint8)]
+    for product, state in [(0, EMPTY), (2, EMPTY), (3, EMPTY), (0, FULL), (5, EMPTY)]:
+        codes.append(codes[-1].copy())
+        codes[-1][product] = state
+    return codes
+
+def scanned_run(app_root, run : str, frames : list[tuple[int, np.ndarray]]) -> list[tuple[int, str, int, int]]:
+    # (seq, camera, product, new code) the real scan stages write, from
+    # scratch like after setup
+    shutil.rmtree(app_root / 'product_state', ignore_errors = True)
+    shelf_scan.get_shelf_states().reset()
+    mock = MockOliwoModel(products = PRODUCTS, slice_latency = 0.0)
+    references = ReferenceFrameStore(str(app_root / run / 'last_state'))
+
+    transitions = []
+    for seq, frame_bgr in frames:
+        scan = scan_frame(mock, references, frame_bgr)
+        transitions += [(seq, 'camera_000', int(product), int(new)) for product, _, new in scan.transitions]
+    return transitions
+
+def test_scanner_replay_agrees_with_recorded_run(app_root):
+    shelf = SyntheticShelf(1920, 1080, PRODUCTS)
+    setup_camera(app_root, shelf)
+    truth = recorded_run(shelf)
+    seqs  = list(range(1, len(truth) + 1))
+    positions = {seq : i for i, seq in enumerate(seqs)}
+    frames = [(seq, shelf.render(codes)) for seq, codes in zip(seqs, truth)]
+
+    recorded = scanned_run(app_root, 'recorded', frames)
+    assert [product for _, _, product, _ in recorded] == [0, 2, 3, 0, 5]
+
+    result = state_agreement(recorded, scanned_run(app_root, 'replay', frames), positions)
+    assert result['agreement'] == 1.0
+    assert result['final_mismatches'] == 0
+
+def test_coalesced_frame_matches_within_tolerance(app_root):
+    shelf = SyntheticShelf(1920, 1080, PRODUCTS)
+    setup_camera(app_root, shelf)
+    truth = recorded_run(shelf)
+    seqs  = list(range(1, len(truth) + 1))
+    positions = {seq : i for i, seq in enumerate(seqs)}
+    frames = [(seq, shelf.render(codes)) for seq, codes in zip(seqs, truth)]
+
+    recorded = scanned_run(app_root, 'recorded', frames)
+    # the replay skipped frame 2, its change shows up one frame later
+    replayed = scanned_run(app_root, 'replay', frames[:2] + frames[3:])
+    result = state_agreement(recorded, replayed, positions)
+    assert result['agreement'] == 1.0
+    assert result['final_mismatches'] == 0
+
+    # a tolerance of zero frames counts the late change as a miss
+    strict = state_agreement(recorded, replayed, positions, tolerance = 0)
+    assert strict['agreement'] < 1.0
+    assert strict['final_mismatches'] == 0
+
+def test_knocked_camera_lowers_agreement(app_root):
+    shelf = SyntheticShelf(1920, 1080, PRODUCTS)
+    setup_camera(app_root, shelf)
+    truth = recorded_run(shelf)
+    seqs  = list(range(1, len(truth) + 1))
+    positions = {seq : i for i, seq in enumerate(seqs)}
+    frames = [(seq, shelf.render(codes)) for seq, codes in zip(seqs, truth)]
+
+    recorded = scanned_run(app_root, 'recorded', frames)
+    # frame 2 was taken knocked aside and frame 3 back in place: both
+    # drift, the scanner re-anchors on frame 3 and never sees facings 2, 3 empty
+    knocked = list(frames)
+    knocked[2] = (seqs[2], shelf.render(truth[2], shift = KNOCK))
+    replayed = scanned_run(app_root, 'replay', knocked)
+
+    result = state_agreement(recorded, replayed, positions)
+    assert result['agreement'] < 1.0
+    assert result['final_mismatches'] == 2
+    assert result['matched'] == result['replayed']
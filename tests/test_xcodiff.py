@@ -0,0 +1,38 @@
+import numpy as np
+
+from oliwo_weights.xcodiff     import downscale_gray, compare_gray_frames, diff_gray_frames, get_matching_prod_names
+from oliwo_weights.xbackground import BackgroundModel
+from synthetic_shelf import SyntheticShelf, FULL, EMPTY
+
+def test_shake_within_max_drift_only_reports_real_changes():
+    # 8 x 4 px at full size is 2 x 1 px at the diff resolution
+    shelf = SyntheticShelf(1920, 1080, 8)
+    codes = np.full(len(shelf), FULL, dtype = np.uint8)
+    codes[2] = EMPTY
+
+    reference = downscale_gray(shelf.render())
+    latest    = downscale_gray(shelf.render(codes, shift = (8, 4)))
+    boxes, drifted = compare_gray_frames(reference, latest)
+    assert not drifted
+    assert get_matching_prod_names(boxes, shelf.catalog()) == ['product_002']
+
+def test_drift_over_max_is_reported_without_boxes():
+    shelf = SyntheticShelf(640, 360, 8)
+    reference = downscale_gray(shelf.render())
+    latest    = downscale_gray(shelf.render(shift = (160, 0)))
+
+    # nothing can be compared, no facing is reported as changed
+    assert compare_gray_frames(reference, latest) == ([], True)
+    assert diff_gray_frames(reference, latest) == []
+
+def test_background_model_reports_drift_and_reanchors():
+    shelf = SyntheticShelf(640, 360, 8)
+    background = BackgroundModel()
+    background.initialize(downscale_gray(shelf.render()))
+
+    shifted = downscale_gray(shelf.render(shift = (160, 0)))
+    assert background.compare(shifted) == ([], True)
+    assert not background.commit()
+
+    # re-anchored on the shifted frame
+    assert background.compare(shifted) == ([], False)
@@ -0,0 +1,47 @@
+import pytest
+from PIL import Image
+
+from oliwo_weights.xdetect import ShelfDetector, PartialPrediction, order_slices, slice_boxes
+from oliwo_weights.xmock   import MockOliwoModel
+
+def test_detector_must_implement_both_predictions():
+    class BoxesOnly(ShelfDetector):
+        def predict(self, input_image : Image.Image) -> list[list[int]]:
+            return []
+
+    # caught when the backend is built, not on the first anytime scan
+    with pytest.raises(TypeError):
+        BoxesOnly()
+
+    mock = MockOliwoModel(products = 4, slice_latency = 0.0)
+    assert isinstance(mock.predict_anytime(Image.new('RGB', (640, 360)), budget = 1.0), PartialPrediction)
+
+def test_partial_prediction_covers_only_whole_boxes():
+    # left half of a 1920 x 1080 frame processed before the deadline
+    prediction = PartialPrediction([], [[0, 0, 512, 512], [448, 0, 960, 512]], 8, (1920, 1080), 0.1)
+    assert not prediction.complete
+    assert prediction.covers([38, 64, 441, 496])
+    assert prediction.covers([500, 64, 900, 496])
+
+    # partly outside the processed slices, below and to the right
+    assert not prediction.covers([38, 64, 441, 600])
+    assert not prediction.covers([900, 64, 1000, 496])
+    assert not prediction.covers([998, 64, 1401, 496])
+
+def test_complete_prediction_covers_everything():
+    prediction = PartialPrediction([], [[0, 0, 512, 512]], 1, (1920, 1080), 0.1)
+    assert prediction.covers([998, 604, 1401, 1036])
+
+def test_focus_slices_sort_first():
+    slices = slice_boxes(1920, 1080)
+    focus  = [[1478, 604, 1881, 1036]]
+    ordered = order_slices(slices, focus)
+
+    # same slices, the one holding the whole focus box first
+    assert sorted(ordered) == sorted(slices)
+    x0, y0, x1, y1 = ordered[0]
+    assert x0 <= 1478 and y0 <= 604 and x1 >= 1881 and y1 >= 1036
+    assert ordered[0] != slices[0]
+
+    # no focus keeps raster order
+    assert order_slices(slices, None) == slices
@@ -0,0 +1,66 @@
+import queue
+import pytest
+
+from oliwo_weights.xevents import StateEventBus, EventSocketServer, read_events, SUBSCRIBER_QUEUE
+
+def publish_transitions(bus : StateEventBus, count : int) -> None:
+    for i in range(count):
+        bus.publish('transition', camera = 'camera_000', product = f"product_{i:03d}", old = 'full', new = 'empty')
+
+def test_resume_returns_only_missed_events():
+    bus = StateEventBus()
+    publish_transitions(bus, 5)
+
+    missed, subscriber = bus.subscribe(since = 2, epoch = bus.epoch)
+    assert [x['seq'] for x in missed] == [3, 4, 5]
+
+    publish_transitions(bus, 1)
+    assert subscriber.get_nowait()['seq'] == 6
+
+    # caught up: nothing missed, only live events
+    missed, _ = bus.subscribe(since = 6, epoch = bus.epoch)
+    assert missed == []
+
+def test_resume_needs_resync_when_position_is_gone():
+    bus = StateEventBus(backlog = 3)
+    publish_transitions(bus, 5)
+
+    assert bus.subscribe(since = 1, epoch = bus.epoch)[0] is None
+    assert [x['seq'] for x in bus.subscribe(since = 2, epoch = bus.epoch)[0]] == [3, 4, 5]
+
+    # sequence numbers of another service run, or from the future
+    assert bus.subscribe(since = 2, epoch = 'another-epoch')[0] is None
+    assert bus.subscribe(since = 9, epoch = bus.epoch)[0] is None
+
+def test_stalled_subscriber_is_dropped():
+    bus = StateEventBus()
+    _, stalled = bus.subscribe()
+    publish_transitions(bus, SUBSCRIBER_QUEUE + 1)
+
+    assert stalled not in bus.subscribers
+    assert stalled.get_nowait() is None
+    with pytest.raises(queue.Empty):
+        stalled.get_nowait()
+
+def test_socket_client_resumes_by_seq(tmp_path):
+    bus    = StateEventBus()
+    server = EventSocketServer(bus, str(tmp_path / 'events.sock'))
+    try:
+        publish_transitions(bus, 3)
+
+        events = read_events(server.socket_path, since = 1, epoch = bus.epoch, timeout = 5.0)
+        hello = next(events)
+        assert hello == {'type' : 'hello', 'epoch' : bus.epoch, 'seq' : 3}
+        assert [next(events)['seq'] for _ in range(2)] == [2, 3]
+
+        publish_transitions(bus, 1)
+        assert next(events)['seq'] == 4
+        events.close()
+
+        # a position from another run starts over from a snapshot
+        events = read_events(server.socket_path, since = 1, epoch = 'another-epoch', timeout = 5.0)
+        assert next(events)['type'] == 'hello'
+        assert next(events) == {'type' : 'resync', 'epoch' : bus.epoch}
+        events.close()
+    finally:
+        server.close()
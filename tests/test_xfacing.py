@@ -0,0 +1,79 @@
+import numpy as np
+
+from oliwo_weights.xfacing import (
+    FACING_EMPTY,
+    FACING_STOCKED,
+    HIST_BINS,
+    calibrate_facing_thresholds,
+    classify_facing,
+    classify_changed_facings
+)
+
+# product colors (RGB) of the test shelf, left to right
+COLORS = [(200, 40, 40), (40, 200, 40), (40, 40, 200), (200, 200, 40)]
+
+THRESHOLDS = {
+    'edge_empty'    : 0.05,
+    'texture_empty' : 10.0,
+    'edge_stocked'  : 0.20,
+    'hist_stocked'  : 0.80,
+    'hist_empty'    : 0.40
+}
+
+def shelf_image(empty : tuple[int, ...] = (), colors : list[tuple[int, int, int]] = COLORS) -> tuple[np.ndarray, list[dict[str, any]]]:
+    # flat grey shelf back, products are colored grids (edges and texture)
+    image = np.full((120, 120 * len(colors), 3), 90, dtype = np.uint8)
+    products_list = []
+    for i, color in enumerate(colors):
+        x0 = i * 120 + 10
+        products_list.append({'name' : f'product_{i:03d}', 'coords' : [x0, 10, x0 + 100, 110]})
+        if i in empty:
+            continue
+        tile = np.zeros((100, 100, 3), dtype = np.uint8)
+        tile[:] = color
+        tile[::10] = 255
+        tile[:, ::10] = 0
+        image[10 : 110, x0 : x0 + 100] = tile
+    return image, products_list
+
+def features(edge : float, texture : float, hist : np.ndarray | None = None) -> dict[str, any]:
+    hist = hist if hist is not None else np.ones(HIST_BINS, dtype = np.float32)
+    return {'edge' : edge, 'texture' : texture, 'hist' : hist}
+
+def test_classify_facing_thresholds():
+    reference = np.eye(*HIST_BINS, dtype = np.float32)
+    other     = np.flipud(reference).copy()
+
+    assert classify_facing(features(0.01, 2.0, other), reference, THRESHOLDS) == FACING_EMPTY
+    assert classify_facing(features(0.30, 40.0, reference), reference, THRESHOLDS) == FACING_STOCKED
+
+    # busy but recolored, or flat but still the product colors: ambiguous
+    assert classify_facing(features(0.30, 40.0, other), reference, THRESHOLDS) is None
+    assert classify_facing(features(0.01, 2.0, reference), reference, THRESHOLDS) is None
+
+    # without a reference histogram neither empty nor stocked is certain
+    assert classify_facing(features(0.01, 2.0), None, THRESHOLDS) is None
+    assert classify_facing(features(0.30, 40.0), None, THRESHOLDS) is None
+
+def test_classify_changed_facings():
+    image, products_list = shelf_image()
+    cascade = calibrate_facing_thresholds(image, products_list)
+
+    # facing 1 emptied, facing 2 replaced by another product
+    colors = list(COLORS)
+    colors[2] = (200, 40, 200)
+    latest, _ = shelf_image(empty = (1,), colors = colors)
+    changed = ['product_001', 'product_002', 'product_003']
+    decided = classify_changed_facings(latest, products_list, changed, cascade)
+
+    # a changed facing still stocked is 'reduced', the recolored one is left to the detector
+    assert decided == {'product_001' : 'empty', 'product_003' : 'reduced'}
+
+def test_classify_changed_facings_skips_unchanged_and_offscreen():
+    image, products_list = shelf_image()
+    cascade = calibrate_facing_thresholds(image, products_list)
+    latest, _ = shelf_image(empty = (0, 1))
+
+    offscreen = products_list + [{'name' : 'product_004', 'coords' : [500, 10, 600, 110]}]
+    decided = classify_changed_facings(latest, offscreen, ['product_001', 'product_004'], cascade)
+    assert decided == {'product_001' : 'empty'}
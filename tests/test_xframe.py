@@ -0,0 +1,54 @@
+import cv2 as cv
+import numpy as np
+
+from oliwo_weights.xframe  import FrameContext
+from oliwo_weights.xcodiff import downscale_gray
+from frame_trace import new_frame_trace, write_traced_jpeg
+from synthetic_shelf import SyntheticShelf, EMPTY
+from shelf_scan import load_frame_trace
+
+def test_views_come_from_one_read_of_the_file(tmp_path):
+    shelf = SyntheticShelf(640, 360, 6)
+    first = shelf.render()
+    codes = np.full(len(shelf), EMPTY, dtype = np.uint8)
+    second = shelf.render(codes)
+    path = str(tmp_path / 'camera_000.jpg')
+    cv.imwrite(path, first, [cv.IMWRITE_JPEG_QUALITY, 100])
+
+    frame = FrameContext(path)
+    reduced = frame.diff_gray()
+
+    # the camera service replaces the file between the scan stages
+    cv.imwrite(path, second, [cv.IMWRITE_JPEG_QUALITY, 100])
+    full = frame.bgr()
+
+    assert frame.decode_count == 2
+    def distance(a : np.ndarray, b : np.ndarray) -> float:
+        return float(np.abs(a.astype(np.int16) - b).mean())
+
+    # both views show the first frame, none the replacement
+    assert distance(full, first) < distance(full, second) / 4
+    assert distance(reduced, downscale_gray(first)) < distance(reduced, downscale_gray(second)) / 4
+
+def test_trace_is_parsed_from_the_frame_bytes(tmp_path):
+    path  = str(tmp_path / 'camera_000.jpg')
+    trace = new_frame_trace('camera_000', capture_start = 10.0, captured_at = 10.5)
+    ok, encoded = cv.imencode('.jpg', SyntheticShelf(320, 240, 6).render())
+    assert ok
+    write_traced_jpeg(path, encoded.tobytes(), trace)
+
+    frame = FrameContext(path)
+    frame.data()
+    # the file is gone by the time the trace is asked for
+    (tmp_path / 'camera_000.jpg').unlink()
+    assert load_frame_trace(frame)['captured_at'] == 10.5
+
+def test_release_drops_the_file_contents(tmp_path):
+    path = str(tmp_path / 'camera_000.jpg')
+    cv.imwrite(path, SyntheticShelf(320, 240, 6).render())
+
+    frame = FrameContext(path)
+    frame.bgr()
+    assert frame.held_bytes() > len(frame.data())
+    frame.release()
+    assert frame.held_bytes() == 0
@@ -0,0 +1,68 @@
+import os
+import datetime
+import numpy as np
+
+from oliwo_weights.xstate   import STATE_CODES
+from oliwo_weights.xhistory import TransitionHistory, day_name
+
+FULL, REDUCED, EMPTY = STATE_CODES['full'], STATE_CODES['reduced'], STATE_CODES['empty']
+
+# local midnight, days are partitioned in local time
+MIDNIGHT = datetime.datetime(2026, 3, 1).timestamp()
+
+def test_append_partitions_by_local_day(tmp_path):
+    history = TransitionHistory(str(tmp_path))
+    history.append('camera_000', [(0, FULL, EMPTY)], timestamp = MIDNIGHT - 60.0)
+    history.append('camera_000', [(0, EMPTY, FULL)], timestamp = MIDNIGHT + 60.0)
+    history.append('camera_000', [], timestamp = MIDNIGHT + 120.0)
+
+    days = sorted(x for x in os.listdir(tmp_path) if not x.startswith('.') and x != 'cameras.json')
+    assert days == [day_name(MIDNIGHT - 60.0), day_name(MIDNIGHT + 60.0)]
+    assert days == ['2026-02-28', '2026-03-01']
+
+def test_load_spans_day_boundary_in_time_order(tmp_path):
+    history = TransitionHistory(str(tmp_path))
+    history.append('camera_000', [(0, FULL, EMPTY), (1, FULL, REDUCED)], timestamp = MIDNIGHT - 30.0)
+    history.append('camera_001', [(0, FULL, EMPTY)], timestamp = MIDNIGHT + 30.0)
+    history.append('camera_000', [(0, EMPTY, FULL)], timestamp = MIDNIGHT + 90.0)
+
+    # a slower writer appended an earlier scan after a later one
+    history.append('camera_000', [(2, FULL, EMPTY)], timestamp = MIDNIGHT + 10.0)
+
+    columns = history.load(MIDNIGHT - 3600.0, MIDNIGHT + 3600.0)
+    assert columns['ts'].tolist() == [MIDNIGHT - 30.0] * 2 + [MIDNIGHT + 10.0, MIDNIGHT + 30.0, MIDNIGHT + 90.0]
+    assert columns['product'].tolist() == [0, 1, 2, 0, 0]
+
+    # start inclusive, end exclusive, on both days
+    columns = history.load(MIDNIGHT - 30.0, MIDNIGHT + 30.0)
+    assert columns['ts'].tolist() == [MIDNIGHT - 30.0] * 2 + [MIDNIGHT + 10.0]
+
+    columns = history.load(MIDNIGHT - 3600.0, MIDNIGHT + 3600.0, camera = 'camera_001')
+    assert columns['ts'].tolist() == [MIDNIGHT + 30.0]
+    assert len(history.load(MIDNIGHT - 3600.0, MIDNIGHT + 3600.0, camera = 'camera_009')['ts']) == 0
+    assert len(history.load(MIDNIGHT + 86400.0, MIDNIGHT + 2 * 86400.0)['ts']) == 0
+
+def test_durations_and_restocks_across_midnight(tmp_path):
+    history = TransitionHistory(str(tmp_path))
+    history.append('camera_000', [(3, FULL, EMPTY)], timestamp = MIDNIGHT - 600.0)
+    history.append('camera_000', [(3, EMPTY, FULL)], timestamp = MIDNIGHT + 1200.0)
+
+    cameras, products, seconds = history.state_durations(MIDNIGHT - 3600.0, MIDNIGHT + 3600.0)
+    assert cameras.tolist() == [0] and products.tolist() == [3]
+    assert np.allclose(seconds, [1800.0])
+
+    _, _, latency = history.replenishment_latencies(MIDNIGHT - 3600.0, MIDNIGHT + 3600.0)
+    assert np.allclose(latency, [1800.0])
+
+    stats = history.shelf_stats(MIDNIGHT - 3600.0, MIDNIGHT + 3600.0)
+    assert stats['camera_000']['stockouts'] == 1
+    assert stats['camera_000']['restocked'] == 1
+    assert np.isclose(stats['camera_000']['mean_restock_minutes'], 30.0)
+
+def test_cameras_registered_by_another_process_are_seen(tmp_path):
+    writer = TransitionHistory(str(tmp_path))
+    reader = TransitionHistory(str(tmp_path))
+    writer.append('camera_007', [(0, FULL, EMPTY)], timestamp = MIDNIGHT)
+
+    columns = reader.load(MIDNIGHT - 1.0, MIDNIGHT + 1.0, camera = 'camera_007')
+    assert columns['product'].tolist() == [0]
@@ -0,0 +1,142 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from oliwo_weights.xpipeline import PipelineStage, ScanPipeline
+
+class GatedScan:
+    """
+    Stage function recording (key, frame) jobs; blocks while the gate is
+    closed so offers can be made while a job is in flight.
+    """
+
+    def __init__(self):
+        self.gate    = threading.Event()
+        self.started = threading.Event()
+        self.scanned = []
+        self.gate.set()
+
+    def __call__(self, job):
+        self.started.set()
+        self.gate.wait()
+        self.scanned.append(job)
+        return job
+
+    async def wait_started(self) -> None:
+        await wait_until(self.started.is_set)
+        self.started.clear()
+
+async def wait_until(condition, timeout : float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "pipeline did not get there in time"
+        await asyncio.sleep(0.005)
+
+def run_pipeline(scenario, latency_target : float | None = None, cost : float | None = None) -> tuple[ScanPipeline, GatedScan]:
+    scan     = GatedScan()
+    executor = ThreadPoolExecutor(1)
+    pipeline = ScanPipeline([PipelineStage('scan', scan, executor)], latency_target = latency_target)
+
+    # pretend the stage already measured this many seconds per job
+    if cost is not None:
+        pipeline.stages[0].busy, pipeline.stages[0].processed = cost, 1
+
+    async def main():
+        pipeline.start()
+        try:
+            await scenario(pipeline, scan)
+        finally:
+            scan.gate.set()
+            await pipeline.close()
+
+    asyncio.run(main())
+    executor.shutdown()
+    return (pipeline, scan)
+
+def test_offers_before_start_coalesce_into_latest():
+    async def scenario(pipeline, scan):
+        assert pipeline.offer('cam_a', ('cam_a', 1))
+        assert pipeline.offer('cam_a', ('cam_a', 2))
+        assert pipeline.offer('cam_b', ('cam_b', 1))
+        await wait_until(lambda: pipeline.completed == 2)
+
+    pipeline, scan = run_pipeline(scenario)
+    assert scan.scanned == [('cam_a', 2), ('cam_b', 1)]
+    assert pipeline.coalesced == 1
+    assert pipeline.pending() == 0
+
+def test_offers_while_in_flight_wait_in_deferred_slot():
+    async def scenario(pipeline, scan):
+        scan.gate.clear()
+        pipeline.offer('cam_a', ('cam_a', 1))
+        await scan.wait_started()
+
+        # one job per key in flight, newer frames overwrite the deferred one
+        pipeline.offer('cam_a', ('cam_a', 2))
+        pipeline.offer('cam_a', ('cam_a', 3))
+        assert pipeline.deferred['cam_a'].job == ('cam_a', 3)
+
+        scan.gate.set()
+        await wait_until(lambda: pipeline.completed == 2)
+
+    pipeline, scan = run_pipeline(scenario)
+    assert scan.scanned == [('cam_a', 1), ('cam_a', 3)]
+    assert pipeline.coalesced == 1
+
+def test_no_shedding_under_latency_target():
+    async def scenario(pipeline, scan):
+        scan.gate.clear()
+        pipeline.offer('cam_a', ('cam_a', 1))
+        await scan.wait_started()
+        pipeline.offer('cam_b', ('cam_b', 1))
+        assert pipeline.offer('cam_a', ('cam_a', 2))
+
+        scan.gate.set()
+        await wait_until(lambda: pipeline.completed == 3)
+
+    pipeline, scan = run_pipeline(scenario, latency_target = 60.0, cost = 0.01)
+    assert pipeline.shed == 0
+    assert scan.scanned == [('cam_a', 1), ('cam_b', 1), ('cam_a', 2)]
+
+def test_shed_frame_of_busy_key_is_scanned_after_it():
+    async def scenario(pipeline, scan):
+        scan.gate.clear()
+        pipeline.offer('cam_a', ('cam_a', 1))
+        await scan.wait_started()
+        pipeline.offer('cam_b', ('cam_b', 1))
+
+        # backlog estimate (1 pending x 10s) is over the target
+        assert not pipeline.offer('cam_a', ('cam_a', 2))
+        assert pipeline.offer('cam_a', ('cam_a', 3))
+
+        scan.gate.set()
+        await wait_until(lambda: pipeline.completed == 3)
+
+    pipeline, scan = run_pipeline(scenario, latency_target = 5.0, cost = 10.0)
+    assert pipeline.shed == 1
+    assert pipeline.coalesced == 1
+    assert scan.scanned == [('cam_a', 1), ('cam_b', 1), ('cam_a', 3)]
+    assert not pipeline.deferred
+
+def test_shed_frame_of_idle_key_is_scanned_once_backlog_drains():
+    async def scenario(pipeline, scan):
+        pipeline.offer('cam_a', ('cam_a', 1))
+        await wait_until(lambda: pipeline.completed == 1)
+
+        scan.gate.clear()
+        pipeline.offer('cam_b', ('cam_b', 1))
+        await scan.wait_started()
+        pipeline.offer('cam_c', ('cam_c', 1))
+
+        # cam_a was admitted less than a target ago and is not in flight
+        assert not pipeline.offer('cam_a', ('cam_a', 2))
+        assert 'cam_a' not in pipeline.in_flight
+
+        scan.gate.set()
+        await wait_until(lambda: pipeline.completed == 4)
+
+    pipeline, scan = run_pipeline(scenario, latency_target = 5.0, cost = 10.0)
+    assert pipeline.shed == 1
+    assert scan.scanned == [('cam_a', 1), ('cam_b', 1), ('cam_c', 1), ('cam_a', 2)]
+    assert not pipeline.deferred
@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+
+from oliwo_weights.xstate   import ShelfStateStore, ShelfCatalog, STATE_CODES
+from oliwo_weights.xstatedb import ShelfStateDB
+from oliwo_weights.xevents  import StateEventBus
+from oliwo_weights.xhistory import TransitionHistory
+from synthetic_shelf import SyntheticShelf
+
+FULL, REDUCED, EMPTY = STATE_CODES['full'], STATE_CODES['reduced'], STATE_CODES['empty']
+
+def state_store(tmp_path, products : int = 6, **kwargs) -> ShelfStateStore:
+    information_dir = tmp_path / 'product_information'
+    information_dir.mkdir(exist_ok = True)
+    with open(information_dir / 'camera_000.json', 'w') as f:
+        json.dump(SyntheticShelf(640, 360, products).catalog(), f)
+    return ShelfStateStore(str(information_dir), str(tmp_path / 'product_state'), **kwargs)
+
+def test_apply_returns_and_records_transitions(tmp_path):
+    database = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    events   = StateEventBus()
+    store    = state_store(tmp_path, database = database, events = events, history = TransitionHistory(str(tmp_path / 'history')))
+
+    codes = store.states('camera_000').copy()
+    codes[1] = EMPTY
+    codes[4] = REDUCED
+    trace = {'trace_id' : 'frame-1', 'captured_at' : 5.0}
+    assert store.apply('camera_000', codes, trace) == [(1, FULL, EMPTY), (4, FULL, REDUCED)]
+
+    # written through to the database, history, events and JSON export
+    assert [(x['product'], x['new'], x['trace_id']) for x in database.transitions(0.0)] == [(1, EMPTY, 'frame-1'), (4, REDUCED, 'frame-1')]
+    assert len(store.history.load(0.0, 2e9)['ts']) == 2
+    assert [(x['product'], x['new']) for x in events.events] == [('product_001', 'empty'), ('product_004', 'reduced')]
+    with open(store.state_path('camera_000')) as f:
+        assert [x['state'] for x in json.load(f)] == ['full', 'empty', 'full', 'full', 'reduced', 'full']
+    database.close()
+
+def test_apply_with_unchanged_codes_writes_nothing(tmp_path):
+    database = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    events   = StateEventBus()
+    store    = state_store(tmp_path, database = database, events = events, history = TransitionHistory(str(tmp_path / 'history')))
+
+    codes = store.states('camera_000').copy()
+    codes[2] = EMPTY
+    store.apply('camera_000', codes)
+    state_path = store.state_path('camera_000')
+    os.utime(state_path, (0, 0))
+
+    assert store.apply('camera_000', codes.copy(), {'trace_id' : 'frame-2', 'captured_at' : 6.0}) == []
+    assert len(database.transitions(0.0)) == 1
+    assert len(store.history.load(0.0, 2e9)['ts']) == 1
+    assert len(events.events) == 1
+    assert os.path.getmtime(state_path) == 0
+    database.close()
+
+def test_apply_survives_commits_of_other_processes(tmp_path):
+    database = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    store    = state_store(tmp_path, database = database, events = StateEventBus())
+    other    = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    catalog  = ShelfCatalog(SyntheticShelf(320, 240, 4).catalog())
+
+    errors = []
+    applied = []
+    done = threading.Event()
+
+    def write_stage():
+        # toggles one facing, every apply is a transition
+        try:
+            codes = store.states('camera_000').copy()
+            for i in range(300):
+                codes[0] = EMPTY if i % 2 == 0 else FULL
+                applied.extend(store.apply('camera_000', codes, {'trace_id' : f"{i}", 'captured_at' : 0.0}))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def diff_stage():
+        # the UI or setup commits while scans of other cameras run
+        while not done.is_set():
+            other.put_catalog('camera_001', catalog)
+            with other.conn:
+                other.conn.execute("DELETE FROM catalog WHERE camera = 'camera_001'")
+            store.catalog('camera_001')
+
+    threads = [threading.Thread(target = write_stage), threading.Thread(target = diff_stage)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(applied) == 300
+    assert len(database.transitions(0.0, camera = 'camera_000')) == 300
+    other.close()
+    database.close()
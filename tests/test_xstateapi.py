@@ -0,0 +1,83 @@
+import json
+import http.client
+
+from oliwo_weights.xstate    import ShelfStateStore, STATE_CODES
+from oliwo_weights.xstatedb  import ShelfStateDB
+from oliwo_weights.xevents   import StateEventBus
+from oliwo_weights.xstateapi import ShelfStateView, StateAPIServer
+from synthetic_shelf import SyntheticShelf
+
+def scanner_store(tmp_path, bus : StateEventBus) -> ShelfStateStore:
+    # what setup and the first scan leave behind for one synthetic camera
+    information_dir = tmp_path / 'product_information'
+    information_dir.mkdir()
+    with open(information_dir / 'camera_000.json', 'w') as f:
+        json.dump(SyntheticShelf(640, 360, 6).catalog(), f)
+
+    database = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    store = ShelfStateStore(str(information_dir), str(tmp_path / 'product_state'), database = database, export_json = False, events = bus)
+    store.states('camera_000')
+    return store
+
+def get(server : StateAPIServer, path : str, etag : str | None = None) -> tuple[int, str | None, bytes]:
+    conn = http.client.HTTPConnection(*server.address, timeout = 10.0)
+    try:
+        conn.request('GET', path, headers = {'If-None-Match' : etag} if etag else {})
+        response = conn.getresponse()
+        return (response.status, response.getheader('ETag'), response.read())
+    finally:
+        conn.close()
+
+def test_etag_revalidation_and_long_poll(tmp_path):
+    bus    = StateEventBus()
+    store  = scanner_store(tmp_path, bus)
+    server = StateAPIServer(ShelfStateView(bus, store.database), port = 0)
+    try:
+        status, etag, body = get(server, '/cameras/camera_000')
+        assert status == 200
+        assert etag.startswith(f'"{bus.epoch}-')
+        assert [x['state'] for x in json.loads(body)['products']] == ['full'] * 6
+
+        # unchanged resource: 304 with the same ETag and no body
+        status, same, body = get(server, '/cameras/camera_000', etag)
+        assert (status, same, body) == (304, etag, b'')
+
+        # a scan empties one facing, the held request returns the new version
+        codes = store.states('camera_000').copy()
+        codes[2] = STATE_CODES['empty']
+        assert store.apply('camera_000', codes) == [(2, STATE_CODES['full'], STATE_CODES['empty'])]
+
+        status, changed, body = get(server, '/cameras/camera_000?wait=5', etag)
+        assert status == 200 and changed != etag
+        assert json.loads(body)['products'][2]['state'] == 'empty'
+
+        status, _, body = get(server, '/summary')
+        assert json.loads(body)['total'] == {'full' : 5, 'reduced' : 0, 'empty' : 1}
+    finally:
+        server.close()
+        store.database.close()
+
+def test_long_poll_times_out_with_304(tmp_path):
+    bus    = StateEventBus()
+    store  = scanner_store(tmp_path, bus)
+    server = StateAPIServer(ShelfStateView(bus, store.database), port = 0)
+    try:
+        _, etag, _ = get(server, '/summary')
+        status, same, _ = get(server, '/summary?wait=0.2', etag)
+        assert (status, same) == (304, etag)
+    finally:
+        server.close()
+        store.database.close()
+
+def test_unknown_resources_are_404(tmp_path):
+    bus    = StateEventBus()
+    store  = scanner_store(tmp_path, bus)
+    server = StateAPIServer(ShelfStateView(bus, store.database), port = 0)
+    try:
+        assert get(server, '/cameras/camera_009')[0] == 404
+        assert get(server, '/cameras/camera_000/visual')[0] == 404
+        assert get(server, '/products')[0] == 404
+        assert get(server, '/summary?wait=soon')[0] == 400
+    finally:
+        server.close()
+        store.database.close()
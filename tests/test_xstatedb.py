@@ -0,0 +1,99 @@
+import os
+import json
+import numpy as np
+
+from oliwo_weights.xstate   import ShelfCatalog, STATE_CODES
+from oliwo_weights.xstatedb import ShelfStateDB
+from synthetic_shelf import SyntheticShelf
+
+FULL, REDUCED, EMPTY = STATE_CODES['full'], STATE_CODES['reduced'], STATE_CODES['empty']
+
+def shelf_catalog(products : int = 6, width : int = 640, height : int = 360) -> ShelfCatalog:
+    return ShelfCatalog(SyntheticShelf(width, height, products).catalog())
+
+def test_put_catalog_reports_changes_and_drops_stale_states(tmp_path):
+    db = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    catalog = shelf_catalog()
+
+    assert db.put_catalog('camera_000', catalog)
+    assert not db.put_catalog('camera_000', catalog)
+    assert db.cameras() == ['camera_000']
+    assert db.load_catalog('camera_000').products == catalog.products
+    assert db.load_catalog('camera_001') is None
+
+    db.write_states('camera_000', np.zeros(len(catalog), dtype = np.uint8))
+    assert db.load_states('camera_000', len(catalog)) is not None
+
+    # a regenerated layout invalidates the stored states
+    assert db.put_catalog('camera_000', shelf_catalog(width = 1280, height = 720))
+    assert db.load_states('camera_000', len(catalog)) is None
+    db.close()
+
+def test_record_scan_updates_states_and_history(tmp_path):
+    db = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    catalog = shelf_catalog()
+    db.put_catalog('camera_000', catalog)
+    db.write_states('camera_000', np.zeros(len(catalog), dtype = np.uint8), timestamp = 100.0)
+
+    trace = {'trace_id' : 'abc', 'captured_at' : 199.5}
+    db.record_scan('camera_000', [(1, FULL, EMPTY), (4, FULL, REDUCED)], timestamp = 200.0, trace = trace)
+    db.record_scan('camera_000', [(1, EMPTY, FULL)], timestamp = 300.0)
+    db.record_scan('camera_000', [], timestamp = 400.0)
+
+    codes = db.load_states('camera_000', len(catalog))
+    assert codes.tolist() == [FULL, FULL, FULL, FULL, REDUCED, FULL]
+
+    rows = db.transitions(0.0)
+    assert [(x['ts'], x['product'], x['old'], x['new']) for x in rows] == [
+        (200.0, 1, FULL, EMPTY), (200.0, 4, FULL, REDUCED), (300.0, 1, EMPTY, FULL)
+    ]
+    assert rows[0]['trace_id'] == 'abc' and rows[0]['captured_at'] == 199.5
+    assert rows[2]['trace_id'] is None
+    assert len(db.transitions(250.0, camera = 'camera_000')) == 1
+    assert db.transitions(0.0, until = 200.0) == []
+
+    assert db.state_counts() == {'camera_000' : {'full' : 5, 'reduced' : 1, 'empty' : 0}}
+    reduced = db.snapshot(state = 'reduced')
+    assert [x['name'] for x in reduced] == [catalog.names[4]]
+    assert reduced[0]['updated_at'] == 200.0
+    db.close()
+
+def test_json_import_export_round_trip(tmp_path):
+    information_dir = tmp_path / 'product_information'
+    state_dir       = tmp_path / 'product_state'
+    information_dir.mkdir()
+    state_dir.mkdir()
+
+    catalog = shelf_catalog()
+    for camera in ('camera_000', 'camera_001'):
+        with open(information_dir / f"{camera}.json", 'w') as f:
+            json.dump(catalog.products, f)
+
+    # only camera_000 has scanned states, camera_001 starts full
+    states = [{**prod, 'state' : 'empty' if i == 2 else 'full'} for i, prod in enumerate(catalog.products)]
+    with open(state_dir / 'camera_000.json', 'w') as f:
+        json.dump(states, f)
+
+    db = ShelfStateDB(str(tmp_path / 'shelf_state.db'))
+    assert db.import_json(str(information_dir), str(state_dir)) == 2
+    assert db.load_states('camera_000', len(catalog)).tolist() == [FULL, FULL, EMPTY, FULL, FULL, FULL]
+    assert db.load_states('camera_001', len(catalog)).tolist() == [FULL] * len(catalog)
+
+    export_dir = tmp_path / 'export'
+    assert db.export_json(str(export_dir)) == 2
+    with open(export_dir / 'camera_000.json', 'r') as f:
+        assert json.load(f) == states
+    assert sorted(os.listdir(export_dir)) == ['camera_000.json', 'camera_001.json']
+    db.close()
+
+def test_data_version_changes_on_commits_of_other_connections(tmp_path):
+    path   = str(tmp_path / 'shelf_state.db')
+    writer = ShelfStateDB(path)
+    reader = ShelfStateDB(path, read_only = True)
+
+    version = reader.data_version()
+    writer.put_catalog('camera_000', shelf_catalog())
+    assert reader.data_version() != version
+    assert reader.cameras() == ['camera_000']
+    reader.close()
+    writer.close()